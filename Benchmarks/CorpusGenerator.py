@@ -0,0 +1,75 @@
+import random
+from typing import List, Optional
+
+
+class TracerouteCorpusGenerator:
+    KINDS = ('clean', 'timeouts', 'malformed', 'ipv6')
+
+    def __init__(self, seed: int = 42):
+        self.random = random.Random(seed)
+        self._backbone = [self._random_ipv4() for _ in range(200)]
+
+    def _random_ipv4(self) -> str:
+        rnd = self.random
+        return f"{rnd.randint(11, 223)}.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}.{rnd.randint(1, 254)}"
+
+    def _random_ipv6(self) -> str:
+        return '2001:db8:' + ':'.join(f"{self.random.randint(0, 0xffff):x}" for _ in range(6))
+
+    def generate_trace(self, kind: str = 'clean', hop_count: Optional[int] = None) -> str:
+        if kind not in self.KINDS:
+            raise ValueError(f"Неизвестный тип трассировки: {kind}")
+
+        rnd = self.random
+        if hop_count is None:
+            hop_count = rnd.randint(6, 20)
+
+        ipv6 = kind == 'ipv6'
+        target_ip = self._random_ipv6() if ipv6 else self._random_ipv4()
+        lines = [f"traceroute to host{rnd.randint(1, 9999)}.example.com ({target_ip}), 30 hops max, 60 byte packets"]
+
+        latency = rnd.uniform(0.5, 2.0)
+        # Узлы берутся из общего пула, чтобы разные трассировки пересекались
+        path = rnd.sample(self._backbone, hop_count - 1)
+        timeout_rate = 0.4 if kind == 'timeouts' else 0.05
+
+        for hop_number in range(1, hop_count + 1):
+            latency += rnd.uniform(0.5, 15.0)
+            if hop_number == 1:
+                ip = 'fe80::1' if ipv6 else '192.168.1.1'
+            elif hop_number == hop_count:
+                ip = target_ip
+            else:
+                ip = self._random_ipv6() if ipv6 else path[hop_number - 2]
+
+            if rnd.random() < timeout_rate and hop_number != hop_count:
+                lines.append(f"{hop_number:2d}  * * *")
+                continue
+
+            times = ['*' if rnd.random() < 0.05 else f"{latency + rnd.uniform(-0.5, 0.5):.3f}" for _ in range(3)]
+            if kind == 'malformed':
+                lines.append(self._malformed_hop(hop_number, ip, times))
+            else:
+                probes = '  '.join(t if t == '*' else f"{t} ms" for t in times)
+                lines.append(f"{hop_number:2d}  {ip} ({ip})  {probes}")
+
+        return '\n'.join(lines)
+
+    def _malformed_hop(self, hop_number: int, ip: str, times: List[str]) -> str:
+        # Те же ошибки, которые исправляет TracerouteAutoCorrector
+        variant = self.random.randint(0, 5)
+        if variant == 0:
+            return f"{hop_number} timeout"
+        if variant == 1:
+            return f"{hop_number}ms  {ip} ({ip})  " + '  '.join(f"{t} ms" for t in times)
+        if variant == 2:
+            return f"{hop_number}  {ip}  " + '  '.join(f"{t}ms" for t in times)
+        if variant == 3:
+            return f"{hop_number} {ip} " + '  '.join(times)
+        if variant == 4:
+            return f"{hop_number}    {ip}    " + '   '.join(f"{t}  ms ms" for t in times)
+        return f"{hop_number}  {ip} ({ip})  {times[0]} ms"
+
+    def generate_corpus(self, trace_count: int, kinds: Optional[List[str]] = None) -> str:
+        kinds = kinds or ['clean']
+        return '\n'.join(self.generate_trace(kinds[i % len(kinds)]) for i in range(trace_count))
@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Benchmarks.CorpusGenerator import TracerouteCorpusGenerator
+from Code.AutoCorrector import TracerouteAutoCorrector
+from Code.Geo import GeoIP
+from Code.ParserClass import split_traces, TracerouteParser
+from Code.TracerouteAnalyzerClass import TracerouteAnalyzer
+
+
+def measure(name, func, lines, traces, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # Память меряем отдельным прогоном: tracemalloc заметно замедляет код
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'name': name,
+        'seconds': best,
+        'lines_per_sec': lines / best if best else 0,
+        'traces_per_sec': traces / best if best else 0,
+        'peak_memory_kb': peak / 1024,
+    }
+
+
+def parse_all(chunks):
+    parsers = []
+    for chunk in chunks:
+        parser = TracerouteParser()
+        parser.parse_output(chunk)
+        parsers.append(parser)
+    return parsers
+
+
+def run_benchmarks(trace_count, seed, repeat):
+    generator = TracerouteCorpusGenerator(seed)
+    corpora = {
+        'clean': generator.generate_corpus(trace_count, ['clean']),
+        'timeouts': generator.generate_corpus(trace_count, ['timeouts']),
+        'malformed': generator.generate_corpus(trace_count, ['malformed']),
+        'ipv6': generator.generate_corpus(trace_count, ['ipv6']),
+        'mixed': generator.generate_corpus(trace_count, list(TracerouteCorpusGenerator.KINDS)),
+    }
+
+    results = []
+    for corpus_name, corpus in corpora.items():
+        lines = corpus.count('\n') + 1
+        chunks = split_traces(corpus)
+        parsers = parse_all(chunks)
+        geoip = GeoIP(enabled=True)
+
+        def pipeline():
+            corrected, _ = TracerouteAutoCorrector().correct(corpus)
+            analyzer = TracerouteAnalyzer()
+            for parser in parse_all(split_traces(corrected)):
+                analyzer.analyze(parser)
+
+        stages = [
+            ('correct', lambda: TracerouteAutoCorrector().correct(corpus)),
+            ('parse_output', lambda: parse_all(chunks)),
+            ('analyze', lambda: [TracerouteAnalyzer().analyze(parser) for parser in parsers]),
+            ('analyze_countries', lambda: [geoip.analyze_countries(parser.hops) for parser in parsers]),
+            ('pipeline', pipeline),
+        ]
+
+        for stage_name, func in stages:
+            result = measure(f"{corpus_name}/{stage_name}", func, lines, len(chunks), repeat)
+            results.append(result)
+            print(f"{result['name']:28} {result['seconds'] * 1000:9.1f} мс  "
+                  f"{result['lines_per_sec']:12.0f} строк/с  {result['traces_per_sec']:10.0f} трасс/с  "
+                  f"{result['peak_memory_kb']:9.0f} КБ")
+
+    return results
+
+
+def get_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, previous_path):
+    with open(previous_path, encoding='utf-8') as f:
+        previous = {r['name']: r for r in json.load(f)['results']}
+
+    print(f"\nСравнение с {previous_path}:")
+    for result in results:
+        old = previous.get(result['name'])
+        if old and old['seconds']:
+            ratio = result['seconds'] / old['seconds']
+            mark = "🔴" if ratio > 1.1 else "🟢" if ratio < 0.9 else "  "
+            print(f"  {mark} {result['name']:28} x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки анализатора traceroute")
+    parser.add_argument('--traces', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help="JSON с результатами предыдущего прогона")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.traces, args.seed, args.repeat)
+
+    data = {
+        'commit': get_commit(),
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'traces': args.traces,
+        'seed': args.seed,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Результаты сохранены: {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import argparse
+import os
+import re
+import sys
+import time
+
+DEFAULT_RECORDING = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Code', 'my_traceroute')
+
+
+def main():
+    # Подмена traceroute для офлайн-тестов: построчно воспроизводит записанный вывод с задержками
+    parser = argparse.ArgumentParser(description="Воспроизведение записанного traceroute")
+    parser.add_argument('target')
+    parser.add_argument('--file', default=DEFAULT_RECORDING, help="Записанный вывод traceroute")
+    parser.add_argument('--delay', type=float, default=0.05, help="Пауза перед каждым прыжком, сек")
+    parser.add_argument('--hang', action='store_true', help="Не завершаться после вывода (проверка таймаутов)")
+    args = parser.parse_args()
+
+    with open(args.file, encoding='utf-8', errors='ignore') as f:
+        lines = f.read().splitlines()
+
+    for line in lines:
+        if line.strip().startswith('traceroute to'):
+            # Цель в заголовке заменяется на запрошенную, адрес остается из записи
+            line = re.sub(r'traceroute to \S+', f'traceroute to {args.target}', line, count=1)
+        elif line.strip():
+            time.sleep(args.delay)
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+
+    while args.hang:
+        time.sleep(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Code')
+MODULES = ['main', 'ParserClass', 'TracerouteAnalyzerClass', 'AutoCorrector', 'Report', 'Exporter',
+           'Daemon', 'Server']
+
+
+def import_profile(module):
+    # python -X importtime пишет в stderr: self [us] | cumulative [us] | имя модуля
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                               cwd=CODE_DIR, capture_output=True, text=True, check=True)
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+
+    top_level = next((cumulative for _, cumulative, name in rows if name.strip() == module), 0)
+    heaviest = sorted(rows, key=lambda row: row[0], reverse=True)[:5]
+    return {
+        'module': module,
+        'cumulative_us': top_level,
+        'modules_loaded': len(rows),
+        'heaviest': [{'module': name.strip(), 'self_us': self_us} for self_us, _, name in heaviest],
+    }
+
+
+def startup_time(module, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', f'import {module}'], cwd=CODE_DIR, check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время импорта модулей анализатора")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="JSON с результатами")
+    args = parser.parse_args()
+
+    baseline = startup_time('sys', args.repeat)
+    results = []
+    for module in MODULES:
+        profile = import_profile(module)
+        profile['startup_ms'] = startup_time(module, args.repeat) * 1000
+        profile['overhead_ms'] = profile['startup_ms'] - baseline * 1000
+        results.append(profile)
+        print(f"{module:26} {profile['cumulative_us'] / 1000:7.2f} мс импорт  "
+              f"{profile['overhead_ms']:7.2f} мс сверх голого интерпретатора  "
+              f"{profile['modules_loaded']:4d} модулей")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'interpreter_ms': baseline * 1000, 'results': results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import csv
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from Code.Sketch import RunningStats
+except ImportError:
+    from Sketch import RunningStats
+
+
+class RouterStats:
+    def __init__(self):
+        self.rtt = RunningStats()
+        self.probes_sent = 0
+        self.probes_lost = 0
+        self.traces = 0
+        self.first_seen = None
+        self.last_seen = None
+
+    # new_trace=False — узел уже встречался в этой трассировке: пробы считаются, трассировка нет
+    def update(self, times: List[Optional[float]], timestamp: float, new_trace: bool = True):
+        for t in times:
+            self.probes_sent += 1
+            if t is None:
+                self.probes_lost += 1
+            else:
+                self.rtt.add(t)
+        self._touch(timestamp, new_trace)
+
+    def update_value(self, value: Optional[float], sent: int, lost: int, timestamp: float, new_trace: bool = True):
+        self.probes_sent += sent
+        self.probes_lost += lost
+        if value is not None:
+            self.rtt.add(value)
+        self._touch(timestamp, new_trace)
+
+    def _touch(self, timestamp: float, new_trace: bool = True):
+        if new_trace:
+            self.traces += 1
+        if self.first_seen is None or timestamp < self.first_seen:
+            self.first_seen = timestamp
+        if self.last_seen is None or timestamp > self.last_seen:
+            self.last_seen = timestamp
+
+    def merge(self, other: 'RouterStats'):
+        self.rtt.merge(other.rtt)
+        self.probes_sent += other.probes_sent
+        self.probes_lost += other.probes_lost
+        self.traces += other.traces
+        if other.first_seen is not None:
+            self.first_seen = other.first_seen if self.first_seen is None else min(self.first_seen, other.first_seen)
+            self.last_seen = other.last_seen if self.last_seen is None else max(self.last_seen, other.last_seen)
+
+    @property
+    def loss_rate(self) -> float:
+        return (self.probes_lost / self.probes_sent) * 100 if self.probes_sent else 0.0
+
+    def to_dict(self) -> Dict:
+        result = self.rtt.to_dict()
+        result.update({
+            'traces': self.traces,
+            'probes_sent': self.probes_sent,
+            'loss_rate': self.loss_rate,
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+        })
+        return result
+
+
+class TracerouteAggregator:
+    # Накопительная статистика по маршрутизаторам и линкам для множества трассировок
+    def __init__(self, max_routers: int = 100000, max_links: int = 200000):
+        self.max_routers = max_routers
+        self.max_links = max_links
+        self.routers = OrderedDict()
+        self.links = OrderedDict()
+        self.traces_seen = 0
+        self.evicted = 0
+
+    def add_trace(self, parser, timestamp: Optional[float] = None):
+        if timestamp is None:
+            timestamp = time.time()
+
+        self.traces_seen += 1
+        prev_ip = None
+        prev_avg = None
+        seen = set()
+
+        for hop in parser.hops:
+            ip = hop['ip_address']
+            if not ip or ip == '*':
+                continue
+
+            valid_times = [t for t in hop['times'] if t is not None]
+            avg_time = sum(valid_times) / len(valid_times) if valid_times else None
+            self._add_hop(ip, hop['times'], avg_time, prev_ip, prev_avg, timestamp, seen)
+
+            prev_ip = ip
+            if avg_time is not None:
+                prev_avg = avg_time
+
+    def _add_hop(self, ip: str, times: List[Optional[float]], avg_time: Optional[float], prev_ip: Optional[str],
+                 prev_avg: Optional[float], timestamp: float, seen: set):
+        # Общий шаг add_trace и add_batch; seen — узлы и линки текущей трассировки
+        self._get_or_create(self.routers, ip, self.max_routers).update(times, timestamp, ip not in seen)
+        seen.add(ip)
+
+        if prev_ip and prev_ip != ip:
+            # Задержка линка — прирост RTT относительно предыдущего узла. Отрицательный прирост
+            # (предыдущий узел медленнее отвечает на ICMP) считаем нулем: так среднее и перцентили согласованы
+            delta = max(avg_time - prev_avg, 0.0) if avg_time is not None and prev_avg is not None else None
+            key = (prev_ip, ip)
+            link = self._get_or_create(self.links, key, self.max_links)
+            link.update_value(delta, len(times), times.count(None), timestamp, key not in seen)
+            seen.add(key)
+
+    def add_traces(self, parsers: Iterable, timestamp: Optional[float] = None):
+        for parser in parsers:
+            self.add_trace(parser, timestamp)
+
+    def add_batch(self, batch, timestamp: Optional[float] = None):
+        # Колонки SharedHopBatch читаются напрямую, без сборки словарей прыжков
+        if timestamp is None:
+            timestamp = time.time()
+
+        self.traces_seen += len(batch.traces)
+        trace_column = batch.column('trace')
+        probes = batch.column('probes')
+        avg_column = batch.column('avg_time')
+        rtt = batch.column('rtt')
+        width = batch.probe_width
+
+        current_trace = None
+        prev_ip = None
+        prev_avg = None
+        seen = set()
+        for index, ip in enumerate(batch.ips()):
+            if trace_column[index] != current_trace:
+                current_trace = trace_column[index]
+                prev_ip = None
+                prev_avg = None
+                seen = set()
+            if not ip:
+                continue
+
+            row = index * width
+            times = [None if t != t else t for t in rtt[row:row + probes[index]]]
+            avg_time = avg_column[index]
+            avg_time = None if avg_time != avg_time else avg_time
+            self._add_hop(ip, times, avg_time, prev_ip, prev_avg, timestamp, seen)
+
+            prev_ip = ip
+            if avg_time is not None:
+                prev_avg = avg_time
+
+    def merge(self, other: 'TracerouteAggregator'):
+        for ip, stats in other.routers.items():
+            self._get_or_create(self.routers, ip, self.max_routers).merge(stats)
+        for link, stats in other.links.items():
+            self._get_or_create(self.links, link, self.max_links).merge(stats)
+        self.traces_seen += other.traces_seen
+
+    def _get_or_create(self, table: OrderedDict, key, limit: int) -> RouterStats:
+        stats = table.get(key)
+        if stats is None:
+            stats = RouterStats()
+            table[key] = stats
+            if len(table) > limit:
+                # Вытесняем давно не встречавшиеся узлы, чтобы память не росла
+                table.popitem(last=False)
+                self.evicted += 1
+        else:
+            table.move_to_end(key)
+        return stats
+
+    def get_router(self, ip: str) -> Optional[Dict]:
+        stats = self.routers.get(ip)
+        return stats.to_dict() if stats else None
+
+    def get_link(self, src_ip: str, dst_ip: str) -> Optional[Dict]:
+        stats = self.links.get((src_ip, dst_ip))
+        return stats.to_dict() if stats else None
+
+    def top_routers(self, metric: str = 'p95', limit: int = 10, min_samples: int = 1) -> List[Tuple[str, Dict]]:
+        rows = [(ip, stats.to_dict()) for ip, stats in self.routers.items() if stats.probes_sent >= min_samples]
+        rows.sort(key=lambda row: row[1][metric] if row[1][metric] is not None else float('-inf'), reverse=True)
+        return rows[:limit]
+
+    def to_rows(self, kind: str = 'routers') -> List[Dict]:
+        rows = []
+        if kind == 'routers':
+            for ip, stats in self.routers.items():
+                row = {'ip_address': ip}
+                row.update(stats.to_dict())
+                rows.append(row)
+        elif kind == 'links':
+            for (src_ip, dst_ip), stats in self.links.items():
+                row = {'src_ip': src_ip, 'dst_ip': dst_ip}
+                row.update(stats.to_dict())
+                rows.append(row)
+        else:
+            raise ValueError(f"Неизвестный тип статистики: {kind}")
+        return rows
+
+    def export_csv(self, file_path: str, kind: str = 'routers'):
+        rows = self.to_rows(kind)
+        with open(file_path, 'w', encoding='utf-8', newline='') as f:
+            if not rows:
+                return
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def export_json(self, file_path: str):
+        data = {
+            'traces_seen': self.traces_seen,
+            'routers': self.to_rows('routers'),
+            'links': self.to_rows('links'),
+        }
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
@@ -0,0 +1,229 @@
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+class AlertRule:
+    # Правило проверяется на каждом закрытом окне; тревога — если оно выполнено в min_windows из of_windows окон.
+    # issue_type — доля трассировок окна с такой проблемой; metric — 'loss_rate' (%) или 'mean_rtt' (мс)
+    def __init__(self, name: str, scope: str = 'target', issue_type: Optional[str] = None,
+                 metric: Optional[str] = None, threshold: float = 0.5, min_windows: int = 3, of_windows: int = 5,
+                 min_traces: int = 1):
+        if scope not in ('target', 'router'):
+            raise ValueError(f"Неизвестная область правила: {scope}")
+        if (issue_type is None) == (metric is None):
+            raise ValueError("Правилу нужен ровно один из параметров: issue_type или metric")
+        if not 0 < min_windows <= of_windows:
+            raise ValueError("Нужно 0 < min_windows <= of_windows")
+
+        self.name = name
+        self.scope = scope
+        self.issue_type = issue_type
+        self.metric = metric
+        self.threshold = threshold
+        self.min_windows = min_windows
+        self.of_windows = of_windows
+        self.min_traces = min_traces
+        self.mask = (1 << of_windows) - 1
+
+    def value(self, window: '_KeyWindow') -> Optional[float]:
+        if window.traces < self.min_traces:
+            return None
+        if self.issue_type is not None:
+            return window.issue_counts.get(self.issue_type, 0) / window.traces
+        return window.metric(self.metric)
+
+
+DEFAULT_RULES = (
+    AlertRule('sustained_packet_loss', issue_type='packet_loss', threshold=0.5),
+    AlertRule('sustained_high_latency', issue_type='high_latency', threshold=0.5),
+    AlertRule('persistent_routing_loop', issue_type='routing_loop', threshold=0.5, min_windows=2, of_windows=3),
+    AlertRule('router_packet_loss', scope='router', metric='loss_rate', threshold=30.0),
+    AlertRule('router_high_latency', scope='router', metric='mean_rtt', threshold=200.0),
+)
+
+
+class _KeyWindow:
+    # Счетчики текущего окна одной цели или маршрутизатора. История правил — битовые маски
+    # последних of_windows окон, сводки окон — в deque фиксированной длины
+    __slots__ = ('window_id', 'traces', 'issue_counts', 'rtt_sum', 'rtt_count', 'probes', 'lost',
+                 'masks', 'active', 'history')
+
+    def __init__(self, rule_count: int, history_size: int, window_id: int):
+        self.masks = [0] * rule_count
+        self.active = set()
+        self.history = deque(maxlen=history_size)
+        self.reset(window_id)
+
+    def reset(self, window_id: int):
+        self.window_id = window_id
+        self.traces = 0
+        self.issue_counts = {}
+        self.rtt_sum = 0.0
+        self.rtt_count = 0
+        self.probes = 0
+        self.lost = 0
+
+    def metric(self, name: str) -> Optional[float]:
+        if name == 'loss_rate':
+            return self.lost / self.probes * 100 if self.probes else None
+        if name == 'mean_rtt':
+            return self.rtt_sum / self.rtt_count if self.rtt_count else None
+        raise ValueError(f"Неизвестная метрика: {name}")
+
+    def summary(self) -> Dict:
+        return {'window_id': self.window_id, 'traces': self.traces, 'issues': dict(self.issue_counts),
+                'loss_rate': self.metric('loss_rate'), 'mean_rtt': self.metric('mean_rtt')}
+
+
+class AlertEngine:
+    # Тумблинг-окна window_seconds по каждой цели и маршрутизатору; правила N из M скользят по последним окнам.
+    # Повторная тревога по тому же правилу и ключу не выдается, пока не придет 'resolved'.
+    # Ключ, вытесненный по max_keys с активной тревогой, снимает ее: 'resolved' с evicted=True
+    def __init__(self, rules: Iterable[AlertRule] = DEFAULT_RULES, window_seconds: float = 60.0,
+                 max_keys: int = 100000, on_alert: Optional[Callable[[Dict], None]] = None):
+        rules = list(rules)
+        self.rules = {'target': [], 'router': []}
+        for rule in rules:
+            self.rules[rule.scope].append(rule)
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self.on_alert = on_alert
+        self.history_size = max((rule.of_windows for rule in rules), default=1)
+        self.keys = {'target': OrderedDict(), 'router': OrderedDict()}
+        # Ключи, у которых закрытие окна может что-то выдать: в открытом окне есть трассировки или тревога активна.
+        # tick обходит только их, а не все ключи
+        self.pending = {'target': {}, 'router': {}}
+        self.evicted = 0
+        self.alerts_emitted = 0
+
+    def observe(self, parser, issues: List[Dict], timestamp: Optional[float] = None) -> List[Dict]:
+        return self.observe_result(parser.target_ip or parser.target_host, issues, parser.hops, timestamp)
+
+    def observe_result(self, target: str, issues: List[Dict], hops: Optional[List[Dict]] = None,
+                       timestamp: Optional[float] = None) -> List[Dict]:
+        if timestamp is None:
+            timestamp = time.time()
+        window_id = int(timestamp // self.window_seconds)
+        alerts = []
+
+        if self.rules['target']:
+            window = self._window('target', target, window_id, alerts)
+            window.traces += 1
+            counts = window.issue_counts
+            for issue_type in {issue['type'] for issue in issues}:
+                counts[issue_type] = counts.get(issue_type, 0) + 1
+
+        if hops and self.rules['router']:
+            seen = set()
+            for hop in hops:
+                ip = hop['ip_address']
+                if not ip:
+                    continue
+                window = self._window('router', ip, window_id, alerts)
+                if ip not in seen:
+                    window.traces += 1
+                    seen.add(ip)
+                for t in hop['times']:
+                    window.probes += 1
+                    if t is None:
+                        window.lost += 1
+                    else:
+                        window.rtt_sum += t
+                        window.rtt_count += 1
+
+        return self._emit(alerts)
+
+    def tick(self, timestamp: Optional[float] = None) -> List[Dict]:
+        # Закрывает окна ключей, по которым давно не было трассировок: иначе тревога не снимется
+        if timestamp is None:
+            timestamp = time.time()
+        window_id = int(timestamp // self.window_seconds)
+        alerts = []
+        for scope, pending in self.pending.items():
+            for key, window in list(pending.items()):
+                if window.window_id < window_id:
+                    self._close(scope, key, window, window_id, alerts)
+                    if not window.active:
+                        del pending[key]
+        return self._emit(alerts)
+
+    def active_alerts(self) -> List[Dict]:
+        return [{'scope': scope, 'key': key, 'rule': name}
+                for scope, table in self.keys.items()
+                for key, window in table.items()
+                for name in sorted(window.active)]
+
+    def _window(self, scope: str, key: str, window_id: int, alerts: List[Dict]) -> _KeyWindow:
+        table = self.keys[scope]
+        window = table.get(key)
+        if window is None:
+            if len(table) >= self.max_keys:
+                evicted_key, evicted = table.popitem(last=False)
+                self.pending[scope].pop(evicted_key, None)
+                self._resolve_evicted(scope, evicted_key, evicted, alerts)
+                self.evicted += 1
+            window = table[key] = _KeyWindow(len(self.rules[scope]), self.history_size, window_id)
+        else:
+            table.move_to_end(key)
+            # Запоздавшая трассировка (window_id меньше текущего) засчитывается в текущее окно
+            if window_id > window.window_id:
+                self._close(scope, key, window, window_id, alerts)
+        self.pending[scope][key] = window
+        return window
+
+    def _resolve_evicted(self, scope: str, key: str, window: _KeyWindow, alerts: List[Dict]):
+        # История ключа теряется: потребитель не должен держать по нему тревогу
+        for index, rule in enumerate(self.rules[scope]):
+            if rule.name in window.active:
+                alerts.append(self._alert(rule, scope, key, window, 'resolved', bin(window.masks[index]).count('1'),
+                                          None, evicted=True))
+        window.active.clear()
+
+    def _close(self, scope: str, key: str, window: _KeyWindow, next_window_id: int, alerts: List[Dict]):
+        # Пустые окна между закрываемым и следующим считаются окнами без нарушения
+        gap = next_window_id - window.window_id - 1
+        summary = window.summary()
+        window.history.append(summary)
+
+        for index, rule in enumerate(self.rules[scope]):
+            value = rule.value(window)
+            breached = value is not None and value >= rule.threshold
+            mask = (((window.masks[index] << 1) | breached) << min(gap, rule.of_windows)) & rule.mask
+            window.masks[index] = mask
+
+            breached_windows = bin(mask).count('1')
+            firing = breached_windows >= rule.min_windows
+            if firing == (rule.name in window.active):
+                continue
+
+            if firing:
+                window.active.add(rule.name)
+            else:
+                window.active.discard(rule.name)
+            alerts.append(self._alert(rule, scope, key, window, 'firing' if firing else 'resolved',
+                                      breached_windows, value))
+
+        window.reset(next_window_id)
+
+    def _alert(self, rule: AlertRule, scope: str, key: str, window: _KeyWindow, state: str, breached_windows: int,
+               value: Optional[float], evicted: bool = False) -> Dict:
+        return {
+            'rule': rule.name,
+            'scope': scope,
+            'key': key,
+            'state': state,
+            'window_start': window.window_id * self.window_seconds,
+            'breached_windows': breached_windows,
+            'of_windows': rule.of_windows,
+            'value': value,
+            'windows': list(window.history),
+            'evicted': evicted,
+        }
+
+    def _emit(self, alerts: List[Dict]) -> List[Dict]:
+        self.alerts_emitted += len(alerts)
+        if self.on_alert is not None:
+            for alert in alerts:
+                self.on_alert(alert)
+        return alerts
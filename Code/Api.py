@@ -0,0 +1,79 @@
+from typing import Dict, Iterable, Iterator, List, Optional
+
+try:
+    from Code.ParserClass import TracerouteParser, split_traces
+    from Code.TracerouteAnalyzerClass import TracerouteAnalyzer
+except ImportError:
+    from ParserClass import TracerouteParser, split_traces
+    from TracerouteAnalyzerClass import TracerouteAnalyzer
+
+
+class TracerouteSession:
+    # Корректор и анализатор создаются один раз и переиспользуются для всех трассировок
+    def __init__(self, autocorrect: bool = True, enable_geo: bool = False, baseline=None,
+                 analyzer: Optional[TracerouteAnalyzer] = None, exporter=None):
+        self.corrector = None
+        if autocorrect:
+            try:
+                from Code.AutoCorrector import TracerouteAutoCorrector
+            except ImportError:
+                from AutoCorrector import TracerouteAutoCorrector
+            self.corrector = TracerouteAutoCorrector()
+        # Готовый анализатор можно разделить между сессиями (например, с коррекцией и без)
+        self.analyzer = analyzer or TracerouteAnalyzer(enable_geo=enable_geo, baseline=baseline)
+        # HopExporter: каждая разобранная трассировка дописывается в колоночную выгрузку
+        self.exporter = exporter
+
+    def analyze_chunk(self, chunk: str) -> Dict:
+        fixes = []
+        if self.corrector is not None:
+            chunk, fixes = self.corrector.correct(chunk)
+
+        parser = TracerouteParser()
+        parse_success = parser.parse_output(chunk)
+        issues = self.analyzer.analyze(parser)
+
+        result = {
+            'target_host': parser.target_host,
+            'target_ip': parser.target_ip,
+            'parse_success': parse_success,
+            'summary': parser.get_summary(),
+            'hops': parser.hops,
+            'issues': issues,
+            'locations': self.analyzer.hop_locations,
+            'fixes': fixes,
+            'errors': parser.errors,
+        }
+        if self.exporter is not None and parser.hops:
+            result['trace_id'] = self.exporter.write_trace(parser, issues, fixes)
+        return result
+
+
+def analyze_text(text: str, autocorrect: bool = True, enable_geo: bool = False, baseline=None,
+                 session: Optional[TracerouteSession] = None, exporter=None) -> List[Dict]:
+    # С session используется она (и ее настройки), остальные параметры не нужны
+    if session is None:
+        session = TracerouteSession(autocorrect, enable_geo, baseline, exporter=exporter)
+    return [session.analyze_chunk(chunk) for chunk in split_traces(text)]
+
+
+def analyze_stream(lines: Iterable[str], autocorrect: bool = True, enable_geo: bool = False,
+                   baseline=None, exporter=None) -> Iterator[Dict]:
+    # Результат по трассировке отдается сразу, как только начинается следующая
+    session = TracerouteSession(autocorrect, enable_geo, baseline, exporter=exporter)
+    current = []
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line.strip().startswith('traceroute to') and any(l.strip() for l in current):
+            yield session.analyze_chunk('\n'.join(current))
+            current = []
+        current.append(line)
+
+    if any(l.strip() for l in current):
+        yield session.analyze_chunk('\n'.join(current))
+
+
+def analyze_file(file_path: str, autocorrect: bool = True, enable_geo: bool = False, baseline=None,
+                 encoding: Optional[str] = 'utf-8', exporter=None) -> List[Dict]:
+    with open(file_path, 'r', encoding=encoding, errors='ignore') as f:
+        return list(analyze_stream(f, autocorrect, enable_geo, baseline, exporter))
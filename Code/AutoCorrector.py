@@ -1,10 +1,81 @@
 import re
-from typing import List, Tuple, Dict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+_IP_PATTERN = re.compile(r'^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$')
+_TRAILING_MS = re.compile(r'ms$')
+_REPEATED_MS = re.compile(r'(ms)+$')
+_NOT_NUMBER = re.compile(r'[^\d.]')
+
+# Строка прыжка в обычном формате traceroute ("N  host (ip)  t ms  t ms  t ms" или "N  * * *"):
+# ни одно правило и ни одна проверка прыжка ее не меняют, поэтому она пропускается целиком
+_IPV4 = r'\d{1,3}(?:\.\d{1,3}){3}'
+_PROBE = r'\s+(?:\d+(?:\.\d+)?\s?ms|\*)'
+_CLEAN_HOP = re.compile(
+    r'\d+\s+(?:(?:(?P<ip>' + _IPV4 + r')\s+\((?P=ip)\)|[^\s()]*[^\s()\d.ms][^\s()]*\s+\(' + _IPV4 + r'\))'
+    r'(?:' + _PROBE + r'){3,}|\*(?:' + _PROBE + r'){2,})')
+
+
+def _clean_header_ip(match) -> str:
+    return f"({match.group(1).replace('ms', '')})"
+
+
+def _header_ip_message(match) -> str:
+    return f"Очищен IP в заголовке: {match.group(1).replace('ms', '')}"
+
+
+class CorrectionRule:
+    # Замена по регулярному выражению. scope: 'line' — строки прыжков и заголовки, 'hop' или 'header' — только они.
+    # trigger — подстрока в нижнем регистре, без которой правило заведомо не сработает;
+    # unless — с которой не применяется.
+    # message — текст исправления или функция от первого совпадения; None — тихая нормализация
+    def __init__(self, name: str, scope: str, pattern: str, replacement: Union[str, Callable], trigger: str,
+                 message: Union[str, Callable, None] = None, flags: int = 0, count: int = 0,
+                 unless: Optional[str] = None):
+        if scope not in ('line', 'hop', 'header'):
+            raise ValueError(f"Неизвестная область правила: {scope}")
+        self.name = name
+        self.scope = scope
+        self.regex = re.compile(pattern, flags)
+        self.replacement = replacement
+        self.trigger = trigger
+        self.message = message
+        self.count = count
+        self.unless = unless
+
+
+# Порядок важен: правила применяются сверху вниз
+CORRECTION_RULES = (
+    CorrectionRule('timeout_word', 'line', r'timeout', '*', 'timeout', "Заменен 'timeout' на '*'",
+                   flags=re.IGNORECASE, unless='*'),
+    CorrectionRule('hop_number_ms', 'hop', r'^(\d+)ms\b', r'\1', 'ms', "Удален 'ms' из номера прыжка"),
+    CorrectionRule('ms_spacing', 'line', r'\s+ms\b', 'ms', 'ms'),  # "30.123 ms" → "30.123ms"
+    CorrectionRule('double_ms', 'line', r'\bms\s+ms', 'ms', 'ms'),  # "30.456ms ms" → "30.456ms"
+    CorrectionRule('header_hops_ms', 'header', r'(\d+)ms(\s+hops)', r'\1\2', 'ms', "Исправлен заголовок",
+                   flags=re.IGNORECASE),  # 30ms hops → 30 hops
+    CorrectionRule('header_bytes_ms', 'header', r'(\d+)ms(\s+byte)', r'\1\2', 'ms', "Исправлен заголовок",
+                   flags=re.IGNORECASE),  # 60ms byte → 60 byte
+    CorrectionRule('header_ip_ms', 'header', r'\(([^)]*ms[^)]*)\)', _clean_header_ip, 'ms', _header_ip_message,
+                   count=1),
+)
 
 
 class TracerouteAutoCorrector:
-    def __init__(self):
+    # Обработчик выбирается по первому символу: цифра — прыжок, 't' — заголовок,
+    # остальные строки получают только общие правила (и правила заголовка, если в них есть 'traceroute')
+    _DISPATCH = dict.fromkeys('0123456789', '_correct_hop')
+    _DISPATCH.update(t='_correct_header', T='_correct_header')
+
+    def __init__(self, rules: Iterable[CorrectionRule] = CORRECTION_RULES):
         self.corrections_applied = []
+        rules = tuple(rules)
+        # Таблица правил компилируется один раз: для каждого вида строки — свой список в исходном порядке
+        self.rules = {scope: tuple(rule for rule in rules if rule.scope in ('line', scope))
+                      for scope in ('hop', 'header', 'line')}
+        self.triggers = {scope: tuple({rule.trigger for rule in scope_rules})
+                         for scope, scope_rules in self.rules.items()}
+        self.dispatch = {char: getattr(self, name) for char, name in self._DISPATCH.items()}
+        # Шаблон чистой строки выведен из стандартной таблицы; свои правила могут менять и такие строки
+        self.clean_hop = _CLEAN_HOP if rules == CORRECTION_RULES else None
 
     def correct(self, traceroute_output: str) -> Tuple[str, List[str]]:
         original_lines = traceroute_output.split('\n')
@@ -17,56 +88,88 @@ class TracerouteAutoCorrector:
 
         return '\n'.join(corrected_lines), self.corrections_applied
 
-    def _smart_correct_line(self, line: str, line_num: int) -> str:
-        original = line.rstrip()
-        if not original:
-            return line
+    def correct_line(self, line: str, line_num: int) -> str:
+        # Построчная коррекция для потокового ввода; исправления копятся в corrections_applied
+        return self._smart_correct_line(line, line_num)
 
-        initial_spaces = len(line) - len(line.lstrip())
+    def diff(self, traceroute_output: str, name: str = 'traceroute') -> Tuple[str, List[str]]:
+        # Пробный прогон: unified diff только измененных строк, без контекста
+        self.corrections_applied = []
+        hunks = ''.join(self._iter_hunks(traceroute_output.split('\n')))
+        if not hunks:
+            return '', self.corrections_applied
+        return f"--- a/{name}\n+++ b/{name}\n{hunks}", self.corrections_applied
+
+    def _iter_hunks(self, lines: List[str]) -> Iterator[str]:
+        # Коррекция построчная, номера строк до и после совпадают: соседние изменения — один блок
+        removed = []
+        added = []
+        start = 0
+        for i, line in enumerate(lines, 1):
+            corrected = self._smart_correct_line(line, i)
+            if corrected != line:
+                if not removed:
+                    start = i
+                removed.append(f"-{line}\n")
+                added.append(f"+{corrected}\n")
+            elif removed:
+                yield f"@@ -{start},{len(removed)} +{start},{len(added)} @@\n" + ''.join(removed) + ''.join(added)
+                removed = []
+                added = []
+        if removed:
+            yield f"@@ -{start},{len(removed)} +{start},{len(added)} @@\n" + ''.join(removed) + ''.join(added)
 
-        working_line = original.strip()
+    def _smart_correct_line(self, line: str, line_num: int) -> str:
+        working_line = line.strip()
+        if not working_line:
+            return line
 
-        working_line = self._fix_obvious_errors(working_line, line_num)
+        handler = self.dispatch.get(working_line[0], self._correct_other)
+        return handler(line, working_line, line_num)
 
-        words = working_line.split()
-        if not words:
+    def _correct_hop(self, line: str, working_line: str, line_num: int) -> str:
+        # Чистая строка заканчивается на " ms" или '*': остальные не стоит проверять регулярным выражением
+        if (self.clean_hop is not None and working_line.endswith((' ms', '*'))
+                and self.clean_hop.fullmatch(working_line)):
             return line
 
-        if words[0].isdigit() and len(words) > 1:
+        working_line = self._apply_rules('hop', working_line, line_num)
+        words = working_line.split()
+        if len(words) > 1 and words[0].isdigit():
             working_line = self._process_hop_line(words, line_num)
-        elif 'traceroute' in working_line.lower():
-            working_line = self._fix_header(working_line, line_num)
-        else:
-            pass
-
-        return ' ' * initial_spaces + working_line
-
-    def _fix_obvious_errors(self, line: str, line_num: int) -> str:
-        fixed = line
-
-        if 'timeout' in fixed.lower() and '*' not in fixed:
-            fixed = re.sub(r'timeout', '*', fixed, flags=re.IGNORECASE)
-            self._add_fix(line_num, "Заменен 'timeout' на '*'")
 
-        fixed = re.sub(r'^(\d+)ms\b', r'\1', fixed)
-        if fixed != line:
-            self._add_fix(line_num, "Удален 'ms' из номера прыжка")
+        return line[:len(line) - len(line.lstrip())] + working_line
 
-        fixed = re.sub(r'\s+ms\b', 'ms', fixed)  # "30.123 ms" → "30.123ms"
-        fixed = re.sub(r'\bms\s+ms', 'ms', fixed)  # "30.456ms ms" → "30.456ms"
+    def _correct_header(self, line: str, working_line: str, line_num: int) -> str:
+        lowered = working_line.lower()
+        if 'traceroute' not in lowered or not any(trigger in lowered for trigger in self.triggers['header']):
+            return line
 
-        if 'traceroute' in fixed.lower():
-            fixed = re.sub(r'(\d+)ms(\s+hops)', r'\1\2', fixed, flags=re.IGNORECASE)
-            fixed = re.sub(r'(\d+)ms(\s+byte)', r'\1\2', fixed, flags=re.IGNORECASE)
-            ip_match = re.search(r'\(([^)]+)\)', fixed)
-            if ip_match:
-                ip_text = ip_match.group(1)
-                if 'ms' in ip_text:
-                    clean_ip = ip_text.replace('ms', '')
-                    fixed = fixed.replace(ip_text, clean_ip)
-                    self._add_fix(line_num, f"Очищен IP в заголовке: {clean_ip}")
+        return line[:len(line) - len(line.lstrip())] + self._apply_rules('header', working_line, line_num)
 
-        return fixed
+    def _correct_other(self, line: str, working_line: str, line_num: int) -> str:
+        # Заголовок с префиксом ("$ traceroute ...") или прочая строка: без разбора на пробы
+        lowered = working_line.lower()
+        if 'traceroute' in lowered:
+            return self._correct_header(line, working_line, line_num)
+        if not any(trigger in lowered for trigger in self.triggers['line']):
+            return line
+        return line[:len(line) - len(line.lstrip())] + self._apply_rules('line', working_line, line_num)
+
+    def _apply_rules(self, scope: str, line: str, line_num: int) -> str:
+        lowered = line.lower()
+        for rule in self.rules[scope]:
+            if rule.trigger not in lowered or (rule.unless is not None and rule.unless in line):
+                continue
+            match = rule.regex.search(line)
+            if match is None:
+                continue
+
+            line = rule.regex.sub(rule.replacement, line, rule.count)
+            lowered = line.lower()
+            if rule.message is not None:
+                self._add_fix(line_num, rule.message if isinstance(rule.message, str) else rule.message(match))
+        return line
 
     def _process_hop_line(self, words: List[str], line_num: int) -> str:
         hop_number = words[0]
@@ -96,9 +199,10 @@ class TracerouteAutoCorrector:
                 else:
                     result_parts.append(f"({ip_address})")
                     self._add_fix(line_num, f"Добавлены скобки для IP: {ip_address}")
-            else:
+            elif current_word != '*':
                 result_parts.append(current_word)
                 i += 1
+            # '*' на месте узла — первая проба таймаута, а не имя хоста
 
         times = []
         while i < len(words):
@@ -107,56 +211,33 @@ class TracerouteAutoCorrector:
             if word == '*':
                 times.append('*')
             elif self._looks_like_time(word):
-                clean_time = re.sub(r'(ms)+$', 'ms', word)
+                clean_time = _REPEATED_MS.sub('ms', word)
                 if not clean_time.endswith('ms'):
                     clean_time += 'ms'
                     self._add_fix(line_num, f"Добавлено 'ms' к времени: {word}")
-                times.append(clean_time)
+                times.append(clean_time[:-2] + ' ms')
             else:
                 times.append(word)
 
             i += 1
 
-        result_parts.extend(times)
+        for _ in range(3 - len(times)):
+            times.append('*')
+            self._add_fix(line_num, "Добавлен недостающий таймаут")
 
-        time_count = sum(1 for t in times if t != '*')
-        if time_count < 3 and len(times) < 3:
-            for _ in range(3 - len(times)):
-                result_parts.append('*')
-                self._add_fix(line_num, "Добавлен недостающий таймаут")
-
-        return ' '.join(result_parts)
-
-    def _fix_header(self, line: str, line_num: int) -> str:
-        patterns_to_fix = [
-            (r'(\d+)ms(\s+hops)', r'\1\2'),  # 30ms hops → 30 hops
-            (r'(\d+)ms(\s+byte)', r'\1\2'),  # 60ms byte → 60 byte
-        ]
-
-        fixed = line
-        for pattern, replacement in patterns_to_fix:
-            new_fixed = re.sub(pattern, replacement, fixed, flags=re.IGNORECASE)
-            if new_fixed != fixed:
-                self._add_fix(line_num, "Исправлен заголовок")
-                fixed = new_fixed
-
-        ip_match = re.search(r'\(([^)]+)\)', fixed)
-        if ip_match:
-            ip_text = ip_match.group(1)
-            if 'ms' in ip_text:
-                clean_ip = ip_text.replace('ms', '')
-                fixed = fixed.replace(ip_text, clean_ip)
-                self._add_fix(line_num, f"Очищен IP в заголовке: {clean_ip}")
-
-        return fixed
+        # Исправленная строка собирается в раскладке traceroute, как и чистые строки, которые пропускаются
+        # целиком: два пробела после номера и перед временем, один — перед '*' и IP в скобках
+        line = hop_number
+        for index, part in enumerate(result_parts[1:] + times):
+            line += ' ' + part if index and (part == '*' or part.startswith('(')) else '  ' + part
+        return line
 
     def _is_valid_ip(self, text: str) -> bool:
         if not text or text == '*':
             return False
 
         clean_text = text.replace('ms', '')
-        ip_pattern = r'^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$'
-        if not re.match(ip_pattern, clean_text):
+        if not _IP_PATTERN.match(clean_text):
             return False
 
         try:
@@ -165,16 +246,16 @@ class TracerouteAutoCorrector:
                 if not 0 <= int(octet) <= 255:
                     return False
             return True
-        except:
+        except ValueError:
             return False
 
     def _looks_like_time(self, text: str) -> bool:
         if not text or text == '*':
             return False
 
-        clean_text = re.sub(r'ms$', '', text)
+        clean_text = _TRAILING_MS.sub('', text)
 
-        clean_text = re.sub(r'[^\d.]', '', clean_text)
+        clean_text = _NOT_NUMBER.sub('', clean_text)
 
         if not clean_text:
             return False
@@ -182,8 +263,42 @@ class TracerouteAutoCorrector:
         try:
             value = float(clean_text)
             return 0.01 <= value <= 5000
-        except:
+        except ValueError:
             return False
 
     def _add_fix(self, line_num: int, message: str):
         self.corrections_applied.append(f"Строка {line_num}: {message}")
+
+
+def main():
+    # argparse нужен только CLI: сам модуль импортируют воркеры и основной анализ
+    import argparse
+    import sys
+
+    arg_parser = argparse.ArgumentParser(description="Автокоррекция вывода traceroute")
+    arg_parser.add_argument('file')
+    arg_parser.add_argument('--dry-run', action='store_true', help="Показать diff исправленных строк, файл не писать")
+    arg_parser.add_argument('--output', help="Куда записать исправленный вывод (по умолчанию stdout)")
+    args = arg_parser.parse_args()
+
+    with open(args.file, 'r', encoding='utf-8', errors='ignore') as f:
+        content = f.read()
+
+    corrector = TracerouteAutoCorrector()
+    if args.dry_run:
+        diff, fixes = corrector.diff(content, args.file)
+        sys.stdout.write(diff)
+        print(f"🔧 Исправлений: {len(fixes)}", file=sys.stderr)
+        return
+
+    corrected, fixes = corrector.correct(content)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(corrected)
+    else:
+        sys.stdout.write(corrected)
+    print(f"🔧 Исправлений: {len(fixes)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import math
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+def trace_samples(hops: List[Dict]) -> List[Tuple[str, Optional[float], float]]:
+    # Замеры (IP, задержка, потери) по прыжкам трассировки — то, что пишется в базовые линии
+    samples = []
+    for hop in hops:
+        ip = hop['ip_address']
+        if ip and ip != '*':
+            samples.append((ip, hop.get('avg_time'), hop['packet_loss']))
+    return samples
+
+
+class BaselineStore:
+    # Скользящие базовые линии задержки/потерь по ключу (цель, IP прыжка).
+    # Писатель у файла должен быть один: кэш и INSERT OR REPLACE не согласуются между процессами.
+    # read_only — для воркеров: читают без кэша и видят то, что записал писатель при последнем flush
+    def __init__(self, db_path: str = ':memory:', alpha: float = 0.1, batch_size: int = 1000,
+                 max_cached: int = 100000, read_only: bool = False):
+        self.db_path = db_path
+        self.alpha = alpha
+        self.batch_size = batch_size
+        self.max_cached = max_cached
+        self.read_only = read_only
+        self._cache = {}
+        self._dirty = set()
+        self._pending = 0
+
+        if read_only:
+            self.connection = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+            return
+
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS baselines ('
+            ' target TEXT NOT NULL,'
+            ' ip_address TEXT NOT NULL,'
+            ' samples INTEGER NOT NULL,'
+            ' latency_samples INTEGER NOT NULL,'
+            ' latency_mean REAL NOT NULL,'
+            ' latency_var REAL NOT NULL,'
+            ' loss_mean REAL NOT NULL,'
+            ' updated REAL NOT NULL,'
+            ' PRIMARY KEY (target, ip_address)'
+            ') WITHOUT ROWID'
+        )
+        self.connection.commit()
+
+    def get(self, target: str, ip_address: str) -> Optional[Dict]:
+        entry = self._load(target, ip_address)
+        if entry is None:
+            return None
+
+        samples, latency_samples, latency_mean, latency_var, loss_mean, updated = entry
+        return {
+            'samples': samples,
+            'latency_samples': latency_samples,
+            'latency_mean': latency_mean,
+            'latency_std': math.sqrt(latency_var),
+            'loss_mean': loss_mean,
+            'updated': updated,
+        }
+
+    def _load(self, target: str, ip_address: str) -> Optional[list]:
+        key = (target, ip_address)
+        entry = self._cache.get(key)
+        if entry is None:
+            row = self.connection.execute(
+                'SELECT samples, latency_samples, latency_mean, latency_var, loss_mean, updated'
+                ' FROM baselines WHERE target = ? AND ip_address = ?',
+                key
+            ).fetchone()
+            if row is None:
+                return None
+            entry = list(row)
+            if not self.read_only:
+                self._cache[key] = entry
+        return entry
+
+    def update_trace(self, parser, timestamp: Optional[float] = None):
+        target = parser.target_ip or parser.target_host
+        if target:
+            self.update_samples(target, trace_samples(parser.hops), timestamp)
+
+    def update_samples(self, target: str, samples: List[Tuple[str, Optional[float], float]],
+                       timestamp: Optional[float] = None):
+        # Замеры одной трассировки; так же их применяет единственный писатель, получив от воркеров
+        if self.read_only:
+            raise ValueError("Базовые линии открыты только для чтения")
+        if timestamp is None:
+            timestamp = time.time()
+
+        for ip, latency, loss in samples:
+            self._update_hop(target, ip, latency, loss, timestamp)
+
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def _update_hop(self, target: str, ip_address: str, latency: Optional[float], loss: float, timestamp: float):
+        key = (target, ip_address)
+        entry = self._load(target, ip_address)
+
+        # samples — замеры потерь (каждое появление узла), latency_samples — только с известной задержкой
+        if entry is None:
+            if latency is None:
+                self._cache[key] = [1, 0, 0.0, 0.0, loss, timestamp]
+            else:
+                self._cache[key] = [1, 1, latency, 0.0, loss, timestamp]
+            self._dirty.add(key)
+            return
+
+        samples, latency_samples, latency_mean, latency_var, loss_mean, _ = entry
+        if latency is not None:
+            if latency_samples == 0:
+                # Среднее задается первой известной задержкой, а не сглаживается от нуля
+                latency_mean = latency
+            else:
+                # EWMA среднего и дисперсии
+                delta = latency - latency_mean
+                latency_mean += self.alpha * delta
+                latency_var = (1 - self.alpha) * (latency_var + self.alpha * delta * delta)
+            latency_samples += 1
+
+        loss_mean += self.alpha * (loss - loss_mean)
+        entry[:] = [samples + 1, latency_samples, latency_mean, latency_var, loss_mean, timestamp]
+        self._dirty.add(key)
+
+    def flush(self):
+        if self._dirty:
+            rows = [(target, ip) + tuple(self._cache[(target, ip)]) for target, ip in self._dirty]
+            # Одна транзакция на пачку трассировок вместо fsync на каждую запись
+            with self.connection:
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO baselines'
+                    ' (target, ip_address, samples, latency_samples, latency_mean, latency_var, loss_mean, updated)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    rows
+                )
+            self._dirty.clear()
+
+        self._pending = 0
+        if len(self._cache) > self.max_cached:
+            self._cache.clear()
+
+    def close(self):
+        if not self.read_only:
+            self.flush()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
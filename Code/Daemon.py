@@ -0,0 +1,295 @@
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import shutil
+import signal
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional
+
+try:
+    from Code.Workers import init_worker, open_baseline_writer, apply_baseline_updates, apply_export, analyze_content
+except ImportError:
+    from Workers import init_worker, open_baseline_writer, apply_baseline_updates, apply_export, analyze_content
+
+
+def process_file(file_path: str, autocorrect: bool = True, export: bool = False) -> Dict:
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        content = f.read()
+
+    result = {'file': os.path.basename(file_path)}
+    result.update(analyze_content(content, autocorrect, export))
+    return result
+
+
+def move_unique(file_path: str, directory: str) -> str:
+    # Файл с тем же именем уже обработан раньше: добавляем суффикс, а не перезаписываем
+    name, extension = os.path.splitext(os.path.basename(file_path))
+    target = os.path.join(directory, name + extension)
+    suffix = 1
+    while os.path.exists(target):
+        target = os.path.join(directory, f"{name}.{suffix}{extension}")
+        suffix += 1
+    shutil.move(file_path, target)
+    return target
+
+
+class JsonLinesSink:
+    def __init__(self, file_path: str):
+        self.file = open(file_path, 'a', encoding='utf-8')
+
+    def __call__(self, result: Dict):
+        self.file.write(json.dumps(result, ensure_ascii=False, default=list) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class InotifyWatcher:
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_Q_OVERFLOW = 0x00004000
+    _EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, directory: str):
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            raise OSError("libc недоступна")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify недоступен")
+
+        self.fd = libc.inotify_init1(os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), self.IN_CLOSE_WRITE | self.IN_MOVED_TO) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch")
+
+    def wait(self, timeout: float) -> Optional[List[str]]:
+        # None — очередь ядра переполнилась и события потеряны: нужен полный обход папки
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+
+        names = []
+        overflow = False
+        data = os.read(self.fd, 65536)
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = self._EVENT_HEADER.unpack_from(data, offset)
+            offset += self._EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                overflow = True
+            elif name:
+                names.append(os.fsdecode(name))
+        return None if overflow else names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class TracerouteDaemon:
+    def __init__(self, inbox: str, sink: Callable[[Dict], None], workers: int = 4, max_pending: int = 64,
+                 autocorrect: bool = True, enable_geo: bool = False, baseline_path: Optional[str] = None,
+                 poll_interval: float = 1.0, use_inotify: bool = True, alerts=None, exporter=None):
+        self.inbox = inbox
+        self.sink = sink
+        self.workers = workers
+        self.max_pending = max_pending
+        self.autocorrect = autocorrect
+        self.enable_geo = enable_geo
+        self.baseline_path = baseline_path
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        # AlertEngine: в результатах воркеров нет прыжков, поэтому работают только правила по целям
+        self.alerts = alerts
+        # HopExporter: воркеры присылают прыжки, выгрузку пишет только родитель
+        self.exporter = exporter
+
+        self.done_dir = os.path.join(inbox, 'processed')
+        self.failed_dir = os.path.join(inbox, 'failed')
+        self.stop_event = threading.Event()
+        self.baseline = None
+        self.pending = {}
+        self._last_seen = {}
+        self.processed = 0
+        self.failed = 0
+
+    def stop(self, *_):
+        self.stop_event.set()
+
+    def run(self):
+        os.makedirs(self.done_dir, exist_ok=True)
+        os.makedirs(self.failed_dir, exist_ok=True)
+
+        watcher = None
+        if self.use_inotify:
+            try:
+                watcher = InotifyWatcher(self.inbox)
+            except OSError:
+                watcher = None
+
+        self.baseline = open_baseline_writer(self.baseline_path)
+        executor = ProcessPoolExecutor(self.workers, initializer=init_worker,
+                                       initargs=(self.enable_geo, self.baseline_path))
+        try:
+            # Файлы, пришедшие до запуска, тоже обрабатываем
+            self._submit_files(executor, self._scan_inbox())
+            while not self.stop_event.is_set():
+                if watcher is not None:
+                    names = watcher.wait(self.poll_interval)
+                    if names is None:
+                        self._submit_files(executor, self._scan_inbox())
+                    else:
+                        self._submit_files(executor, [os.path.join(self.inbox, name) for name in names])
+                else:
+                    self.stop_event.wait(self.poll_interval)
+                    self._submit_files(executor, self._stable_files())
+                self._collect(timeout=0)
+                if self.alerts is not None:
+                    self._sink_alerts(self.alerts.tick())
+
+            self._collect(timeout=None)
+        finally:
+            executor.shutdown(wait=True)
+            if watcher is not None:
+                watcher.close()
+            if self.baseline is not None:
+                self.baseline.close()
+
+    def _scan_inbox(self) -> List[str]:
+        files = []
+        for entry in os.scandir(self.inbox):
+            if entry.is_file() and not entry.name.startswith('.') and entry.path not in self.pending:
+                files.append(entry.path)
+        files.sort()
+        return files
+
+    def _stable_files(self) -> List[str]:
+        # При опросе берем только файлы, размер и время изменения которых не менялись с прошлого прохода
+        stable = []
+        current = {}
+        for file_path in self._scan_inbox():
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            current[file_path] = (stat.st_size, stat.st_mtime)
+            if self._last_seen.get(file_path) == current[file_path]:
+                stable.append(file_path)
+        self._last_seen = current
+        return stable
+
+    def _submit_files(self, executor, files: List[str]):
+        for file_path in files:
+            if (file_path in self.pending or os.path.basename(file_path).startswith('.')
+                    or not os.path.isfile(file_path)):
+                continue
+            # Обратное давление: не берем новые файлы, пока очередь воркеров заполнена
+            while len(self.pending) >= self.max_pending and not self.stop_event.is_set():
+                self._collect(timeout=self.poll_interval, block=True)
+            if self.stop_event.is_set():
+                return
+            future = executor.submit(process_file, file_path, self.autocorrect, self.exporter is not None)
+            self.pending[file_path] = future
+
+    def _collect(self, timeout: Optional[float], block: bool = False):
+        if not self.pending:
+            return
+
+        if timeout is None:
+            done = set(self.pending.values())
+            wait(done)
+        elif block:
+            done, _ = wait(self.pending.values(), timeout=timeout, return_when=FIRST_COMPLETED)
+        else:
+            done = {future for future in self.pending.values() if future.done()}
+
+        for file_path, future in list(self.pending.items()):
+            if future not in done:
+                continue
+            del self.pending[file_path]
+
+            try:
+                result = future.result()
+            except Exception as e:
+                self.failed += 1
+                self.sink({'file': os.path.basename(file_path), 'error': str(e)})
+                move_unique(file_path, self.failed_dir)
+                continue
+
+            apply_baseline_updates(self.baseline, result)
+            apply_export(self.exporter, result)
+            self.sink(result)
+            if self.alerts is not None:
+                for trace in result['traces']:
+                    summary = trace['summary']
+                    target = summary.get('target_ip') or summary.get('target_host') or result['file']
+                    self._sink_alerts(self.alerts.observe_result(target, trace['issues']))
+            self.processed += 1
+            move_unique(file_path, self.done_dir)
+
+    def _sink_alerts(self, alerts: List[Dict]):
+        for alert in alerts:
+            self.sink({'alert': alert})
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Фоновый анализ traceroute из входящей папки")
+    arg_parser.add_argument('inbox')
+    arg_parser.add_argument('output', help="JSON Lines файл с результатами")
+    arg_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    arg_parser.add_argument('--max-pending', type=int, default=64)
+    arg_parser.add_argument('--no-autocorrect', action='store_true')
+    arg_parser.add_argument('--geo', action='store_true')
+    arg_parser.add_argument('--baseline')
+    arg_parser.add_argument('--poll', action='store_true', help="Опрос папки вместо inotify")
+    arg_parser.add_argument('--alert-window', type=float,
+                            help="Тревоги по целям: длина окна в секундах (правила N из M)")
+    arg_parser.add_argument('--export', metavar='BASE', help="Колоночная выгрузка: BASE_hops, BASE_probes, ...")
+    arg_parser.add_argument('--export-format', default='auto', choices=('auto', 'parquet', 'arrow', 'csv'))
+    args = arg_parser.parse_args()
+
+    alerts = None
+    if args.alert_window:
+        try:
+            from Code.Alerts import AlertEngine
+        except ImportError:
+            from Alerts import AlertEngine
+        alerts = AlertEngine(window_seconds=args.alert_window)
+
+    exporter = None
+    if args.export:
+        try:
+            from Code.Exporter import HopExporter
+        except ImportError:
+            from Exporter import HopExporter
+        exporter = HopExporter(args.export, args.export_format)
+
+    sink = JsonLinesSink(args.output)
+    daemon = TracerouteDaemon(args.inbox, sink, workers=args.workers, max_pending=args.max_pending,
+                              autocorrect=not args.no_autocorrect, enable_geo=args.geo,
+                              baseline_path=args.baseline, use_inotify=not args.poll, alerts=alerts,
+                              exporter=exporter)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+
+    print(f"👀 Слежу за папкой {args.inbox}")
+    try:
+        daemon.run()
+    finally:
+        sink.close()
+        if exporter is not None:
+            exporter.close()
+    print(f"👋 Остановлено: обработано {daemon.processed}, с ошибками {daemon.failed}")
+
+
+if __name__ == "__main__":
+    main()
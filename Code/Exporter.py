@@ -0,0 +1,179 @@
+import csv
+from typing import Dict, Iterable, List, Optional
+
+
+class HopExporter:
+    # Колоночная выгрузка прыжков, проблем и исправлений пачками (row group).
+    # Задержки — в длинном формате (строка на пробу): число проб зависит от traceroute -q и не теряется
+    TABLES = {
+        'hops': ['trace_id', 'target', 'hop_number', 'ip_address', 'hostname', 'probe_count', 'packet_loss', 'type'],
+        'probes': ['trace_id', 'hop_number', 'probe', 'rtt'],
+        'issues': ['trace_id', 'target', 'type', 'hop_number', 'message'],
+        'traces': ['trace_id', 'target_host', 'target_ip', 'hop_count', 'issue_count', 'fix_count'],
+    }
+    COLUMN_TYPES = {
+        'trace_id': 'int64', 'hop_number': 'int32', 'hop_count': 'int32', 'issue_count': 'int32',
+        'fix_count': 'int32', 'probe_count': 'int32', 'probe': 'int32', 'rtt': 'float64', 'packet_loss': 'float64',
+    }
+
+    def __init__(self, base_path: str, fmt: str = 'auto', row_group_size: int = 10000):
+        self.base_path = base_path
+        self.row_group_size = row_group_size
+        self._schemas = {}
+        self.fmt = self._resolve_format(fmt)
+        self.next_trace_id = 0
+        self.rows_written = {name: 0 for name in self.TABLES}
+        self._buffers = {name: {column: [] for column in columns} for name, columns in self.TABLES.items()}
+        self._writers = {}
+        self._files = {}
+
+    def _resolve_format(self, fmt: str) -> str:
+        if fmt not in ('auto', 'parquet', 'arrow', 'csv'):
+            raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+        if fmt == 'csv':
+            return fmt
+
+        try:
+            import pyarrow
+            import pyarrow.parquet
+            self._pa = pyarrow
+            self._pq = pyarrow.parquet
+        except ImportError:
+            if fmt != 'auto':
+                raise
+            return 'csv'
+
+        # Явная схема: пачка из одних None не должна менять типы колонок
+        for name, columns in self.TABLES.items():
+            self._schemas[name] = pyarrow.schema(
+                [(column, pyarrow.type_for_alias(self.COLUMN_TYPES.get(column, 'string'))) for column in columns]
+            )
+
+        return 'parquet' if fmt == 'auto' else fmt
+
+    def path_for(self, table: str) -> str:
+        extension = {'parquet': '.parquet', 'arrow': '.arrow', 'csv': '.csv'}[self.fmt]
+        return f"{self.base_path}_{table}{extension}"
+
+    def write_trace(self, parser, issues: Optional[List[Dict]] = None, fixes: Optional[List[str]] = None,
+                    trace_id: Optional[int] = None) -> int:
+        return self._write_rows(parser.target_host, parser.target_ip, parser.hops, issues, fixes, trace_id)
+
+    def write_result(self, result: Dict, trace_id: Optional[int] = None) -> int:
+        # Результат Api.analyze_text / TracerouteSession.analyze_chunk — без парсера, например из воркера
+        return self._write_rows(result['target_host'], result['target_ip'], result['hops'], result['issues'],
+                                result['fixes'], trace_id)
+
+    def _write_rows(self, target_host: Optional[str], target_ip: Optional[str], hop_list: List[Dict],
+                    issues: Optional[List[Dict]], fixes: Optional[List[str]], trace_id: Optional[int]) -> int:
+        if trace_id is None:
+            trace_id = self.next_trace_id
+        self.next_trace_id = max(self.next_trace_id, trace_id + 1)
+
+        issues = issues or []
+        target = target_ip or target_host
+
+        hops = self._buffers['hops']
+        probes = self._buffers['probes']
+        for hop in hop_list:
+            times = hop['times']
+            hops['trace_id'].append(trace_id)
+            hops['target'].append(target)
+            hops['hop_number'].append(hop['hop_number'])
+            hops['ip_address'].append(hop['ip_address'])
+            hops['hostname'].append(hop['hostname'])
+            hops['probe_count'].append(len(times))
+            hops['packet_loss'].append(hop['packet_loss'])
+            hops['type'].append(hop['type'])
+            # Таймаут — строка с пустой задержкой: номер пробы сохраняет порядок
+            for probe, rtt in enumerate(times, 1):
+                probes['trace_id'].append(trace_id)
+                probes['hop_number'].append(hop['hop_number'])
+                probes['probe'].append(probe)
+                probes['rtt'].append(rtt)
+
+        issue_columns = self._buffers['issues']
+        for issue in issues:
+            issue_columns['trace_id'].append(trace_id)
+            issue_columns['target'].append(target)
+            issue_columns['type'].append(issue['type'])
+            issue_columns['hop_number'].append(issue['hop_number'])
+            issue_columns['message'].append(issue['message'])
+
+        traces = self._buffers['traces']
+        traces['trace_id'].append(trace_id)
+        traces['target_host'].append(target_host)
+        traces['target_ip'].append(target_ip)
+        traces['hop_count'].append(len(hop_list))
+        traces['issue_count'].append(len(issues))
+        traces['fix_count'].append(len(fixes) if fixes else 0)
+
+        for name, columns in self._buffers.items():
+            if len(columns['trace_id']) >= self.row_group_size:
+                self._flush_table(name)
+
+        return trace_id
+
+    def write_batch(self, traces: Iterable) -> int:
+        # traces — парсеры или кортежи (parser, issues, fixes)
+        count = 0
+        for item in traces:
+            if isinstance(item, tuple):
+                self.write_trace(*item)
+            else:
+                self.write_trace(item)
+            count += 1
+        return count
+
+    def flush(self):
+        for name in self.TABLES:
+            self._flush_table(name)
+
+    def _flush_table(self, name: str):
+        columns = self._buffers[name]
+        row_count = len(columns['trace_id'])
+        if not row_count:
+            return
+
+        if self.fmt == 'csv':
+            writer = self._writers.get(name)
+            if writer is None:
+                f = open(self.path_for(name), 'w', encoding='utf-8', newline='')
+                writer = csv.writer(f)
+                writer.writerow(self.TABLES[name])
+                self._files[name] = f
+                self._writers[name] = writer
+            writer.writerows(zip(*(columns[column] for column in self.TABLES[name])))
+        else:
+            batch = self._pa.table({column: columns[column] for column in self.TABLES[name]},
+                                   schema=self._schemas[name])
+            writer = self._writers.get(name)
+            if writer is None:
+                if self.fmt == 'parquet':
+                    writer = self._pq.ParquetWriter(self.path_for(name), batch.schema)
+                else:
+                    sink = self._pa.OSFile(self.path_for(name), 'wb')
+                    self._files[name] = sink
+                    writer = self._pa.ipc.new_file(sink, batch.schema)
+                self._writers[name] = writer
+            writer.write_table(batch)
+
+        self.rows_written[name] += row_count
+        for values in columns.values():
+            values.clear()
+
+    def close(self):
+        self.flush()
+        for writer in self._writers.values():
+            if self.fmt != 'csv':
+                writer.close()
+        for f in self._files.values():
+            f.close()
+        self._writers.clear()
+        self._files.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
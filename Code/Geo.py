@@ -1,14 +1,33 @@
 from typing import Dict, List, Optional
 
+try:
+    from Code.Hostnames import HostnameEnricher
+    from Code.Symbols import hop_ip_key
+except ImportError:
+    from Hostnames import HostnameEnricher
+    from Symbols import hop_ip_key
+
+
 class GeoIP:
-    def __init__(self, enabled=True):
+    def __init__(self, enabled=True, enricher: Optional[HostnameEnricher] = None, resolver=None):
         self.cache = {}
         self.enabled = enabled
         self.timeout = 2
         self.max_workers = 5
+        # Страна по имени хоста точнее оценки по первому октету; обратный DNS — только с явным resolver
+        self.enricher = enricher if enricher is not None else HostnameEnricher()
+        self.resolver = resolver
 
         self._init_cache()
 
+    @staticmethod
+    def _has_name(hop: Dict) -> bool:
+        # У парсера host_id совпадает с ip_id, если имени нет; у прочих прыжков имя — не '*' и не сам адрес
+        if 'host_id' in hop and 'ip_id' in hop:
+            return hop['host_id'] != hop['ip_id']
+        hostname = hop.get('hostname')
+        return bool(hostname) and hostname != '*' and hostname != hop.get('ip_address')
+
     def _init_cache(self):
         common_ips = {
             '8.8.8.8': 'USA',
@@ -80,34 +99,62 @@ class GeoIP:
         if not self.enabled:
             return {
                 'hop_countries': {},
+                'hop_locations': {},
                 'unique_countries': set(),
+                'hostname_countries': set(),
                 'issues': []
             }
 
-        countries = {}
+        names = {}
+        if self.resolver is not None:
+            # Прыжки без имени: один пакетный запрос на все адреса маршрута
+            names = self.resolver.resolve(hop['ip_address'] for hop in hops
+                                          if hop_ip_key(hop) is not None and not self._has_name(hop))
+
+        # Оценка по первому октету и страна из имени хоста — разные источники: в одно множество стран
+        # их не смешиваем, иначе "USA/Europe" и "Germany" для одного маршрута дают лишнюю страну
+        address_countries = set()
+        hostname_countries = set()
         hop_countries = {}
+        hop_locations = {}
+        # Страна и место определяются один раз на узел, повторы узла в маршруте берутся из словаря
+        id_countries = {}
 
         for hop in hops:
-            ip = hop.get('ip_address')
-            if ip and ip != '*':
-                country = self.get_country(ip)
+            ip_key = hop_ip_key(hop)
+            if ip_key is not None:
+                entry = id_countries.get(ip_key)
+                if entry is None:
+                    hostname = hop['hostname'] if self._has_name(hop) else names.get(hop['ip_address'])
+                    location = self.enricher.enrich(hostname)
+                    entry = id_countries[ip_key] = (self.get_country(hop['ip_address']), location)
+                address_country, location = entry
+                if address_country:
+                    address_countries.add(address_country)
+                if location:
+                    hop_locations[hop['hop_number']] = location
+                    if 'country' in location:
+                        hostname_countries.add(location['country'])
+                # Для прыжка — лучшая оценка: по имени, если оно есть
+                country = location.get('country') or address_country
                 if country:
-                    countries[country] = countries.get(country, 0) + 1
                     hop_countries[hop['hop_number']] = country
 
         issues = []
-        unique_countries = set(countries.keys())
-
-        if len(unique_countries) > 4:
-            issues.append({
-                'type': 'too_many_countries',
-                'hop_number': max(hop_countries.keys()) if hop_countries else 1,
-                'message': f'Маршрут проходит через {len(unique_countries)} стран',
-                'countries': list(unique_countries)
-            })
+        for source, found in (('адресам', address_countries), ('именам узлов', hostname_countries)):
+            if len(found) > 4:
+                issues.append({
+                    'type': 'too_many_countries',
+                    'hop_number': max(hop_countries.keys()) if hop_countries else 1,
+                    'message': f'Маршрут проходит через {len(found)} стран (по {source})',
+                    'countries': sorted(found)
+                })
+                break
 
         return {
             'hop_countries': hop_countries,
-            'unique_countries': unique_countries,
+            'hop_locations': hop_locations,
+            'unique_countries': address_countries,
+            'hostname_countries': hostname_countries,
             'issues': issues
         }
\ No newline at end of file
@@ -0,0 +1,302 @@
+import ipaddress
+import random
+import re
+import socket
+import struct
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# IATA-коды, которые операторы ставят в имена маршрутизаторов: код -> город и страна
+AIRPORTS = {
+    'ams': {'city': 'Amsterdam', 'country': 'Netherlands'},
+    'arn': {'city': 'Stockholm', 'country': 'Sweden'},
+    'atl': {'city': 'Atlanta', 'country': 'USA'},
+    'bru': {'city': 'Brussels', 'country': 'Belgium'},
+    'cdg': {'city': 'Paris', 'country': 'France'},
+    'cph': {'city': 'Copenhagen', 'country': 'Denmark'},
+    'dfw': {'city': 'Dallas', 'country': 'USA'},
+    'dme': {'city': 'Moscow', 'country': 'Russia'},
+    'dus': {'city': 'Dusseldorf', 'country': 'Germany'},
+    'ewr': {'city': 'Newark', 'country': 'USA'},
+    'fra': {'city': 'Frankfurt', 'country': 'Germany'},
+    'gru': {'city': 'Sao Paulo', 'country': 'Brazil'},
+    'ham': {'city': 'Hamburg', 'country': 'Germany'},
+    'hel': {'city': 'Helsinki', 'country': 'Finland'},
+    'hkg': {'city': 'Hong Kong', 'country': 'Hong Kong'},
+    'iad': {'city': 'Ashburn', 'country': 'USA'},
+    'icn': {'city': 'Seoul', 'country': 'South Korea'},
+    'jfk': {'city': 'New York', 'country': 'USA'},
+    'lax': {'city': 'Los Angeles', 'country': 'USA'},
+    'led': {'city': 'Saint Petersburg', 'country': 'Russia'},
+    'lhr': {'city': 'London', 'country': 'United Kingdom'},
+    'mad': {'city': 'Madrid', 'country': 'Spain'},
+    'mia': {'city': 'Miami', 'country': 'USA'},
+    'muc': {'city': 'Munich', 'country': 'Germany'},
+    'mxp': {'city': 'Milan', 'country': 'Italy'},
+    'nrt': {'city': 'Tokyo', 'country': 'Japan'},
+    'ord': {'city': 'Chicago', 'country': 'USA'},
+    'osl': {'city': 'Oslo', 'country': 'Norway'},
+    'prg': {'city': 'Prague', 'country': 'Czechia'},
+    'sea': {'city': 'Seattle', 'country': 'USA'},
+    'sin': {'city': 'Singapore', 'country': 'Singapore'},
+    'sjc': {'city': 'San Jose', 'country': 'USA'},
+    'svo': {'city': 'Moscow', 'country': 'Russia'},
+    'syd': {'city': 'Sydney', 'country': 'Australia'},
+    'vie': {'city': 'Vienna', 'country': 'Austria'},
+    'waw': {'city': 'Warsaw', 'country': 'Poland'},
+    'yyz': {'city': 'Toronto', 'country': 'Canada'},
+    'zrh': {'city': 'Zurich', 'country': 'Switzerland'},
+}
+
+
+class HostnameRule:
+    # Правило для одной части имени (метки, разрезанные по '.' и '-'). Значение поля — value,
+    # иначе первая группа совпадения; с lookup значение обязано быть в словаре, его поля добавляются в результат.
+    # requires — поля, хотя бы одно из которых должно найтись в имени другими правилами, иначе совпадение
+    # не засчитывается
+    def __init__(self, field: str, pattern: str, value: Optional[str] = None, lookup: Optional[Dict] = None,
+                 requires: Iterable[str] = ()):
+        self.field = field
+        self.regex = re.compile(pattern, re.IGNORECASE)
+        self.value = value
+        self.lookup = lookup
+        self.requires = tuple(requires)
+
+    def apply(self, token: str) -> Optional[Dict]:
+        match = self.regex.fullmatch(token)
+        if match is None:
+            return None
+
+        value = self.value if self.value is not None else (match.group(1) if match.groups() else token)
+        if self.lookup is None:
+            return {self.field: value}
+        extra = self.lookup.get(value)
+        if extra is None:
+            return None
+        return {self.field: value, **extra}
+
+
+DEFAULT_HOSTNAME_RULES = (
+    HostnameRule('iata', r'([a-z]{3})\d+', lookup=AIRPORTS),  # fra1, fra03
+    # Голые три буквы (mad.example.com) — чаще слово, чем код: только рядом с ролью или интерфейсом
+    HostnameRule('iata', r'([a-z]{3})', lookup=AIRPORTS, requires=('role', 'interface')),
+    HostnameRule('interface', r'((?:ae|xe|et|ge|te|hu|be|po)\d*)'),
+    HostnameRule('role', r'(?:cr|ccr|core|bb)\d*', 'core'),
+    HostnameRule('role', r'(?:br|bdr|border|edge|er)\d*', 'edge'),
+    HostnameRule('role', r'(?:ar|agg|pe|dist)\d*', 'aggregation'),
+    HostnameRule('role', r'(?:ix|peer|pni)\d*', 'peering'),
+    HostnameRule('role', r'(?:r|rtr|router|gw)\d*', 'router'),
+)
+
+
+def format_location(location: Dict) -> str:
+    # Короткая подпись для отчетов: "Frankfurt (fra), core, ae1"
+    parts = []
+    if 'city' in location:
+        parts.append(f"{location['city']} ({location['iata']})")
+    parts.extend(location[field] for field in ('role', 'interface') if field in location)
+    return ', '.join(parts)
+
+
+class HostnameEnricher:
+    # Местоположение и роль маршрутизатора по его имени, например ae-1.r01.fra.de.backbone.net.
+    # Результат запоминается по имени хоста: стоимость зависит от числа разных маршрутизаторов, а не прыжков
+    def __init__(self, rules: Iterable[HostnameRule] = DEFAULT_HOSTNAME_RULES, max_cache: int = 100000):
+        self.rules = tuple(rules)
+        self.max_cache = max_cache
+        self.cache = OrderedDict()
+        self.misses = 0
+
+    def enrich(self, hostname: Optional[str]) -> Dict:
+        if not hostname or hostname == '*':
+            return {}
+
+        info = self.cache.get(hostname)
+        if info is not None:
+            self.cache.move_to_end(hostname)
+            return info
+
+        self.misses += 1
+        info = self._match(hostname)
+        if len(self.cache) >= self.max_cache:
+            self.cache.popitem(last=False)
+        self.cache[hostname] = info
+        return info
+
+    def _match(self, hostname: str) -> Dict:
+        labels = hostname.lower().rstrip('.').split('.')
+        # Домен второго уровня и зона — имя оператора, а не узла; голый IP правил не содержит
+        if len(labels) < 3 or not any(char.isalpha() for char in hostname):
+            return {}
+
+        info = {}
+        conditional = []
+        for label in labels[:-2]:
+            for token in label.split('-'):
+                for rule in self.rules:
+                    if rule.field in info:
+                        continue
+                    found = rule.apply(token)
+                    if found is None:
+                        continue
+                    if rule.requires:
+                        conditional.append((rule, found))
+                    else:
+                        info.update(found)
+
+        # Условные совпадения проверяются после всех правил: нужное поле может найтись правее
+        for rule, found in conditional:
+            if rule.field not in info and any(field in info for field in rule.requires):
+                info.update(found)
+        return info
+
+
+def _ptr_query(query_id: int, ip_address: str) -> Tuple[bytes, str]:
+    name = ipaddress.ip_address(ip_address).reverse_pointer
+    qname = b''.join(bytes([len(label)]) + label.encode('ascii') for label in name.split('.')) + b'\0'
+    # Заголовок: id, флаги (RD), один вопрос; вопрос: имя, тип PTR (12), класс IN (1)
+    return struct.pack('!HHHHHH', query_id, 0x0100, 1, 0, 0, 0) + qname + struct.pack('!HH', 12, 1), name
+
+
+def _read_name(data: bytes, offset: int) -> Tuple[str, int]:
+    labels = []
+    end = None
+    jumps = 0
+    while True:
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            # Сжатие имен: указатель на ранее встреченное имя
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            jumps += 1
+            if jumps > 32:
+                raise ValueError("Петля указателей в DNS-ответе")
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(data[offset:offset + length].decode('ascii', errors='replace'))
+        offset += length
+    return '.'.join(labels), end if end is not None else offset
+
+
+def _parse_ptr_response(data: bytes) -> Tuple[int, int, Optional[str], Optional[str]]:
+    # Возвращает id, rcode, имя из вопроса и первое имя из PTR-ответа
+    query_id, flags, question_count, answer_count, _, _ = struct.unpack_from('!HHHHHH', data)
+    if not flags & 0x8000:
+        raise ValueError("Это запрос, а не ответ")
+
+    offset = 12
+    question = None
+    for _ in range(question_count):
+        name, offset = _read_name(data, offset)
+        question = question or name
+        offset += 4
+
+    rcode = flags & 0x000F
+    hostname = None
+    if rcode == 0:
+        for _ in range(answer_count):
+            _, offset = _read_name(data, offset)
+            record_type, _, _, length = struct.unpack_from('!HHIH', data, offset)
+            offset += 10
+            if record_type == 12:
+                hostname, _ = _read_name(data, offset)
+                break
+            offset += length
+    return query_id, rcode, question, hostname
+
+
+class ReverseResolver:
+    # Обратный DNS для прыжков без имени, пачками. С server=(host, port) все PTR-запросы пачки уходят
+    # через один UDP-сокет на этот сервер (например, локальный stub-резолвер), ответы собираются до общего
+    # таймаута. Без server — системный резолвер в пуле потоков.
+    # Кэш по IP хранит и отсутствие имени; таймауты и SERVFAIL не кэшируются и повторятся в следующей пачке
+    def __init__(self, server: Optional[Tuple[str, int]] = None, timeout: float = 2.0, batch_size: int = 256,
+                 workers: int = 8, max_cache: int = 100000):
+        self.server = server
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_cache = max_cache
+        self.cache = OrderedDict()
+        self.queries = 0
+
+    def resolve(self, ip_addresses: Iterable[str]) -> Dict[str, Optional[str]]:
+        results = {}
+        missing = []
+        for ip_address in ip_addresses:
+            if not ip_address or ip_address in results:
+                continue
+            if ip_address in self.cache:
+                self.cache.move_to_end(ip_address)
+                results[ip_address] = self.cache[ip_address]
+            else:
+                results[ip_address] = None
+                missing.append(ip_address)
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            self.queries += len(batch)
+            answered = self._query_server(batch) if self.server else self._query_system(batch)
+            for ip_address, hostname in answered.items():
+                results[ip_address] = hostname
+                if len(self.cache) >= self.max_cache:
+                    self.cache.popitem(last=False)
+                self.cache[ip_address] = hostname
+        return results
+
+    def _query_system(self, batch: List[str]) -> Dict[str, Optional[str]]:
+        def lookup(ip_address):
+            try:
+                return socket.gethostbyaddr(ip_address)[0]
+            except socket.herror:
+                return None
+            except OSError:
+                return False
+
+        with ThreadPoolExecutor(min(self.workers, len(batch))) as executor:
+            names = list(executor.map(lookup, batch))
+        return {ip_address: name for ip_address, name in zip(batch, names) if name is not False}
+
+    def _query_server(self, batch: List[str]) -> Dict[str, Optional[str]]:
+        answered = {}
+        pending = {}
+        family = socket.AF_INET6 if ':' in self.server[0] else socket.AF_INET
+        with socket.socket(family, socket.SOCK_DGRAM) as sock:
+            first_id = random.randrange(0x10000)
+            for index, ip_address in enumerate(batch):
+                try:
+                    query, name = _ptr_query((first_id + index) & 0xFFFF, ip_address)
+                except ValueError:
+                    answered[ip_address] = None
+                    continue
+                pending[(first_id + index) & 0xFFFF] = (ip_address, name)
+                sock.sendto(query, self.server)
+
+            deadline = time.monotonic() + self.timeout
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                sock.settimeout(remaining)
+                try:
+                    data, _ = sock.recvfrom(4096)
+                except socket.timeout:
+                    break
+                try:
+                    query_id, rcode, question, hostname = _parse_ptr_response(data)
+                except (ValueError, IndexError, struct.error):
+                    continue
+
+                expected = pending.get(query_id)
+                # Ответ засчитывается, только если вопрос в нем совпадает с нашим
+                if expected is None or (question or '').lower() != expected[1]:
+                    continue
+                del pending[query_id]
+                if rcode in (0, 3):
+                    answered[expected[0]] = hostname
+        return answered
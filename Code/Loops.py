@@ -0,0 +1,52 @@
+from typing import Hashable, List, Sequence, Tuple
+
+# Поиск петель без зависимостей: модуль грузит анализатор, а RouteDiff с hashlib и ipaddress ему не нужен
+
+
+def find_loops(encoded: Sequence[Hashable]) -> List[Tuple[int, int, int]]:
+    # encoded — маршрут из encode_route или сами IP-адреса; ложное значение — прыжок без ответа.
+    # Повтор узла задает период; сегмент продлевается, пока узлы совпадают с узлом на период раньше.
+    # Таймаут внутри сегмента его не обрывает, а пропуск в цикле заполняется первым ответившим узлом.
+    # Сравнение идет по индексам без копирования цикла, каждый индекс просматривается один раз: O(n).
+    # Результат: (индекс начала, период, длина сегмента). Петля — period > 1 и length >= 2 * period,
+    # остальное — однократный повтор узла или одинаковые прыжки подряд
+    loops = []
+    last_seen = {}
+    size = len(encoded)
+    i = 0
+    while i < size:
+        value = encoded[i]
+        if not value:
+            i += 1
+            continue
+
+        start = last_seen.get(value)
+        if start is None:
+            last_seen[value] = i
+            i += 1
+            continue
+
+        period = i - start
+        # Узлы цикла, которые в первом проходе были таймаутами: позиция в цикле -> узел
+        filled = {}
+        end = i
+        k = i + 1
+        while k < size:
+            current = encoded[k]
+            if current:
+                slot = (k - start) % period
+                expected = encoded[start + slot] or filled.get(slot)
+                if not expected:
+                    filled[slot] = current
+                elif expected != current:
+                    break
+                end = k
+            k += 1
+
+        loops.append((start, period, end - start + 1))
+        for index in range(i, end + 1):
+            if encoded[index]:
+                last_seen[encoded[index]] = index
+        i = k
+
+    return loops
@@ -0,0 +1,217 @@
+import argparse
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    from Code.Aggregator import TracerouteAggregator
+    from Code.ParserClass import TracerouteParser, iter_traces
+    from Code.Quarantine import ErrorBudget
+    from Code.SharedBatch import SharedHopBatch, ensure_tracker
+    from Code.Symbols import SymbolTable
+except ImportError:
+    from Aggregator import TracerouteAggregator
+    from ParserClass import TracerouteParser, iter_traces
+    from Quarantine import ErrorBudget
+    from SharedBatch import SharedHopBatch, ensure_tracker
+    from Symbols import SymbolTable
+
+HEADER = b'traceroute to'
+# Меньшие файлы быстрее разобрать в текущем процессе, чем запускать пул
+MIN_PARALLEL_SIZE = 1 << 20
+
+
+def open_map(file_path: str) -> Optional[mmap.mmap]:
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def next_header(mm: mmap.mmap, position: int) -> Optional[int]:
+    # Начало строки, в которой после пробелов идет "traceroute to" — так же режет split_traces
+    while True:
+        index = mm.find(HEADER, position)
+        if index < 0:
+            return None
+        line_start = mm.rfind(b'\n', 0, index) + 1
+        if not mm[line_start:index].strip():
+            return line_start
+        position = index + len(HEADER)
+
+
+def find_chunk_boundaries(file_path: str, chunk_count: int) -> List[Tuple[int, int]]:
+    mm = open_map(file_path)
+    if mm is None:
+        return []
+
+    with mm:
+        size = len(mm)
+        starts = [0]
+        for k in range(1, chunk_count):
+            position = max(size * k // chunk_count, starts[-1] + 1)
+            if position >= size:
+                break
+            start = next_header(mm, position)
+            if start is None:
+                break
+            if start > starts[-1]:
+                starts.append(start)
+
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def count_lines(file_path: str, start: int, end: int) -> int:
+    mm = open_map(file_path)
+    with mm:
+        return mm[start:end].count(b'\n')
+
+
+def parse_range(file_path: str, start: int, end: int, first_line: int,
+                symbols: Optional[SymbolTable] = None, budget: Optional[ErrorBudget] = None) -> List[TracerouteParser]:
+    mm = open_map(file_path)
+    with mm:
+        text = mm[start:end].decode('utf-8', errors='ignore')
+    # Граница диапазона — всегда начало строки заголовка, поэтому хвост без перевода строки
+    # принадлежит этому же куску
+    if text.endswith('\n'):
+        text = text[:-1]
+
+    # Парсер считает смещения в байтах UTF-8, поэтому к ним прибавляется байтовое начало куска.
+    # Невалидные байты, отброшенные при декодировании, смещения не учитывают
+    return list(iter_traces(text, symbols, budget, first_line=first_line, first_offset=start))
+
+
+def parse_range_shared(file_path: str, start: int, end: int, first_line: int,
+                       budget: Optional[ErrorBudget] = None) -> Dict:
+    # Разобранный кусок уходит в родителя колонками в shared_memory: через pickle — только handle,
+    # а не парсеры со словарями прыжков. Блок освобождает родитель после SharedHopBatch.attach
+    batch = SharedHopBatch.create((parser, []) for parser in parse_range(file_path, start, end, first_line,
+                                                                         budget=budget))
+    handle = batch.handle
+    batch.close()
+    return handle
+
+
+def _first_lines(executor, paths: List[str], starts: List[int], ends: List[int]) -> List[int]:
+    # Строки в кусках считаются параллельно, чтобы каждый кусок знал свой первый номер строки
+    first_lines = [1]
+    for count in list(executor.map(count_lines, paths, starts, ends))[:-1]:
+        first_lines.append(first_lines[-1] + count)
+    return first_lines
+
+
+def parse_file_parallel(file_path: str, workers: Optional[int] = None, chunks_per_worker: int = 4,
+                        symbols: Optional[SymbolTable] = None,
+                        budget: Optional[ErrorBudget] = None) -> Iterator[TracerouteParser]:
+    # Трассировки отдаются в порядке файла, номера строк в ошибках и прыжках — от начала файла.
+    # Все трассировки файла получают id из одной таблицы символов
+    workers = workers or os.cpu_count() or 1
+    if symbols is None:
+        symbols = SymbolTable()
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return
+    if workers == 1 or size < MIN_PARALLEL_SIZE:
+        yield from parse_range(file_path, 0, size, 1, symbols, budget)
+        return
+
+    ranges = find_chunk_boundaries(file_path, workers * chunks_per_worker)
+    paths = [file_path] * len(ranges)
+    budgets = [budget] * len(ranges)
+    starts = [start for start, _ in ranges]
+    ends = [end for _, end in ranges]
+
+    with ProcessPoolExecutor(workers) as executor:
+        first_lines = _first_lines(executor, paths, starts, ends)
+
+        # map сохраняет порядок кусков, поэтому трассировки выходят в порядке файла
+        for parsers in executor.map(parse_range, paths, starts, ends, first_lines, [None] * len(ranges), budgets):
+            # У куска своя таблица символов: переводим его id в общую
+            mapping = symbols.merge(parsers[0].symbols) if parsers else []
+            for parser in parsers:
+                symbols.remap_hops(parser.hops, mapping)
+                parser.symbols = symbols
+                yield parser
+
+
+def aggregate_file_parallel(file_path: str, workers: Optional[int] = None, chunks_per_worker: int = 4,
+                            aggregator: Optional[TracerouteAggregator] = None, budget: Optional[ErrorBudget] = None,
+                            timestamp: Optional[float] = None) -> TracerouteAggregator:
+    # Статистика по маршрутизаторам и линкам большого файла: прыжки из воркеров приходят через shared_memory
+    # и читаются агрегатором прямо из колонок
+    workers = workers or os.cpu_count() or 1
+    if aggregator is None:
+        aggregator = TracerouteAggregator()
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return aggregator
+    if workers == 1 or size < MIN_PARALLEL_SIZE:
+        aggregator.add_traces(parse_range(file_path, 0, size, 1, budget=budget), timestamp)
+        return aggregator
+
+    ranges = find_chunk_boundaries(file_path, workers * chunks_per_worker)
+    paths = [file_path] * len(ranges)
+    starts = [start for start, _ in ranges]
+    ends = [end for _, end in ranges]
+
+    ensure_tracker()
+    with ProcessPoolExecutor(workers) as executor:
+        first_lines = _first_lines(executor, paths, starts, ends)
+        for handle in executor.map(parse_range_shared, paths, starts, ends, first_lines, [budget] * len(ranges)):
+            with SharedHopBatch.attach(handle) as batch:
+                aggregator.add_batch(batch, timestamp)
+    return aggregator
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Параллельный разбор большого архива трассировок")
+    arg_parser.add_argument('file')
+    arg_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    arg_parser.add_argument('--chunks-per-worker', type=int, default=4)
+    arg_parser.add_argument('--aggregate', help="JSON со статистикой по маршрутизаторам и линкам вместо сводки")
+    arg_parser.add_argument('--export', metavar='BASE', help="Колоночная выгрузка: BASE_hops, BASE_probes, ...")
+    arg_parser.add_argument('--export-format', default='auto', choices=('auto', 'parquet', 'arrow', 'csv'))
+    args = arg_parser.parse_args()
+
+    start_time = time.perf_counter()
+    if args.aggregate:
+        aggregator = aggregate_file_parallel(args.file, args.workers, args.chunks_per_worker)
+        aggregator.export_json(args.aggregate)
+        elapsed = time.perf_counter() - start_time
+        print(f"📊 Трассировок: {aggregator.traces_seen}, маршрутизаторов: {len(aggregator.routers)}, "
+              f"линков: {len(aggregator.links)}, время: {elapsed:.2f} сек")
+        return
+
+    exporter = None
+    if args.export:
+        try:
+            from Code.Exporter import HopExporter
+        except ImportError:
+            from Exporter import HopExporter
+        exporter = HopExporter(args.export, args.export_format)
+
+    traces = hops = error_count = 0
+    errors = []
+    try:
+        for parser in parse_file_parallel(args.file, args.workers, args.chunks_per_worker):
+            traces += 1
+            hops += len(parser.hops)
+            errors.extend(parser.errors[:5 - len(errors)])
+            error_count += parser.error_count
+            if exporter is not None and parser.hops:
+                exporter.write_trace(parser)
+    finally:
+        if exporter is not None:
+            exporter.close()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"📊 Трассировок: {traces}, прыжков: {hops}, ошибок: {error_count}, время: {elapsed:.2f} сек")
+    for error in errors[:5]:
+        print(f"  • {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,136 @@
 import re
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional
 from collections import defaultdict
 
+try:
+    from Code.Quarantine import ErrorBudget, QuarantineWriter
+    from Code.Sketch import RunningStats
+    from Code.Symbols import SymbolTable, hop_ip_key
+except ImportError:
+    from Quarantine import ErrorBudget, QuarantineWriter
+    from Sketch import RunningStats
+    from Symbols import SymbolTable, hop_ip_key
+
+# В errors хранится не больше MAX_STORED_ERRORS сообщений с обрезанным текстом строки;
+# полный текст плохих строк уходит в карантин
+MAX_STORED_ERRORS = 100
+MAX_ERROR_TEXT = 120
+
+
+def _byte_len(text: str) -> int:
+    # Смещения считаются в байтах UTF-8, как в mmap файла и в выводе процесса; для ASCII — просто длина
+    return len(text) if text.isascii() else len(text.encode('utf-8'))
+
+
+def split_traces(traceroute_output: str) -> List[str]:
+    # Разбивает файл с несколькими трассировками по заголовкам "traceroute to"
+    chunks = []
+    current = []
+
+    for line in traceroute_output.split('\n'):
+        if line.strip().startswith('traceroute to') and current:
+            chunks.append('\n'.join(current))
+            current = []
+        current.append(line)
+
+    if any(line.strip() for line in current):
+        chunks.append('\n'.join(current))
+
+    return chunks
+
+
+def iter_traces(traceroute_output: str, symbols: Optional[SymbolTable] = None,
+                budget: Optional[ErrorBudget] = None, quarantine: Optional[QuarantineWriter] = None,
+                first_line: int = 1, first_offset: int = 0) -> Iterator['TracerouteParser']:
+    # Все трассировки пачки делят одну таблицу символов; номера строк и байтовые смещения — от начала всего текста
+    if symbols is None:
+        symbols = SymbolTable()
+    line = first_line
+    offset = first_offset
+    for chunk in split_traces(traceroute_output):
+        parser = TracerouteParser(symbols, budget, quarantine)
+        parser.parse_output(chunk, first_line=line, first_offset=offset)
+        yield parser
+        line += chunk.count('\n') + 1
+        offset += _byte_len(chunk) + 1
+
 
 class TracerouteParser:
-    def __init__(self):
+    def __init__(self, symbols: Optional[SymbolTable] = None, budget: Optional[ErrorBudget] = None,
+                 quarantine: Optional[QuarantineWriter] = None, max_errors: int = MAX_STORED_ERRORS):
+        # budget=None — строгий режим: любая нераспознанная строка делает разбор неудачным
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.budget = budget
+        self.quarantine = quarantine
+        self.max_errors = max_errors
         self.hops = []
         self.errors = []
+        self.error_count = 0
+        self.lines_parsed = 0
         self.warnings = []
         self.target_host = None
         self.target_ip = None
         self.max_hops = 30
         self.complexity_metrics = {}
-
-    def parse_output(self, traceroute_output: str) -> bool:
-        lines = traceroute_output.strip().split('\n')
-        parsing_success = True
-
-        for line_num, line in enumerate(lines, 1):
-            line = line.strip()
-            if not line:
-                continue
-
-            if not line[0].isdigit() and not line.startswith('traceroute'):
-                continue
-
+        self.latency_stats = RunningStats()
+
+    def parse_output(self, traceroute_output: str, first_line: int = 1, first_offset: int = 0) -> bool:
+        # first_line и first_offset — положение текста в файле (смещение в байтах), если он вырезан из большего
+        stripped = traceroute_output.strip()
+        lead = traceroute_output[:len(traceroute_output) - len(traceroute_output.lstrip())]
+        offset = first_offset + _byte_len(lead)
+        errors_before = self.error_count
+        lines_before = self.lines_parsed
+
+        for line_num, raw_line in enumerate(stripped.split('\n'), first_line + lead.count('\n')):
+            self.feed_line(raw_line, line_num, offset)
+            offset += _byte_len(raw_line) + 1
+
+        return self.finish(errors_before, lines_before)
+
+    def feed_line(self, raw_line: str, line_num: int, offset: int = 0) -> Optional[Dict]:
+        # Разбор одной строки по мере поступления; возвращает прыжок, если строка его добавила
+        line = raw_line.strip()
+        if not line:
+            return None
+
+        if not line[0].isdigit() and not line.startswith('traceroute'):
+            return None
+
+        self.lines_parsed += 1
+        hop_count = len(self.hops)
+        if self.budget is None:
             parsed = self._parse_line(line, line_num)
-            if not parsed:
-                self.errors.append(f"Строка {line_num}: Неизвестный формат - '{line}'")
-                parsing_success = False
-
+        else:
+            # В терпимом режиме сбой разбора строки — тоже плохая строка, а не остановка всего прогона
+            try:
+                parsed = self._parse_line(line, line_num)
+            except (ValueError, IndexError) as e:
+                self._record_error(line_num, offset, raw_line, f"Ошибка разбора ({e})")
+                return None
+        if not parsed:
+            self._record_error(line_num, offset, raw_line, "Неизвестный формат")
+
+        return self.hops[-1] if len(self.hops) > hop_count else None
+
+    def finish(self, errors_before: int = 0, lines_before: int = 0) -> bool:
         if self.hops:
             self._calculate_complexity_metrics()
 
-        return parsing_success
+        bad_lines = self.error_count - errors_before
+        if self.budget is None:
+            return bad_lines == 0
+        return self.budget.allows(bad_lines, self.lines_parsed - lines_before)
+
+    def _record_error(self, line_num: int, offset: int, raw_line: str, reason: str):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            line = raw_line.strip()
+            if len(line) > MAX_ERROR_TEXT:
+                line = line[:MAX_ERROR_TEXT] + '…'
+            self.errors.append(f"Строка {line_num}: {reason} - '{line}'")
+        if self.quarantine is not None:
+            self.quarantine.write(line_num, offset, raw_line, reason, self.target_host)
 
     def _parse_line(self, line: str, line_num: int) -> bool:
         if line.startswith('traceroute to'):
@@ -80,7 +177,10 @@ class TracerouteParser:
             'hop_number': hop_number,
             'hostname': '*',
             'ip_address': None,
+            'ip_id': 0,
+            'host_id': 0,
             'times': [None, None, None],
+            'avg_time': None,
             'type': 'timeout',
             'packet_loss': 100.0
         }
@@ -93,7 +193,10 @@ class TracerouteParser:
             'hop_number': hop_number,
             'hostname': '*',
             'ip_address': None,
+            'ip_id': 0,
+            'host_id': 0,
             'times': [None, None, None],
+            'avg_time': None,
             'type': 'timeout',
             'packet_loss': 100.0
         }
@@ -131,14 +234,23 @@ class TracerouteParser:
             times.append('*')
 
         converted_times = []
+        time_sum = 0.0
+        time_count = 0
+        # Джиттер — по пробам одного прыжка: рост задержки вдоль пути им не считается
+        self.latency_stats.new_sequence()
         for time_str in times:
             if time_str == '*':
                 converted_times.append(None)
             else:
                 try:
-                    converted_times.append(float(time_str))
+                    value = float(time_str)
                 except ValueError:
                     converted_times.append(None)
+                    continue
+                converted_times.append(value)
+                self.latency_stats.add(value)
+                time_sum += value
+                time_count += 1
 
         packet_loss = (converted_times.count(None) / len(converted_times)) * 100
 
@@ -149,12 +261,20 @@ class TracerouteParser:
         else:
             hop_type = 'standard'
 
+        # Одинаковые адреса и имена во всей пачке — один объект строки; hostname == IP дает тот же id
+        symbols = self.symbols
+        ip_id = symbols.intern(ip_address)
+        host_id = symbols.intern(hostname or ip_address)
+
         hop_data = {
             'line_number': line_num,
             'hop_number': hop_number,
-            'hostname': hostname or ip_address or '*',
-            'ip_address': ip_address,
+            'hostname': symbols.symbols[host_id] or '*',
+            'ip_address': symbols.symbols[ip_id],
+            'ip_id': ip_id,
+            'host_id': host_id,
             'times': converted_times,
+            'avg_time': time_sum / time_count if time_count else None,
             'type': hop_type,
             'packet_loss': packet_loss
         }
@@ -171,8 +291,9 @@ class TracerouteParser:
         prev_ip = None
         for hop in self.hops:
             ip = hop.get('ip_address')
-            if ip and ip != '*':
-                unique_ips.add(ip)
+            ip_key = hop_ip_key(hop)
+            if ip_key is not None:
+                unique_ips.add(ip_key)
 
             if hop['type'] == 'timeout':
                 timeout_count += 1
@@ -215,13 +336,7 @@ class TracerouteParser:
         timeout_hops = len([h for h in self.hops if h['packet_loss'] == 100])
         successful_hops = len([h for h in self.hops if h['packet_loss'] == 0])
 
-        all_times = []
-        for hop in self.hops:
-            valid_times = [t for t in hop['times'] if t is not None]
-            if valid_times:
-                all_times.extend(valid_times)
-
-        avg_latency = sum(all_times) / len(all_times) if all_times else 0
+        stats = self.latency_stats
 
         return {
             'target_host': self.target_host,
@@ -229,9 +344,14 @@ class TracerouteParser:
             'total_hops': total_hops,
             'successful_hops': successful_hops,
             'timeout_hops': timeout_hops,
-            'average_latency': avg_latency,
-            'max_latency': max(all_times) if all_times else 0,
-            'parsing_errors': len(self.errors),
+            'average_latency': stats.mean,
+            'max_latency': stats.max or 0,
+            'p50_latency': stats.quantile(0.5) or 0,
+            'p95_latency': stats.quantile(0.95) or 0,
+            'p99_latency': stats.quantile(0.99) or 0,
+            'latency_stddev': stats.stddev,
+            'jitter': stats.jitter,
+            'parsing_errors': self.error_count,
             'complexity_score': self.complexity_metrics.get('unique_nodes', 0),
             'route_complexity': 'высокая' if self.complexity_metrics.get('is_complex', False) else 'низкая'
         }
\ No newline at end of file
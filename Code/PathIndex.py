@@ -0,0 +1,121 @@
+import math
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Dict, List, Optional, Set
+
+try:
+    from Code.RouteDiff import encode_route, fingerprint_encoded
+except ImportError:
+    from RouteDiff import encode_route, fingerprint_encoded
+
+
+class PathIndex:
+    # Каждый уникальный путь хранится один раз, трассировка — id пути + плоский массив RTT
+    def __init__(self):
+        self.path_ids = {}
+        self.paths = []
+        self.path_fingerprints = []
+        self.by_router = {}
+
+        self.trace_paths = array('I')
+        self.trace_timestamps = array('d')
+        self.trace_probes = array('B')
+        self.trace_offsets = array('Q', [0])
+        self.rtts = array('f')
+        self.trace_targets = []
+        self.by_target = {}
+        self._timestamps_sorted = True
+
+    def add_trace(self, parser, timestamp: Optional[float] = None) -> int:
+        if timestamp is None:
+            timestamp = time.time()
+
+        path_id = self._get_or_create_path(parser.hops)
+        trace_id = len(self.trace_paths)
+        target = parser.target_ip or parser.target_host
+
+        probes = max((len(hop['times']) for hop in parser.hops), default=0)
+        for hop in parser.hops:
+            times = hop['times']
+            self.rtts.extend(math.nan if t is None else t for t in times)
+            if len(times) < probes:
+                self.rtts.extend([math.nan] * (probes - len(times)))
+
+        if self.trace_timestamps and timestamp < self.trace_timestamps[-1]:
+            self._timestamps_sorted = False
+
+        self.trace_paths.append(path_id)
+        self.trace_timestamps.append(timestamp)
+        self.trace_probes.append(probes)
+        self.trace_offsets.append(len(self.rtts))
+        self.trace_targets.append(target)
+        self.by_target.setdefault(target, []).append(trace_id)
+        return trace_id
+
+    def add_traces(self, parsers, timestamp: Optional[float] = None) -> List[int]:
+        return [self.add_trace(parser, timestamp) for parser in parsers]
+
+    def _get_or_create_path(self, hops: List[Dict]) -> int:
+        # Ключ — сам кортеж адресов (тот же объект, что в paths): 64-битный отпечаток при коллизии
+        # молча склеил бы два разных маршрута. Отпечаток считается только для нового пути
+        path = tuple(hop['ip_address'] for hop in hops)
+        path_id = self.path_ids.get(path)
+        if path_id is not None:
+            return path_id
+
+        path_id = len(self.paths)
+        self.path_ids[path] = path_id
+        self.paths.append(path)
+        self.path_fingerprints.append(fingerprint_encoded(encode_route(hops)))
+
+        for ip in set(path):
+            if ip:
+                self.by_router.setdefault(ip, set()).add(path_id)
+
+        return path_id
+
+    def get_path(self, path_id: int) -> List[Optional[str]]:
+        return list(self.paths[path_id])
+
+    def get_trace(self, trace_id: int) -> Dict:
+        path_id = self.trace_paths[trace_id]
+        return {
+            'trace_id': trace_id,
+            'path_id': path_id,
+            'target': self.trace_targets[trace_id],
+            'timestamp': self.trace_timestamps[trace_id],
+            'hops': self.paths[path_id],
+            'rtts': self.get_rtts(trace_id),
+        }
+
+    def get_rtts(self, trace_id: int) -> List[List[Optional[float]]]:
+        probes = self.trace_probes[trace_id]
+        start, end = self.trace_offsets[trace_id], self.trace_offsets[trace_id + 1]
+        flat = [None if math.isnan(t) else t for t in self.rtts[start:end]]
+        return [flat[i:i + probes] for i in range(0, len(flat), probes)] if probes else []
+
+    def paths_for_target(self, target: str) -> Counter:
+        return Counter(self.trace_paths[trace_id] for trace_id in self.by_target.get(target, []))
+
+    def traces_for_target(self, target: str) -> List[int]:
+        return list(self.by_target.get(target, []))
+
+    def paths_through(self, ip_address: str) -> Set[int]:
+        return set(self.by_router.get(ip_address, ()))
+
+    def traces_between(self, start: float, end: float) -> List[int]:
+        if self._timestamps_sorted:
+            return list(range(bisect_left(self.trace_timestamps, start),
+                              bisect_right(self.trace_timestamps, end)))
+        return [i for i, ts in enumerate(self.trace_timestamps) if start <= ts <= end]
+
+    def get_stats(self) -> Dict:
+        return {
+            'traces': len(self.trace_paths),
+            'unique_paths': len(self.paths),
+            'targets': len(self.by_target),
+            'routers': len(self.by_router),
+            'rtt_bytes': self.rtts.itemsize * len(self.rtts),
+        }
@@ -0,0 +1,52 @@
+import json
+from typing import Dict, Iterator, Optional, TextIO, Union
+
+
+class ErrorBudget:
+    # Допустимая доля нераспознанных строк в трассировке: при превышении разбор считается неудачным,
+    # но хорошие прыжки все равно сохраняются
+    def __init__(self, max_errors: Optional[int] = None, max_percent: Optional[float] = None):
+        self.max_errors = max_errors
+        self.max_percent = max_percent
+
+    def allows(self, bad_lines: int, total_lines: int) -> bool:
+        if self.max_errors is not None and bad_lines > self.max_errors:
+            return False
+        if self.max_percent is not None and total_lines and bad_lines / total_lines * 100 > self.max_percent:
+            return False
+        return True
+
+
+class QuarantineWriter:
+    # Нераспознанные строки целиком, с номером строки и смещением в байтах UTF-8 от начала входного текста
+    # (JSON Lines)
+    def __init__(self, target: Union[str, TextIO]):
+        self.path = target if isinstance(target, str) else None
+        self.file = None if self.path else target
+        self.records = 0
+
+    def write(self, line_number: int, offset: int, text: str, reason: str, target: Optional[str] = None):
+        if self.file is None:
+            # Файл создается только при первой плохой строке
+            self.file = open(self.path, 'a', encoding='utf-8')
+        record = {'line': line_number, 'offset': offset, 'target': target, 'reason': reason, 'text': text}
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.records += 1
+
+    def close(self):
+        if self.path and self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def read_quarantine(file_path: str) -> Iterator[Dict]:
+    with open(file_path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,201 @@
+import csv
+import html
+import io
+import json
+import os
+import time
+from typing import Dict, Iterator, List, Optional
+
+
+def _location_label(location: Dict) -> str:
+    # Hostnames тянет сокеты и пул потоков: грузим его, только когда в отчете есть места узлов
+    try:
+        from Code.Hostnames import format_location
+    except ImportError:
+        from Hostnames import format_location
+    return format_location(location)
+
+
+def build_report(parser, issues: List[Dict], fixes: Optional[List[str]] = None, file_path: Optional[str] = None,
+                 corrected_file_path: Optional[str] = None, elapsed: Optional[float] = None,
+                 locations: Optional[Dict[int, Dict]] = None, warnings: Optional[List[str]] = None) -> Dict:
+    # Все вычисления по прыжкам делаются один раз, форматы (и вывод в консоль) только отображают результат.
+    # locations — место и роль узлов по именам (TracerouteAnalyzer.hop_locations),
+    # warnings — замечания анализатора (TracerouteAnalyzer.warnings)
+    locations = locations or {}
+    hops = []
+    successful_hops = 0
+    for hop in parser.hops:
+        loss_percent = hop['packet_loss']
+        if loss_percent == 0:
+            successful_hops += 1
+
+        if hop['type'] == 'timeout':
+            status = 'timeout'
+        elif hop.get('avg_time') is None:
+            status = None
+        else:
+            status = 'ok' if loss_percent == 0 else 'warn' if loss_percent < 50 else 'error'
+
+        hops.append({
+            'hop_number': hop['hop_number'],
+            'ip_address': hop['ip_address'],
+            'hostname': hop['hostname'],
+            'avg_time': hop.get('avg_time'),
+            'packet_loss': loss_percent,
+            'type': hop['type'],
+            'status': status,
+            'location': locations.get(hop['hop_number']),
+        })
+
+    return {
+        'file_path': file_path,
+        'corrected_file_path': corrected_file_path,
+        'generated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'summary': parser.get_summary(),
+        'hops': hops,
+        'issues': issues,
+        'warnings': warnings or [],
+        'fixes_count': len(fixes) if fixes else 0,
+        'successful_hops': successful_hops,
+        'elapsed': elapsed,
+    }
+
+
+class ReportWriter:
+    FORMATS = ('text', 'json', 'csv', 'html')
+    EXTENSIONS = {'.txt': 'text', '.json': 'json', '.csv': 'csv', '.html': 'html', '.htm': 'html'}
+    TEXT_STATUS = {'ok': 'OK', 'warn': 'WARN', 'error': 'ERROR'}
+
+    def __init__(self, buffer_size: int = 1 << 20):
+        self.buffer_size = buffer_size
+
+    def render(self, reports, fmt: str = 'text') -> str:
+        return ''.join(self._iter_format(self._as_list(reports), fmt))
+
+    def write(self, file_path: str, reports, fmt: Optional[str] = None):
+        if fmt is None:
+            fmt = self.EXTENSIONS.get(os.path.splitext(file_path)[1].lower(), 'text')
+
+        newline = '' if fmt == 'csv' else None
+        with open(file_path, 'w', encoding='utf-8', buffering=self.buffer_size, newline=newline) as f:
+            f.writelines(self._iter_format(self._as_list(reports), fmt))
+
+    @staticmethod
+    def _as_list(reports) -> List[Dict]:
+        return [reports] if isinstance(reports, dict) else list(reports)
+
+    def _iter_format(self, reports: List[Dict], fmt: str) -> Iterator[str]:
+        if fmt == 'text':
+            return self._iter_text(reports)
+        if fmt == 'json':
+            # Всегда массив, даже для одного отчета или пустой пачки: форма не зависит от размера
+            return iter([json.dumps(reports, ensure_ascii=False, default=list)])
+        if fmt == 'csv':
+            return self._iter_csv(reports)
+        if fmt == 'html':
+            return self._iter_html(reports)
+        raise ValueError(f"Неизвестный формат отчета: {fmt}")
+
+    def _iter_text(self, reports: List[Dict]) -> Iterator[str]:
+        separator = "=" * 60 + "\n"
+        for index, report in enumerate(reports):
+            if index:
+                yield "\n" + separator + "\n"
+
+            yield "ОТЧЕТ АНАЛИЗА TRACEROUTE\n"
+            yield f"Файл: {report['file_path']}\n"
+            yield f"Время анализа: {report['generated_at']}\n"
+            if report['corrected_file_path']:
+                yield f"Исправленный файл: {report['corrected_file_path']}\n"
+                yield f"Исправлений: {report['fixes_count']}\n"
+            yield separator + "\n"
+
+            summary = report['summary']
+            if summary:
+                yield ("📊 СВОДКА:\n"
+                       f"  Цель: {summary['target_host']} ({summary['target_ip']})\n"
+                       f"  Прыжков: {summary['total_hops']}\n"
+                       f"  Средняя задержка: {summary['average_latency']:.1f} мс\n"
+                       f"  Таймауты: {summary['timeout_hops']} прыжков\n"
+                       f"  Сложность маршрута: {summary['route_complexity']}\n\n")
+
+            lines = ["📈 ДЕТАЛИ ПРЫЖКОВ:\n"]
+            for hop in report['hops']:
+                if hop['status'] == 'timeout':
+                    lines.append(f"  {hop['hop_number']:2d}. Таймаут (потеряно 100% пакетов)\n")
+                elif hop['status']:
+                    status = self.TEXT_STATUS[hop['status']]
+                    ip_display = hop['ip_address'] if hop['ip_address'] else "Unknown"
+                    location = f" [{_location_label(hop['location'])}]" if hop.get('location') else ""
+                    lines.append(f"  {hop['hop_number']:2d}. {status:4} {ip_display:15} - {hop['avg_time']:5.1f} мс "
+                                 f"(потерь: {hop['packet_loss']:.0f}%){location}\n")
+            yield ''.join(lines)
+
+            yield "\n" + separator + "⚠️  ОБНАРУЖЕННЫЕ ПРОБЛЕМЫ:\n"
+            if report['issues']:
+                lines = []
+                for issue in report['issues']:
+                    if issue['hop_number'] == 0:
+                        lines.append(f"  • {issue['message']}\n")
+                    else:
+                        lines.append(f"  • {issue['message']} (прыжок {issue['hop_number']})\n")
+                yield ''.join(lines)
+            else:
+                yield "  ✅ Критических проблем не обнаружено\n"
+            if report['warnings']:
+                yield "\nℹ️  ЗАМЕЧАНИЯ:\n" + ''.join(f"  • {warning}\n" for warning in report['warnings'])
+
+            yield "\n" + separator + "📊 СТАТИСТИКА:\n"
+            if report['elapsed'] is not None:
+                yield f"  Время анализа: {report['elapsed']:.2f} сек\n"
+            yield (f"  Исправлений: {report['fixes_count']}\n"
+                   f"  Проблем в маршруте: {len(report['issues'])}\n"
+                   f"  Успешных прыжков: {report['successful_hops']}\n")
+
+    def _iter_csv(self, reports: List[Dict]) -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['report', 'file_path', 'target_host', 'target_ip', 'hop_number', 'ip_address',
+                         'hostname', 'avg_time', 'packet_loss', 'type', 'status'])
+
+        for index, report in enumerate(reports):
+            summary = report['summary'] or {}
+            for hop in report['hops']:
+                writer.writerow([index, report['file_path'], summary.get('target_host'), summary.get('target_ip'),
+                                 hop['hop_number'], hop['ip_address'] or '', hop['hostname'],
+                                 '' if hop['avg_time'] is None else f"{hop['avg_time']:.3f}",
+                                 f"{hop['packet_loss']:.1f}", hop['type'], hop['status'] or ''])
+
+            if buffer.tell() >= self.buffer_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        yield buffer.getvalue()
+
+    def _iter_html(self, reports: List[Dict]) -> Iterator[str]:
+        yield ('<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Отчет traceroute</title></head><body>\n')
+        for report in reports:
+            summary = report['summary'] or {}
+            target = f"{summary.get('target_host')} ({summary.get('target_ip')})"
+            parts = [f"<h2>{html.escape(target)}</h2>\n",
+                     f"<p>Файл: {html.escape(str(report['file_path']))}<br>"
+                     f"Время анализа: {report['generated_at']}<br>"
+                     f"Средняя задержка: {summary.get('average_latency', 0):.1f} мс</p>\n",
+                     "<table border=\"1\"><tr><th>#</th><th>IP</th><th>Задержка, мс</th>"
+                     "<th>Потери, %</th><th>Статус</th></tr>\n"]
+
+            for hop in report['hops']:
+                avg_time = '' if hop['avg_time'] is None else f"{hop['avg_time']:.1f}"
+                parts.append(f"<tr><td>{hop['hop_number']}</td><td>{html.escape(hop['ip_address'] or '*')}</td>"
+                             f"<td>{avg_time}</td><td>{hop['packet_loss']:.0f}</td>"
+                             f"<td>{hop['status'] or ''}</td></tr>\n")
+            parts.append("</table>\n<ul>\n")
+
+            for issue in report['issues']:
+                parts.append(f"<li>{html.escape(issue['message'])} (прыжок {issue['hop_number']})</li>\n")
+            parts.append("</ul>\n")
+            yield ''.join(parts)
+
+        yield "</body></html>\n"
@@ -0,0 +1,151 @@
+import hashlib
+import ipaddress
+import socket
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from Code.Loops import find_loops
+except ImportError:
+    from Loops import find_loops
+
+
+def ip_to_int(ip_address: Optional[str]) -> int:
+    # 0 — прыжок без ответа
+    if not ip_address or ip_address == '*':
+        return 0
+    try:
+        return int.from_bytes(socket.inet_aton(ip_address), 'big')
+    except OSError:
+        try:
+            return int(ipaddress.ip_address(ip_address))
+        except ValueError:
+            return 0
+
+
+def encode_route(hops: List[Dict]) -> Tuple[int, ...]:
+    return tuple(ip_to_int(hop['ip_address']) for hop in hops)
+
+
+def route_fingerprint(hops: List[Dict]) -> str:
+    return fingerprint_encoded(encode_route(hops))
+
+
+def fingerprint_encoded(encoded: Tuple[int, ...]) -> str:
+    # blake2b вместо hash(): отпечаток одинаков во всех процессах и запусках
+    data = b''.join(value.to_bytes(16, 'big') for value in encoded)
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def _align(old: Tuple[int, ...], new: Tuple[int, ...]) -> List[Tuple[str, Optional[int], Optional[int]]]:
+    # Редакционное расстояние с восстановлением выравнивания
+    rows, cols = len(old), len(new)
+    dist = [[0] * (cols + 1) for _ in range(rows + 1)]
+    for i in range(rows + 1):
+        dist[i][0] = i
+    for j in range(cols + 1):
+        dist[0][j] = j
+
+    for i in range(1, rows + 1):
+        for j in range(1, cols + 1):
+            cost = 0 if old[i - 1] == new[j - 1] else 1
+            dist[i][j] = min(dist[i - 1][j] + 1, dist[i][j - 1] + 1, dist[i - 1][j - 1] + cost)
+
+    operations = []
+    i, j = rows, cols
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and dist[i][j] == dist[i - 1][j - 1] + (0 if old[i - 1] == new[j - 1] else 1):
+            operations.append(('match' if old[i - 1] == new[j - 1] else 'change', i - 1, j - 1))
+            i -= 1
+            j -= 1
+        elif i > 0 and dist[i][j] == dist[i - 1][j] + 1:
+            operations.append(('remove', i - 1, None))
+            i -= 1
+        else:
+            operations.append(('insert', None, j - 1))
+            j -= 1
+
+    operations.reverse()
+    return operations
+
+
+def diff_routes(old_hops: List[Dict], new_hops: List[Dict], latency_threshold: float = 10.0) -> Dict:
+    old_encoded = encode_route(old_hops)
+    new_encoded = encode_route(new_hops)
+
+    result = {
+        'old_fingerprint': fingerprint_encoded(old_encoded),
+        'new_fingerprint': fingerprint_encoded(new_encoded),
+        'identical': old_encoded == new_encoded,
+        'inserted': [],
+        'removed': [],
+        'changed': [],
+        'latency_shifts': [],
+    }
+
+    if result['identical']:
+        pairs = [('match', i, i) for i in range(len(old_hops))]
+    else:
+        pairs = _align(old_encoded, new_encoded)
+
+    for operation, old_index, new_index in pairs:
+        if operation == 'insert':
+            hop = new_hops[new_index]
+            if hop['ip_address']:
+                result['inserted'].append({'hop_number': hop['hop_number'], 'ip_address': hop['ip_address']})
+        elif operation == 'remove':
+            hop = old_hops[old_index]
+            if hop['ip_address']:
+                result['removed'].append({'hop_number': hop['hop_number'], 'ip_address': hop['ip_address']})
+        elif operation == 'change':
+            old_hop, new_hop = old_hops[old_index], new_hops[new_index]
+            # Таймаут вместо узла (и наоборот) — не смена маршрутизатора
+            if old_hop['ip_address'] and new_hop['ip_address']:
+                result['changed'].append({
+                    'hop_number': new_hop['hop_number'],
+                    'old_ip': old_hop['ip_address'],
+                    'new_ip': new_hop['ip_address'],
+                })
+        else:
+            old_hop, new_hop = old_hops[old_index], new_hops[new_index]
+            old_latency, new_latency = old_hop.get('avg_time'), new_hop.get('avg_time')
+            if old_hop['ip_address'] and old_latency is not None and new_latency is not None:
+                shift = new_latency - old_latency
+                if abs(shift) >= latency_threshold:
+                    result['latency_shifts'].append({
+                        'hop_number': new_hop['hop_number'],
+                        'ip_address': new_hop['ip_address'],
+                        'old_latency': old_latency,
+                        'new_latency': new_latency,
+                        'shift': shift,
+                    })
+
+    return result
+
+
+def diff_series(routes: List[List[Dict]], latency_threshold: float = 10.0) -> List[Dict]:
+    return [diff_routes(routes[i - 1], routes[i], latency_threshold) for i in range(1, len(routes))]
+
+
+class RouteDiffer:
+    # Сравнивает каждую новую трассировку с предыдущей к той же цели
+    def __init__(self, latency_threshold: float = 10.0):
+        self.latency_threshold = latency_threshold
+        self.last_routes = {}
+        self.fingerprints = {}
+
+    def observe(self, parser) -> Optional[Dict]:
+        target = parser.target_ip or parser.target_host
+        fingerprint = route_fingerprint(parser.hops)
+        self.fingerprints[fingerprint] = self.fingerprints.get(fingerprint, 0) + 1
+
+        previous = self.last_routes.get(target)
+        self.last_routes[target] = parser.hops
+        if previous is None:
+            return None
+
+        diff = diff_routes(previous, parser.hops, self.latency_threshold)
+        diff['target'] = target
+        return diff
+
+    def is_known_path(self, hops: List[Dict]) -> bool:
+        return route_fingerprint(hops) in self.fingerprints
@@ -0,0 +1,175 @@
+import argparse
+import asyncio
+import json
+import shlex
+import sys
+import time
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Sequence
+
+try:
+    from Code.AutoCorrector import TracerouteAutoCorrector
+    from Code.ParserClass import TracerouteParser
+    from Code.Symbols import SymbolTable
+    from Code.TracerouteAnalyzerClass import TracerouteAnalyzer
+except ImportError:
+    from AutoCorrector import TracerouteAutoCorrector
+    from ParserClass import TracerouteParser
+    from Symbols import SymbolTable
+    from TracerouteAnalyzerClass import TracerouteAnalyzer
+
+DEFAULT_COMMAND = ('traceroute', '-n', '-q', '3', '-w', '2')
+
+
+class TracerouteRunner:
+    # Запускает traceroute (или другую команду-зонд) для многих целей параллельно.
+    # Строки stdout разбираются по мере поступления: проверки прыжка идут, пока зонд еще работает
+    def __init__(self, command: Sequence[str] = DEFAULT_COMMAND, concurrency: int = 16, timeout: float = 90.0,
+                 autocorrect: bool = True, enable_geo: bool = False, baseline=None,
+                 on_hop: Optional[Callable[[str, Dict, List[Dict]], None]] = None, exporter=None):
+        self.command = list(command)
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.autocorrect = autocorrect
+        self.on_hop = on_hop
+        # HopExporter: каждая завершенная трассировка дописывается в колоночную выгрузку
+        self.exporter = exporter
+        self.symbols = SymbolTable()
+        self.analyzer = TracerouteAnalyzer(enable_geo=enable_geo, baseline=baseline)
+        self._semaphore = None
+
+    def command_for(self, target: str) -> List[str]:
+        # "{target}" в аргументах подставляется, иначе цель добавляется последним аргументом
+        if any('{target}' in arg for arg in self.command):
+            return [arg.replace('{target}', target) for arg in self.command]
+        return self.command + [target]
+
+    async def run_target(self, target: str) -> Dict:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            return await self._probe(target)
+
+    async def _probe(self, target: str) -> Dict:
+        start = time.perf_counter()
+        parser = TracerouteParser(self.symbols)
+        corrector = TracerouteAutoCorrector() if self.autocorrect else None
+        hop_issues = []
+        result = {'target': target, 'timed_out': False, 'returncode': None, 'error': None}
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *self.command_for(target), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+        except OSError as e:
+            result['error'] = str(e)
+            process = None
+
+        if process is not None:
+            try:
+                await asyncio.wait_for(self._consume(process, target, parser, corrector, hop_issues), self.timeout)
+            except asyncio.TimeoutError:
+                # Уже полученные прыжки остаются в результате
+                result['timed_out'] = True
+            finally:
+                # Зонд не переживает таймаут или отмену задачи
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+            result['returncode'] = process.returncode
+
+        parser.finish()
+        issues = self.analyzer.analyze(parser) if parser.hops else []
+        fixes = corrector.corrections_applied if corrector else []
+        if self.exporter is not None and parser.hops:
+            result['trace_id'] = self.exporter.write_trace(parser, issues, fixes)
+        result.update({
+            'target_host': parser.target_host,
+            'target_ip': parser.target_ip,
+            'summary': parser.get_summary(),
+            'hops': parser.hops,
+            'issues': issues,
+            'hop_issues': hop_issues,
+            'fixes': fixes,
+            'errors': parser.errors,
+            'elapsed': time.perf_counter() - start,
+        })
+        return result
+
+    async def _consume(self, process, target: str, parser: TracerouteParser,
+                       corrector: Optional[TracerouteAutoCorrector], hop_issues: List[Dict]):
+        line_num = 0
+        offset = 0
+        async for raw in process.stdout:
+            line_num += 1
+            line = raw.decode('utf-8', errors='ignore').rstrip('\r\n')
+            if corrector is not None:
+                line = corrector.correct_line(line, line_num)
+            hop = parser.feed_line(line, line_num, offset)
+            offset += len(raw)
+            if hop is None:
+                continue
+
+            issues = self.analyzer.analyze_hop(hop)
+            hop_issues.extend(issues)
+            if self.on_hop is not None:
+                self.on_hop(target, hop, issues)
+
+        await process.wait()
+
+    async def iter_results(self, targets: Iterable[str]) -> AsyncIterator[Dict]:
+        # Результаты в порядке завершения трассировок
+        tasks = [asyncio.ensure_future(self.run_target(target)) for target in targets]
+        try:
+            for future in asyncio.as_completed(tasks):
+                yield await future
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def run(self, targets: Iterable[str]) -> List[Dict]:
+        # Результаты в порядке целей
+        return await asyncio.gather(*(self.run_target(target) for target in targets))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Параллельный запуск traceroute с потоковым анализом")
+    arg_parser.add_argument('targets', nargs='*', help="Цели; без аргументов читаются из stdin")
+    arg_parser.add_argument('--command', default=' '.join(DEFAULT_COMMAND),
+                            help="Команда-зонд; {target} подставляется, иначе цель добавляется в конец")
+    arg_parser.add_argument('--concurrency', type=int, default=16)
+    arg_parser.add_argument('--timeout', type=float, default=90.0)
+    arg_parser.add_argument('--no-autocorrect', action='store_true')
+    arg_parser.add_argument('--geo', action='store_true')
+    arg_parser.add_argument('--output', help="JSON Lines с результатами (по умолчанию stdout)")
+    arg_parser.add_argument('--export', metavar='BASE', help="Колоночная выгрузка: BASE_hops, BASE_probes, ...")
+    arg_parser.add_argument('--export-format', default='auto', choices=('auto', 'parquet', 'arrow', 'csv'))
+    args = arg_parser.parse_args()
+
+    exporter = None
+    if args.export:
+        try:
+            from Code.Exporter import HopExporter
+        except ImportError:
+            from Exporter import HopExporter
+        exporter = HopExporter(args.export, args.export_format)
+
+    targets = args.targets or [line.strip() for line in sys.stdin if line.strip()]
+    runner = TracerouteRunner(shlex.split(args.command), args.concurrency, args.timeout,
+                              autocorrect=not args.no_autocorrect, enable_geo=args.geo, exporter=exporter)
+
+    async def run():
+        out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+        try:
+            async for result in runner.iter_results(targets):
+                out.write(json.dumps(result, ensure_ascii=False, default=list) + '\n')
+                out.flush()
+        finally:
+            if out is not sys.stdout:
+                out.close()
+            if exporter is not None:
+                exporter.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+try:
+    from Code.Workers import (init_worker, open_baseline_writer, apply_baseline_updates, correct_text, parse_text,
+                              analyze_content)
+except ImportError:
+    from Workers import (init_worker, open_baseline_writer, apply_baseline_updates, correct_text, parse_text,
+                         analyze_content)
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class AnalysisServer:
+    REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8080, unix_path: Optional[str] = None,
+                 workers: int = 4, max_inflight: int = 256, max_body: int = 16 * 1024 * 1024,
+                 enable_geo: bool = False, baseline_path: Optional[str] = None, max_headers: int = 100):
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.workers = workers
+        self.max_inflight = max_inflight
+        self.max_body = max_body
+        self.max_headers = max_headers
+        self.enable_geo = enable_geo
+        self.baseline_path = baseline_path
+
+        self.executor = None
+        self.baseline = None
+        self.server = None
+        # Соединения, ждущие следующего запроса: при остановке их закрываем, иначе wait_closed()
+        # (Python 3.12+) ждет простаивающие keep-alive соединения бесконечно
+        self.idle_writers = set()
+        self.stopping = False
+        self.inflight = 0
+        self.requests_served = 0
+
+    async def start(self):
+        # Один пул на весь сервер: в каждом воркере прогретые GeoIP и анализатор
+        self.baseline = open_baseline_writer(self.baseline_path)
+        self.executor = ProcessPoolExecutor(self.workers, initializer=init_worker,
+                                            initargs=(self.enable_geo, self.baseline_path))
+        # Воркеры запускаются до открытия сокета: иначе fork унаследует клиентские соединения
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, parse_text, '') for _ in range(self.workers)))
+
+        if self.unix_path:
+            if os.path.exists(self.unix_path):
+                os.unlink(self.unix_path)
+            self.server = await asyncio.start_unix_server(self._handle_connection, path=self.unix_path)
+        else:
+            self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+            self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self.stopping = True
+        if self.server is not None:
+            self.server.close()
+            for writer in list(self.idle_writers):
+                writer.close()
+            await self.server.wait_closed()
+        if self.executor is not None:
+            # Ожидание воркеров не должно блокировать цикл событий
+            await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown, True)
+        if self.baseline is not None:
+            self.baseline.close()
+            self.baseline = None
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
+
+    async def serve_forever(self):
+        await self.start()
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+        await stop_event.wait()
+        await self.stop()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while not self.stopping:
+                self.idle_writers.add(writer)
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as e:
+                    await self._send(writer, e.status, {'error': e.message}, keep_alive=False)
+                    break
+                finally:
+                    self.idle_writers.discard(writer)
+                if request is None:
+                    break
+
+                method, target, headers, body = request
+                # Во время остановки ответ уходит с Connection: close
+                keep_alive = headers.get('connection', '').lower() != 'close' and not self.stopping
+                try:
+                    status, payload = await self._dispatch(method, target, body)
+                except HttpError as e:
+                    status, payload = e.status, {'error': e.message}
+                except Exception as e:
+                    status, payload = 500, {'error': str(e)}
+
+                await self._send(writer, status, payload, keep_alive)
+                self.requests_served += 1
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_line(reader: asyncio.StreamReader) -> bytes:
+        # Строка длиннее лимита StreamReader — ошибка клиента: readline бросает ValueError
+        try:
+            return await reader.readline()
+        except ValueError:
+            raise HttpError(400, "Слишком длинная строка")
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict, bytes]]:
+        request_line = await self._read_line(reader)
+        if not request_line:
+            return None
+
+        try:
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise HttpError(400, "Некорректная строка запроса")
+
+        headers = {}
+        header_count = 0
+        while True:
+            line = await self._read_line(reader)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            header_count += 1
+            if header_count > self.max_headers:
+                raise HttpError(400, "Слишком много заголовков")
+            name, separator, value = line.decode('latin-1').partition(':')
+            if not separator or not name.strip():
+                raise HttpError(400, "Некорректный заголовок")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked(reader)
+        else:
+            # Только десятичные цифры: int() принял бы и '-1', и '1_000'
+            content_length = headers.get('content-length') or '0'
+            if not (content_length.isascii() and content_length.isdigit()):
+                raise HttpError(400, "Некорректный Content-Length")
+            length = int(content_length)
+            if length > self.max_body:
+                raise HttpError(413, "Слишком большое тело запроса")
+            body = await reader.readexactly(length) if length else b''
+
+        return method.upper(), target, headers, body
+
+    async def _read_chunked(self, reader: asyncio.StreamReader) -> bytes:
+        # Тело читается по мере поступления, без ожидания Content-Length
+        chunks = []
+        total = 0
+        while True:
+            size_line = (await self._read_line(reader)).split(b';', 1)[0].strip()
+            if not (size_line.isalnum() and size_line.isascii()):
+                raise HttpError(400, "Некорректный chunked-блок")
+            try:
+                size = int(size_line, 16)
+            except ValueError:
+                raise HttpError(400, "Некорректный chunked-блок")
+            if size == 0:
+                trailer_count = 0
+                while (await self._read_line(reader)) not in (b'\r\n', b'\n', b''):
+                    trailer_count += 1
+                    if trailer_count > self.max_headers:
+                        raise HttpError(400, "Слишком много заголовков")
+                break
+
+            total += size
+            if total > self.max_body:
+                raise HttpError(413, "Слишком большое тело запроса")
+            chunks.append(await reader.readexactly(size))
+            if (await self._read_line(reader)) not in (b'\r\n', b'\n'):
+                raise HttpError(400, "Нет перевода строки после chunked-блока")
+
+        return b''.join(chunks)
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Dict]:
+        url = urlsplit(target)
+        if url.path == '/health':
+            return 200, {'status': 'ok', 'inflight': self.inflight, 'served': self.requests_served}
+
+        handlers = {'/parse': parse_text, '/correct': correct_text, '/analyze': analyze_content}
+        handler = handlers.get(url.path)
+        if handler is None:
+            raise HttpError(404, f"Неизвестный путь: {url.path}")
+        if method != 'POST':
+            raise HttpError(405, "Ожидается POST")
+
+        if self.inflight >= self.max_inflight:
+            # Лучше быстро отказать, чем копить очередь и раздувать задержку
+            raise HttpError(503, "Сервер перегружен")
+
+        text = body.decode('utf-8', errors='ignore')
+        args = (text,)
+        if handler is analyze_content:
+            query = parse_qs(url.query)
+            args = (text, query.get('autocorrect', ['1'])[0] not in ('0', 'false', 'no'))
+
+        self.inflight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, handler, *args)
+        finally:
+            self.inflight -= 1
+
+        if handler is analyze_content:
+            apply_baseline_updates(self.baseline, result)
+        return 200, result
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, payload: Dict, keep_alive: bool):
+        body = json.dumps(payload, ensure_ascii=False, default=list).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {self.REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode('latin-1')
+        writer.write(head + body)
+        await writer.drain()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="HTTP API анализа traceroute")
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8080)
+    arg_parser.add_argument('--unix', help="Путь к Unix-сокету вместо TCP")
+    arg_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    arg_parser.add_argument('--max-inflight', type=int, default=256)
+    arg_parser.add_argument('--geo', action='store_true')
+    arg_parser.add_argument('--baseline')
+    args = arg_parser.parse_args()
+
+    server = AnalysisServer(args.host, args.port, args.unix, args.workers, args.max_inflight,
+                            enable_geo=args.geo, baseline_path=args.baseline)
+    print(f"🚀 Сервер: {args.unix or f'{args.host}:{args.port}'}")
+    asyncio.run(server.serve_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import math
+import socket
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from Code.Symbols import SymbolTable
+except ImportError:
+    from Symbols import SymbolTable
+
+IP_WIDTH = 16
+_IPV4_PREFIX = b'\0' * 10 + b'\xff\xff'
+
+# Колонки прыжков: имя -> (typecode, элементов на прыжок); 'rtt' — матрица прыжки x пробы
+HOP_COLUMNS = (
+    ('trace', 'I'),
+    ('line_number', 'I'),
+    ('hop_number', 'H'),
+    ('ip_id', 'I'),
+    ('host_id', 'I'),
+    ('probes', 'B'),
+    ('packet_loss', 'd'),
+    ('avg_time', 'd'),
+)
+_ITEM_SIZE = {'B': 1, 'H': 2, 'I': 4, 'd': 8}
+
+
+def pack_ip(ip_address: Optional[str]) -> bytes:
+    # IPv4 хранится как IPv4-mapped IPv6, нули — прыжок без ответа
+    if not ip_address or ip_address == '*':
+        return bytes(IP_WIDTH)
+    try:
+        return _IPV4_PREFIX + socket.inet_pton(socket.AF_INET, ip_address)
+    except OSError:
+        try:
+            return socket.inet_pton(socket.AF_INET6, ip_address)
+        except OSError:
+            return bytes(IP_WIDTH)
+
+
+def unpack_ip(packed) -> Optional[str]:
+    packed = bytes(packed)
+    if not any(packed):
+        return None
+    if packed.startswith(_IPV4_PREFIX):
+        return socket.inet_ntop(socket.AF_INET, packed[len(_IPV4_PREFIX):])
+    return socket.inet_ntop(socket.AF_INET6, packed)
+
+
+def ensure_tracker():
+    # Трекер запускается в родителе до создания пула: тогда воркеры делят его с родителем
+    # и не удаляют блоки при своем завершении
+    resource_tracker.ensure_running()
+
+
+class SharedHopBatch:
+    # Колонки прыжков пачки трассировок в одном блоке shared_memory.
+    # Через процессы передается только handle: имя блока, раскладка, сводки с проблемами
+    # и таблица символов — каждое имя хоста и IP по одному разу
+    def __init__(self, shm: shared_memory.SharedMemory, handle: Dict):
+        self.shm = shm
+        self.handle = handle
+        self.hop_count = handle['hop_count']
+        self.probe_width = handle['probe_width']
+        self.traces = handle['traces']
+        self.symbols = handle['symbols']
+        self._views = {}
+
+    @classmethod
+    def create(cls, results: Iterable[Tuple[object, List[Dict]]]) -> 'SharedHopBatch':
+        # Адаптер результатов TracerouteParser + TracerouteAnalyzer: пары (parser, issues)
+        results = list(results)
+        hop_count = sum(len(parser.hops) for parser, _ in results)
+        probe_width = max((len(hop['times']) for parser, _ in results for hop in parser.hops), default=0)
+
+        # У парсеров пачки может быть несколько таблиц символов — сводим их в одну
+        symbols = SymbolTable()
+        mappings = {}
+        traces = []
+        hop_start = 0
+        for parser, issues in results:
+            if id(parser.symbols) not in mappings:
+                mappings[id(parser.symbols)] = symbols.merge(parser.symbols)
+            traces.append({
+                'target_host': parser.target_host,
+                'target_ip': parser.target_ip,
+                'hop_start': hop_start,
+                'hop_count': len(parser.hops),
+                'summary': parser.get_summary(),
+                'issues': issues,
+                'errors': parser.errors,
+            })
+            hop_start += len(parser.hops)
+
+        layout = {}
+        offset = 0
+        sizes = [(name, typecode, hop_count) for name, typecode in HOP_COLUMNS]
+        sizes += [('rtt', 'd', hop_count * probe_width), ('ip', 'B', hop_count * IP_WIDTH)]
+        for name, typecode, count in sizes:
+            layout[name] = (offset, typecode, count)
+            offset += count * _ITEM_SIZE[typecode]
+            offset = (offset + 7) & ~7
+
+        handle = {'name': None, 'hop_count': hop_count, 'probe_width': probe_width,
+                  'layout': layout, 'traces': traces, 'symbols': symbols.symbols}
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        handle['name'] = shm.name
+        batch = cls(shm, handle)
+
+        columns = {name: batch.column(name) for name, _ in HOP_COLUMNS}
+        rtt = batch.column('rtt')
+        ips = batch.column('ip')
+        index = 0
+        for trace_index, (parser, _) in enumerate(results):
+            mapping = mappings[id(parser.symbols)]
+            for hop in parser.hops:
+                times = hop['times']
+                columns['trace'][index] = trace_index
+                columns['line_number'][index] = hop['line_number']
+                columns['hop_number'][index] = hop['hop_number']
+                columns['ip_id'][index] = mapping[hop['ip_id']]
+                columns['host_id'][index] = mapping[hop['host_id']]
+                columns['probes'][index] = len(times)
+                columns['packet_loss'][index] = hop['packet_loss']
+                columns['avg_time'][index] = math.nan if hop['avg_time'] is None else hop['avg_time']
+
+                row = index * probe_width
+                for probe in range(probe_width):
+                    t = times[probe] if probe < len(times) else None
+                    rtt[row + probe] = math.nan if t is None else t
+                ips[index * IP_WIDTH:(index + 1) * IP_WIDTH] = pack_ip(hop['ip_address'])
+                index += 1
+
+        return batch
+
+    @classmethod
+    def attach(cls, handle: Dict) -> 'SharedHopBatch':
+        return cls(shared_memory.SharedMemory(name=handle['name']), handle)
+
+    def column(self, name: str) -> memoryview:
+        view = self._views.get(name)
+        if view is None:
+            offset, typecode, count = self.handle['layout'][name]
+            view = self.shm.buf[offset:offset + count * _ITEM_SIZE[typecode]].cast(typecode)
+            self._views[name] = view
+        return view
+
+    def rtt_row(self, hop_index: int) -> memoryview:
+        row = hop_index * self.probe_width
+        return self.column('rtt')[row:row + self.column('probes')[hop_index]]
+
+    def ip(self, hop_index: int) -> Optional[str]:
+        return unpack_ip(self.column('ip')[hop_index * IP_WIDTH:(hop_index + 1) * IP_WIDTH])
+
+    def ips(self) -> List[Optional[str]]:
+        # Адреса берутся из таблицы символов по id: строки не декодируются заново
+        symbols = self.symbols
+        return [symbols[ip_id] for ip_id in self.column('ip_id')]
+
+    def hops(self, trace_index: int) -> List[Dict]:
+        # Обратный адаптер: прыжки в формате TracerouteParser.hops
+        trace = self.traces[trace_index]
+        start = trace['hop_start']
+        symbols = self.symbols
+        hop_number = self.column('hop_number')
+        ip_ids = self.column('ip_id')
+        host_ids = self.column('host_id')
+        line_number = self.column('line_number')
+        packet_loss = self.column('packet_loss')
+        avg_time = self.column('avg_time')
+
+        hops = []
+        for index in range(start, start + trace['hop_count']):
+            ip_id = ip_ids[index]
+            host_id = host_ids[index]
+            times = [None if math.isnan(t) else t for t in self.rtt_row(index)]
+            loss = packet_loss[index]
+            avg = avg_time[index]
+            hops.append({
+                'line_number': line_number[index],
+                'hop_number': hop_number[index],
+                'hostname': symbols[host_id] or '*',
+                'ip_address': symbols[ip_id],
+                'ip_id': ip_id,
+                'host_id': host_id,
+                'times': times,
+                'avg_time': None if math.isnan(avg) else avg,
+                'type': 'timeout' if loss == 100 else 'partial' if loss > 0 else 'standard',
+                'packet_loss': loss,
+            })
+        return hops
+
+    def close(self):
+        for view in self._views.values():
+            view.release()
+        self._views.clear()
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Родитель владеет блоком после attach: закрывает и освобождает его
+        self.close()
+        self.unlink()
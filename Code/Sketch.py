@@ -0,0 +1,170 @@
+import math
+from typing import Dict, Optional
+
+
+class QuantileSketch:
+    # DDSketch: логарифмические корзины с гарантированной относительной точностью
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 512, min_value: float = 1e-3):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float, weight: int = 1):
+        if value <= self.min_value:
+            self.zero_count += weight
+        else:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[key] = self.bins.get(key, 0) + weight
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+        self.count += weight
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def merge(self, other: 'QuantileSketch'):
+        if other.gamma != self.gamma:
+            raise ValueError("Нельзя объединить скетчи с разной точностью")
+
+        for key, bin_count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + bin_count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def _collapse(self):
+        # Сливаем младшие корзины: высокие перцентили остаются точными
+        keys = sorted(self.bins)
+        excess = len(keys) - self.max_bins
+        target = keys[excess]
+        for key in keys[:excess]:
+            self.bins[target] += self.bins.pop(key)
+
+    def to_dict(self) -> Dict:
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'max_bins': self.max_bins,
+            'min_value': self.min_value,
+            'bins': dict(self.bins),
+            'zero_count': self.zero_count,
+            'count': self.count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'QuantileSketch':
+        sketch = cls(data['relative_accuracy'], data['max_bins'], data['min_value'])
+        sketch.bins = {int(key): value for key, value in data['bins'].items()}
+        sketch.zero_count = data['zero_count']
+        sketch.count = data['count']
+        return sketch
+
+
+class RunningStats:
+    # Среднее и дисперсия по Уэлфорду + скетч для перцентилей
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 512):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.last = None
+        self.diff_sum = 0.0
+        self.diff_count = 0
+        self.sketch = QuantileSketch(relative_accuracy, max_bins)
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+        if self.last is not None:
+            self.diff_sum += abs(value - self.last)
+            self.diff_count += 1
+        self.last = value
+
+        self.sketch.add(value)
+
+    def new_sequence(self):
+        # Следующий замер не сравнивается с предыдущим: например, начался другой прыжок
+        self.last = None
+
+    def merge(self, other: 'RunningStats'):
+        if other.count == 0:
+            return
+
+        if self.count == 0:
+            self.mean = other.mean
+            self.m2 = other.m2
+        else:
+            total = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / total
+            self.m2 += other.m2 + delta * delta * self.count * other.count / total
+
+        self.count += other.count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        # Стык двух потоков не учитывается: соседство замеров между воркерами неизвестно
+        self.diff_sum += other.diff_sum
+        self.diff_count += other.diff_count
+        self.last = other.last
+        self.sketch.merge(other.sketch)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def jitter(self) -> float:
+        # Средняя разница между соседними замерами RTT одной последовательности (см. new_sequence)
+        return self.diff_sum / self.diff_count if self.diff_count else 0.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        value = self.sketch.quantile(q)
+        if value is None:
+            return None
+        # Скетч не знает точных границ — ограничиваем реальными min/max
+        return min(max(value, self.min), self.max)
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'variance': self.variance,
+            'jitter': self.jitter,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+        }
@@ -0,0 +1,51 @@
+from typing import Dict, Hashable, Iterable, List, Optional
+
+
+def hop_ip_key(hop: Dict) -> Optional[Hashable]:
+    # Ключ узла прыжка: id из таблицы символов парсера, а у прыжков, собранных не парсером, — сам адрес.
+    # None — таймаут
+    ip_id = hop.get('ip_id')
+    if ip_id is not None:
+        return ip_id or None
+    ip_address = hop.get('ip_address')
+    return ip_address if ip_address and ip_address != '*' else None
+
+
+class SymbolTable:
+    # Каждое имя хоста и IP хранится в пачке один раз: прыжки ссылаются на общий объект строки и его id.
+    # id 0 — отсутствующее значение (таймаут)
+    def __init__(self):
+        self.ids = {None: 0}
+        self.symbols = [None]
+
+    def intern(self, value: Optional[str]) -> int:
+        symbol_id = self.ids.get(value)
+        if symbol_id is None:
+            symbol_id = len(self.symbols)
+            self.ids[value] = symbol_id
+            self.symbols.append(value)
+        return symbol_id
+
+    def value(self, symbol_id: int) -> Optional[str]:
+        return self.symbols[symbol_id]
+
+    def merge(self, other: 'SymbolTable') -> List[int]:
+        # Перевод id другой таблицы в id этой: индекс списка — старый id
+        return [self.intern(value) for value in other.symbols]
+
+    def remap_hops(self, hops: Iterable[Dict], mapping: List[int]):
+        # Прыжки из другой пачки переводятся на id и строки этой таблицы
+        symbols = self.symbols
+        for hop in hops:
+            ip_id = mapping[hop['ip_id']]
+            host_id = mapping[hop['host_id']]
+            hop['ip_id'] = ip_id
+            hop['host_id'] = host_id
+            hop['ip_address'] = symbols[ip_id]
+            hop['hostname'] = symbols[host_id] or '*'
+
+    def __len__(self) -> int:
+        return len(self.symbols) - 1
+
+    def __contains__(self, value: Optional[str]) -> bool:
+        return value in self.ids
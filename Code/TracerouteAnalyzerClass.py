@@ -1,33 +1,50 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+try:
+    from Code.Loops import find_loops
+    from Code.Symbols import hop_ip_key
+except ImportError:
+    from Loops import find_loops
+    from Symbols import hop_ip_key
+
+
+class DummyGeoIP:
+    def analyze_countries(self, hops):
+        return {'hop_countries': {}, 'hop_locations': {}, 'unique_countries': set(), 'hostname_countries': set(),
+                'issues': []}
 
 
 class TracerouteAnalyzer:
-    def __init__(self, enable_geo=False):
+    def __init__(self, enable_geo=False, baseline=None, learn_baseline=True):
         self.issues = []
         self.geoip = None
+        self.geo_error = None
         self.route_complexity_warnings = []
+        # Место и роль узлов по именам хостов последней трассировки: номер прыжка -> поля HostnameEnricher
+        self.hop_locations = {}
+        # Замечания последней трассировки (высокое среднее время, много прыжков, таймауты)
+        self.warnings = []
+        self.baseline = baseline
+        self.learn_baseline = learn_baseline
 
         if enable_geo:
+            # Модуль Geo грузится только когда геолокация действительно нужна
             try:
                 try:
                     from Code.Geo import GeoIP
                 except ImportError:
                     from Geo import GeoIP
                 self.geoip = GeoIP(enabled=True)
-                print("✅ Геолокация включена")
             except ImportError as e:
-                print(f"⚠️  Геолокация недоступна: {e}")
+                self.geo_error = str(e)
                 self.geoip = None
         else:
-            class DummyGeoIP:
-                def analyze_countries(self, hops):
-                    return {'hop_countries': {}, 'unique_countries': set(), 'issues': []}
-
             self.geoip = DummyGeoIP()
 
     def analyze(self, parser) -> List[Dict]:
         self.issues = []
         self.route_complexity_warnings = []
+        self.hop_locations = {}
 
         self._check_high_latency(parser.hops)
         self._check_packet_loss(parser.hops)
@@ -35,15 +52,33 @@ class TracerouteAnalyzer:
 
         self._check_route_complexity(parser)
 
+        if self.baseline is not None:
+            self._check_baseline_deviation(parser)
+            if self.learn_baseline:
+                self.baseline.update_trace(parser)
+
         if self.geoip:
             geo_result = self.geoip.analyze_countries(parser.hops)
             self.issues.extend(geo_result['issues'])
+            self.hop_locations = geo_result['hop_locations']
+
+        self.warnings = self._get_warnings(parser.hops)
 
         all_issues = self.issues.copy()
         all_issues.extend(self.route_complexity_warnings)
 
         return all_issues
 
+    def analyze_hop(self, hop: Dict) -> List[Dict]:
+        # Проверки, которым хватает одного прыжка: запускаются сразу, пока трассировка еще идет
+        route_issues = self.issues
+        self.issues = []
+        self._check_high_latency([hop])
+        self._check_packet_loss([hop])
+        hop_issues = self.issues
+        self.issues = route_issues
+        return hop_issues
+
     def _check_high_latency(self, hops: List[Dict]):
         for hop in hops:
             if hop['type'] == 'timeout':
@@ -71,21 +106,67 @@ class TracerouteAnalyzer:
                 })
 
     def _check_routing_loops(self, hops: List[Dict]):
-        seen_ips = {}
+        # Одна проблема на повторяющийся сегмент, а не на каждый повтор IP.
+        # Петля — цикл из двух и более узлов, пройденный минимум дважды (A→B→A→B); однократный повтор
+        # (A→X→A) и одинаковые прыжки подряд бывают артефактами балансировки и идут замечанием repeated_hop.
+        # Сравниваются id из таблицы символов парсера или адреса прыжков не из парсера
+        for start, period, length in find_loops([hop_ip_key(hop) for hop in hops]):
+            repeat_hop = hops[start + period]
+            cycle = [hop.get('ip_address') or '*' for hop in hops[start:start + period]]
+            if period > 1 and length >= 2 * period:
+                self.issues.append({
+                    'type': 'routing_loop',
+                    'hop_number': repeat_hop['hop_number'],
+                    'loop_start': hops[start]['hop_number'],
+                    'period': period,
+                    'length': length,
+                    'message': f"Петля: {' → '.join(cycle)} повторяется с прыжка {hops[start]['hop_number']} "
+                               f"(период {period}, длина {length})"
+                })
+            else:
+                self.route_complexity_warnings.append({
+                    'type': 'repeated_hop',
+                    'hop_number': repeat_hop['hop_number'],
+                    'loop_start': hops[start]['hop_number'],
+                    'period': period,
+                    'length': length,
+                    'message': f"Повтор узла {cycle[0]} на прыжке {repeat_hop['hop_number']} "
+                               f"(впервые на прыжке {hops[start]['hop_number']})"
+                })
 
-        for hop in hops:
+    def _check_baseline_deviation(self, parser):
+        target = parser.target_ip or parser.target_host
+        if not target:
+            return
+
+        for hop in parser.hops:
             ip = hop['ip_address']
             if not ip or ip == '*':
                 continue
 
-            if ip in seen_ips:
+            base = self.baseline.get(target, ip)
+            if not base or base['samples'] < 5:
+                continue
+
+            avg_time = hop.get('avg_time')
+            if avg_time is not None and base['latency_samples'] >= 5:
+                # Нижняя граница σ в 1 мс, чтобы стабильный узел не давал ложных срабатываний
+                z_score = (avg_time - base['latency_mean']) / max(base['latency_std'], 1.0)
+                if z_score > 3:
+                    self.issues.append({
+                        'type': 'latency_anomaly',
+                        'hop_number': hop['hop_number'],
+                        'message': f'Задержка выше обычной: {avg_time:.0f} мс '
+                                   f'(обычно {base["latency_mean"]:.0f} мс, z={z_score:.1f})'
+                    })
+
+            if hop['packet_loss'] - base['loss_mean'] > 30:
                 self.issues.append({
-                    'type': 'routing_loop',
+                    'type': 'loss_anomaly',
                     'hop_number': hop['hop_number'],
-                    'message': f'Петля: IP {ip} повторяется'
+                    'message': f'Потери выше обычных: {hop["packet_loss"]:.0f}% '
+                               f'(обычно {base["loss_mean"]:.0f}%)'
                 })
-            else:
-                seen_ips[ip] = True
 
     def _check_route_complexity(self, parser):
         metrics = parser.complexity_metrics
@@ -137,11 +218,9 @@ class TracerouteAnalyzer:
         total_time = 0
         valid_hops = 0
         for hop in hops:
-            if hop['type'] != 'timeout':
-                valid_times = [t for t in hop['times'] if t is not None]
-                if valid_times:
-                    total_time += sum(valid_times) / len(valid_times)
-                    valid_hops += 1
+            if hop['type'] != 'timeout' and hop.get('avg_time') is not None:
+                total_time += hop['avg_time']
+                valid_hops += 1
 
         if valid_hops > 0:
             avg_time = total_time / valid_hops
@@ -157,61 +236,15 @@ class TracerouteAnalyzer:
 
         return warnings
 
-    def print_report(self, parser):
-        print("=== АНАЛИЗ TRACEROUTE ===")
-
-        summary = parser.get_summary()
-        if summary:
-            print(f"Цель: {summary['target_host']} ({summary['target_ip']})")
-            print(f"Прыжков: {summary['total_hops']}")
-            print(f"Средняя задержка: {summary['average_latency']:.1f} мс")
-            print(f"Потери пакетов: {summary['timeout_hops']} прыжков с таймаутами")
-            print(f"Сложность маршрута: {summary['route_complexity']}")
-
-        print("\nДетали прыжков:")
-        for hop in parser.hops:
-            if hop['type'] == 'timeout':
-                print(f"  {hop['hop_number']:2d}. Таймаут (потеряно 100% пакетов)")
-            else:
-                valid_times = [t for t in hop['times'] if t is not None]
-                if valid_times:
-                    avg_time = sum(valid_times) / len(valid_times)
-                    loss_percent = hop['packet_loss']
-                    status = "✅" if loss_percent == 0 else "⚠️" if loss_percent < 50 else "❌"
-                    ip_display = hop['ip_address'] if hop['ip_address'] else "Unknown"
-                    print(
-                        f"  {hop['hop_number']:2d}. {status} {ip_display:15} - {avg_time:5.1f} мс (потерь: {loss_percent:.0f}%)")
-
-        all_issues = self.issues + self.route_complexity_warnings
-        if all_issues:
-            print(f"\nОбнаружено проблем: {len(all_issues)}")
-            for issue in all_issues:
-                # Определяем иконку по типу проблемы
-                if issue['type'] == 'routing_loop':
-                    icon = "🔴"
-                elif issue['type'] == 'high_latency':
-                    icon = "🟡"
-                elif issue['type'] == 'packet_loss':
-                    icon = "🔵"
-                elif 'timeout' in issue['type']:
-                    icon = "⏱️"
-                elif 'complex' in issue['type'] or 'diversity' in issue['type']:
-                    icon = "🔄"
-                else:
-                    icon = "⚠️"
-
-                hop_num = issue['hop_number']
-                hop_display = f"прыжок {hop_num}" if hop_num > 0 else "весь маршрут"
-
-                print(f"   {icon} {issue['message']} ({hop_display})")
-        else:
-            print(f"\n✅ Критических проблем не обнаружено!")
-
-        warnings = self._get_warnings(parser.hops)
-        if warnings:
-            print(f"\nℹ️  Замечания:")
-            for warning in warnings:
-                print(f"   • {warning}")
+    def print_report(self, parser, fixes: Optional[List[str]] = None):
+        # Консольный вывод — тот же текстовый отчет, что пишется в файл (Report.build_report)
+        try:
+            from Code.Report import ReportWriter, build_report
+        except ImportError:
+            from Report import ReportWriter, build_report
+        report = build_report(parser, self.issues + self.route_complexity_warnings, fixes,
+                              locations=self.hop_locations, warnings=self.warnings)
+        print(ReportWriter().render(report, 'text'), end='')
 
         if self.geoip and hasattr(self.geoip, 'analyze_countries'):
             geo_result = self.geoip.analyze_countries(parser.hops)
@@ -226,8 +259,19 @@ class TracerouteAnalyzer:
                 for country, hops_list in countries_hops.items():
                     hops_str = ", ".join(map(str, sorted(hops_list)))
                     print(f"   🌍 {country}: прыжки {hops_str}")
-            elif hasattr(self.geoip, '__class__') and self.geoip.__class__.__name__ != 'DummyGeoIP':
+
+                if geo_result['hop_locations']:
+                    try:
+                        from Code.Hostnames import format_location
+                    except ImportError:
+                        from Hostnames import format_location
+                    print(f"\nУзлы по именам хостов:")
+                    for hop_num, location in sorted(geo_result['hop_locations'].items()):
+                        print(f"   📍 прыжок {hop_num}: {format_location(location)}")
+            elif not isinstance(self.geoip, DummyGeoIP):
                 print(f"\nℹ️  Географическая информация недоступна")
+        elif self.geo_error:
+            print(f"\n⚠️  Геолокация недоступна: {self.geo_error}")
 
     def get_analysis_summary(self) -> Dict:
         return {
@@ -0,0 +1,178 @@
+import argparse
+import fnmatch
+import random
+import re
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from Code.ParallelParse import next_header, open_map
+    from Code.ParserClass import TracerouteParser
+    from Code.Quarantine import ErrorBudget
+    from Code.Symbols import SymbolTable
+    from Code.TracerouteAnalyzerClass import TracerouteAnalyzer
+except ImportError:
+    from ParallelParse import next_header, open_map
+    from ParserClass import TracerouteParser
+    from Quarantine import ErrorBudget
+    from Symbols import SymbolTable
+    from TracerouteAnalyzerClass import TracerouteAnalyzer
+
+# Перевод строк в пропущенных кусках считаем блоками, чтобы не копировать гигабайты разом
+_COUNT_BLOCK = 1 << 24
+# Имя цели и IP из заголовка, как их берет парсер: "traceroute to host (ip), ..."
+_HEADER_TARGET = re.compile(r'traceroute to\s+(\S+)(?:\s+\(([\d.]+)\))?')
+
+
+def _count_newlines(mm, start: int, end: int) -> int:
+    count = 0
+    for position in range(start, end, _COUNT_BLOCK):
+        count += mm[position:min(position + _COUNT_BLOCK, end)].count(b'\n')
+    return count
+
+
+class TraceTriage:
+    # Быстрый ответ "есть ли в архиве петли / большие потери": заголовки ищутся прямо в mmap,
+    # трассировки чужих целей и не попавшие в выборку не декодируются и не разбираются.
+    # Разбор останавливается, как только найдено limit проблем нужных типов
+    def __init__(self, issue_types: Optional[Iterable[str]] = None, limit: Optional[int] = None,
+                 targets: Optional[Iterable[str]] = None, stride: int = 1, sample: Optional[int] = None,
+                 seed: Optional[int] = None, analyzer: Optional[TracerouteAnalyzer] = None,
+                 budget: Optional[ErrorBudget] = None):
+        if stride < 1:
+            raise ValueError("stride должен быть >= 1")
+        if sample is not None and sample < 1:
+            raise ValueError("sample должен быть >= 1")
+
+        self.issue_types = set(issue_types) if issue_types else None
+        self.limit = limit
+        # Шаблоны fnmatch по имени цели или ее IP из заголовка
+        self.targets = list(targets) if targets else None
+        self.stride = stride
+        self.sample = sample
+        self.random = random.Random(seed)
+        # Анализатор по умолчанию без базовых линий: выборка не представляет весь поток.
+        # Переданный анализатор с базовыми линиями будет обучаться и на выборке
+        self.analyzer = analyzer or TracerouteAnalyzer(enable_geo=False)
+        self.budget = budget
+
+        self.headers_seen = 0
+        self.skipped = 0
+        self.parsed = 0
+        self.found = 0
+        self.bytes_parsed = 0
+        self.stopped_early = False
+
+    def matches_target(self, header: str) -> bool:
+        if self.targets is None:
+            return True
+        match = _HEADER_TARGET.search(header)
+        if match is None:
+            return False
+        names = [name for name in match.groups() if name]
+        return any(fnmatch.fnmatch(name, pattern) for pattern in self.targets for name in names)
+
+    def iter_spans(self, mm) -> Iterator[Tuple[int, int]]:
+        # Байтовые границы трассировок, прошедших фильтр целей и шаг выборки, в порядке файла
+        size = len(mm)
+        start = next_header(mm, 0)
+        index = 0
+        while start is not None:
+            header_end = mm.find(b'\n', start)
+            if header_end < 0:
+                header_end = size
+            end = next_header(mm, header_end)
+            if end is None:
+                end = size
+            self.headers_seen += 1
+
+            if self.targets is not None and not self.matches_target(
+                    mm[start:header_end].decode('utf-8', errors='ignore')):
+                self.skipped += 1
+            elif index % self.stride:
+                index += 1
+                self.skipped += 1
+            else:
+                index += 1
+                yield start, end
+            start = end if end < size else None
+
+    def select_spans(self, mm) -> Iterable[Tuple[int, int]]:
+        # Без sample — ленивый генератор, с sample — отсортированный список выборки
+        spans = self.iter_spans(mm)
+        if self.sample is None:
+            return spans
+
+        # Резервуарная выборка (алгоритм R) по одним заголовкам; разбираем выбранное в порядке файла
+        reservoir = []
+        seen = 0
+        for span in spans:
+            if seen < self.sample:
+                reservoir.append(span)
+            else:
+                slot = self.random.randrange(seen + 1)
+                if slot < self.sample:
+                    reservoir[slot] = span
+            seen += 1
+        self.skipped += seen - len(reservoir)
+        return sorted(reservoir)
+
+    def run(self, file_path: str) -> Iterator[Tuple[TracerouteParser, List[Dict]]]:
+        # Отдает (парсер, проблемы запрошенных типов) для каждой разобранной трассировки
+        mm = open_map(file_path)
+        if mm is None:
+            return
+
+        symbols = SymbolTable()
+        line_number = 1
+        line_position = 0
+        with mm:
+            for start, end in self.select_spans(mm):
+                line_number += _count_newlines(mm, line_position, start)
+                line_position = start
+
+                text = mm[start:end].decode('utf-8', errors='ignore')
+                if text.endswith('\n'):
+                    text = text[:-1]
+                parser = TracerouteParser(symbols, self.budget)
+                parser.parse_output(text, first_line=line_number, first_offset=start)
+                self.parsed += 1
+                self.bytes_parsed += end - start
+
+                issues = self.analyzer.analyze(parser) if parser.hops else []
+                if self.issue_types is not None:
+                    issues = [issue for issue in issues if issue['type'] in self.issue_types]
+                self.found += len(issues)
+                yield parser, issues
+
+                if self.limit is not None and self.found >= self.limit:
+                    self.stopped_early = True
+                    return
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Быстрая проверка большого архива трассировок")
+    arg_parser.add_argument('file')
+    arg_parser.add_argument('--issue', action='append', help="Тип проблемы (можно несколько), например routing_loop")
+    arg_parser.add_argument('--limit', type=int, help="Остановиться после стольких найденных проблем")
+    arg_parser.add_argument('--target', action='append', help="Шаблон цели или IP (fnmatch), можно несколько")
+    arg_parser.add_argument('--stride', type=int, default=1, help="Брать каждую N-ю трассировку")
+    arg_parser.add_argument('--sample', type=int, help="Случайная выборка из N трассировок")
+    arg_parser.add_argument('--seed', type=int)
+    args = arg_parser.parse_args()
+
+    triage = TraceTriage(args.issue, args.limit, args.target, args.stride, args.sample, args.seed)
+    start_time = time.perf_counter()
+    for parser, issues in triage.run(args.file):
+        for issue in issues:
+            print(f"  • {parser.target_host}: {issue['message']}")
+
+    elapsed = time.perf_counter() - start_time
+    print(f"📊 Заголовков: {triage.headers_seen}, разобрано: {triage.parsed}, пропущено: {triage.skipped}, "
+          f"найдено проблем: {triage.found}, время: {elapsed:.2f} сек")
+    if triage.stopped_early:
+        print(f"⏹️  Остановлено после {triage.found} найденных проблем")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+from typing import Dict, Optional
+
+try:
+    from Code.Api import TracerouteSession, analyze_text
+    from Code.Baseline import BaselineStore, trace_samples
+    from Code.ParserClass import iter_traces
+    from Code.TracerouteAnalyzerClass import TracerouteAnalyzer
+except ImportError:
+    from Api import TracerouteSession, analyze_text
+    from Baseline import BaselineStore, trace_samples
+    from ParserClass import iter_traces
+    from TracerouteAnalyzerClass import TracerouteAnalyzer
+
+# Задачи пула процессов, общие для демона и HTTP-сервера; без inotify/ctypes, которые нужны только демону
+# Состояние воркера живет весь срок процесса: GeoIP и базовые линии не пересоздаются на каждый файл
+_worker_state = {}
+
+
+def init_worker(enable_geo: bool, baseline_path: Optional[str]):
+    # Воркер только читает базовые линии; замеры уходят в результате ('baseline_updates'),
+    # и их применяет единственный писатель — родительский процесс (open_baseline_writer)
+    baseline = BaselineStore(baseline_path, read_only=True) if baseline_path else None
+
+    analyzer = TracerouteAnalyzer(enable_geo=enable_geo, baseline=baseline, learn_baseline=False)
+    _worker_state['analyzer'] = analyzer
+    # Сессии с коррекцией и без делят один анализатор
+    _worker_state['sessions'] = {autocorrect: TracerouteSession(autocorrect, analyzer=analyzer)
+                                 for autocorrect in (True, False)}
+    _worker_state['corrector'] = _worker_state['sessions'][True].corrector
+
+
+def open_baseline_writer(baseline_path: Optional[str]):
+    # Открывается в родителе до запуска пула: создает таблицу, которую воркеры читают
+    return BaselineStore(baseline_path, batch_size=100) if baseline_path else None
+
+
+def apply_baseline_updates(baseline, result: Dict):
+    # Убирает замеры из результата воркера и пишет их в базовые линии родителя
+    updates = result.pop('baseline_updates', None)
+    if baseline is not None and updates:
+        for target, samples in updates:
+            baseline.update_samples(target, samples)
+
+
+def apply_export(exporter, result: Dict):
+    # Убирает трассировки для выгрузки из результата воркера и пишет их единственным экспортером родителя
+    traces = result.pop('export', None)
+    if exporter is not None and traces:
+        for trace in traces:
+            exporter.write_result(trace)
+
+
+def _get_state() -> Dict:
+    if 'analyzer' not in _worker_state:
+        init_worker(False, None)
+    return _worker_state
+
+
+def correct_text(content: str) -> Dict:
+    corrected, fixes = _get_state()['corrector'].correct(content)
+    return {'corrected': corrected, 'fixes': fixes}
+
+
+def parse_text(content: str) -> Dict:
+    traces = []
+    for parser in iter_traces(content):
+        traces.append({
+            'summary': parser.get_summary(),
+            'hops': parser.hops,
+            'errors': parser.errors,
+        })
+    return {'traces': traces}
+
+
+def analyze_content(content: str, autocorrect: bool = True, export: bool = False) -> Dict:
+    # Компактный ответ демона и сервера на основе Api.analyze_text: без прыжков, исправления — числом.
+    # export — прыжки для колоночной выгрузки уходят отдельно ('export'), ее применяет родитель (apply_export)
+    state = _get_state()
+    results = analyze_text(content, session=state['sessions'][autocorrect])
+
+    traces = []
+    updates = []
+    for result in results:
+        traces.append({
+            'summary': result['summary'],
+            'issues': result['issues'],
+            'errors': result['errors'],
+        })
+        target = result['target_ip'] or result['target_host']
+        if state['analyzer'].baseline is not None and target:
+            updates.append((target, trace_samples(result['hops'])))
+
+    response = {'fixes': sum(len(result['fixes']) for result in results), 'traces': traces}
+    if updates:
+        response['baseline_updates'] = updates
+    if export:
+        response['export'] = [{key: result[key] for key in ('target_host', 'target_ip', 'hops', 'issues', 'fixes')}
+                              for result in results if result['hops']]
+    return response
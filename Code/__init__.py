@@ -0,0 +1,46 @@
+import importlib
+
+# Ленивые реэкспорты: "import Code.ParserClass" не тянет за собой остальные модули
+_EXPORTS = {
+    'analyze_text': 'Api',
+    'analyze_file': 'Api',
+    'analyze_stream': 'Api',
+    'TracerouteSession': 'Api',
+    'TracerouteParser': 'ParserClass',
+    'iter_traces': 'ParserClass',
+    'split_traces': 'ParserClass',
+    'parse_file_parallel': 'ParallelParse',
+    'aggregate_file_parallel': 'ParallelParse',
+    'TracerouteAnalyzer': 'TracerouteAnalyzerClass',
+    'TracerouteAutoCorrector': 'AutoCorrector',
+    'CorrectionRule': 'AutoCorrector',
+    'GeoIP': 'Geo',
+    'HostnameEnricher': 'Hostnames',
+    'ReverseResolver': 'Hostnames',
+    'TracerouteAggregator': 'Aggregator',
+    'BaselineStore': 'Baseline',
+    'RouteDiffer': 'RouteDiff',
+    'diff_routes': 'RouteDiff',
+    'PathIndex': 'PathIndex',
+    'ReportWriter': 'Report',
+    'build_report': 'Report',
+    'HopExporter': 'Exporter',
+    'AlertEngine': 'Alerts',
+    'AlertRule': 'Alerts',
+    'TraceTriage': 'Triage',
+    'TracerouteRunner': 'Runner',
+    'SymbolTable': 'Symbols',
+    'ErrorBudget': 'Quarantine',
+    'QuarantineWriter': 'Quarantine',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module_name}"), name)
+    globals()[name] = value
+    return value
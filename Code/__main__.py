@@ -0,0 +1,3 @@
+from Code.main import cli
+
+cli()
@@ -1,10 +1,12 @@
 import sys
 import os
 import time
-from ParserClass import TracerouteParser
-from TracerouteAnalyzerClass import TracerouteAnalyzer
-from AutoCorrector import TracerouteAutoCorrector
+# Модули анализа импортируются внутри режимов: запуск CLI не платит за то, что не используется
 AUTOCORRECTOR_AVAILABLE = True
+ERROR_BUDGET_PERCENT = 20
+# Отдельные режимы: флаг командной строки -> модуль с main()
+SERVICES = {'--daemon': 'Daemon', '--serve': 'Server', '--run': 'Runner', '--triage': 'Triage',
+            '--correct': 'AutoCorrector'}
 
 
 def main():
@@ -61,6 +63,10 @@ def main():
 
     if use_autocorrect and AUTOCORRECTOR_AVAILABLE:
         print("\n🔧 Применяю автокоррекцию...")
+        try:
+            from Code.AutoCorrector import TracerouteAutoCorrector
+        except ImportError:
+            from AutoCorrector import TracerouteAutoCorrector
         corrector = TracerouteAutoCorrector()
         content_to_analyze, applied_fixes = corrector.correct(original_content)
 
@@ -103,20 +109,36 @@ def main():
 
     start_time = time.time()
 
-    parser = TracerouteParser()
-    parse_success = parser.parse_output(content_to_analyze)
-
-    if not parse_success:
-        print("❌ Ошибки парсинга:")
+    try:
+        from Code.ParserClass import TracerouteParser
+        from Code.Quarantine import ErrorBudget, QuarantineWriter
+        from Code.TracerouteAnalyzerClass import TracerouteAnalyzer
+    except ImportError:
+        from ParserClass import TracerouteParser
+        from Quarantine import ErrorBudget, QuarantineWriter
+        from TracerouteAnalyzerClass import TracerouteAnalyzer
+
+    # Нераспознанные строки не останавливают анализ: они уходят в карантин, хорошие прыжки остаются
+    quarantine_path = f"{os.path.splitext(file_path)[0]}_QUARANTINE.jsonl"
+    with QuarantineWriter(quarantine_path) as quarantine:
+        parser = TracerouteParser(budget=ErrorBudget(max_percent=ERROR_BUDGET_PERCENT), quarantine=quarantine)
+        parse_success = parser.parse_output(content_to_analyze)
+
+    if parser.error_count:
+        print(f"{'⚠️ ' if parse_success else '❌'} Ошибки парсинга: {parser.error_count}")
         for error in parser.errors[:5]:
             print(f"  • {error}")
+        print(f"  🗄️  Нераспознанные строки сохранены: {quarantine_path}")
 
         if use_autocorrect and applied_fixes:
             print("\n⚠️  Автокоррекция не помогла исправить все ошибки")
         elif AUTOCORRECTOR_AVAILABLE and not use_autocorrect:
             print("\n💡 Попробуйте включить автокоррекцию!")
 
+    if not parser.hops:
         return
+    if not parse_success:
+        print(f"\n⚠️  Ошибок больше {ERROR_BUDGET_PERCENT}% строк, результаты ниже неполные")
 
     parse_time = time.time() - start_time
     print(f"✅ Парсинг завершен за {parse_time:.2f} сек")
@@ -125,8 +147,18 @@ def main():
     analyzer = TracerouteAnalyzer(enable_geo=False)
     issues = analyzer.analyze(parser)
 
+    try:
+        from Code.Report import ReportWriter, build_report
+    except ImportError:
+        from Report import ReportWriter, build_report
+    # Один отчет на консоль и в файл: вычисления по прыжкам не повторяются
+    report = build_report(parser, issues, applied_fixes, file_path, corrected_file_path,
+                          elapsed=time.time() - start_time, locations=analyzer.hop_locations,
+                          warnings=analyzer.warnings)
+    writer = ReportWriter()
+
     print("\n" + "=" * 60)
-    analyzer.print_report(parser)
+    print(writer.render(report, 'text'), end='')
     print("=" * 60)
 
     report_choice = input("\n📄 Сохранить отчет анализа в файл? [Y/n]: ").strip().lower()
@@ -135,65 +167,26 @@ def main():
         report_file_path = f"{base_name}_REPORT.txt"
 
         try:
-            with open(report_file_path, 'w', encoding='utf-8') as f:
-                f.write(f"ОТЧЕТ АНАЛИЗА TRACEROUTE\n")
-                f.write(f"Файл: {file_path}\n")
-                f.write(f"Время анализа: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-
-                if corrected_file_path:
-                    f.write(f"Исправленный файл: {corrected_file_path}\n")
-                    f.write(f"Исправлений: {len(applied_fixes)}\n")
-
-                f.write("=" * 60 + "\n\n")
-
-                summary = parser.get_summary()
-                if summary:
-                    f.write("📊 СВОДКА:\n")
-                    f.write(f"  Цель: {summary['target_host']} ({summary['target_ip']})\n")
-                    f.write(f"  Прыжков: {summary['total_hops']}\n")
-                    f.write(f"  Средняя задержка: {summary['average_latency']:.1f} мс\n")
-                    f.write(f"  Таймауты: {summary['timeout_hops']} прыжков\n")
-                    f.write(f"  Сложность маршрута: {summary['route_complexity']}\n\n")
-
-                f.write("📈 ДЕТАЛИ ПРЫЖКОВ:\n")
-                for hop in parser.hops:
-                    if hop['type'] == 'timeout':
-                        f.write(f"  {hop['hop_number']:2d}. Таймаут (потеряно 100% пакетов)\n")
-                    else:
-                        valid_times = [t for t in hop['times'] if t is not None]
-                        if valid_times:
-                            avg_time = sum(valid_times) / len(valid_times)
-                            loss_percent = hop['packet_loss']
-                            status = "OK" if loss_percent == 0 else "WARN" if loss_percent < 50 else "ERROR"
-                            ip_display = hop['ip_address'] if hop['ip_address'] else "Unknown"
-                            f.write(
-                                f"  {hop['hop_number']:2d}. {status:4} {ip_display:15} - {avg_time:5.1f} мс (потерь: {loss_percent:.0f}%)\n")
-
-                f.write("\n" + "=" * 60 + "\n")
-                f.write("⚠️  ОБНАРУЖЕННЫЕ ПРОБЛЕМЫ:\n")
-
-                if issues:
-                    for issue in issues:
-                        if issue['hop_number'] == 0:
-                            f.write(f"  • {issue['message']}\n")
-                        else:
-                            f.write(f"  • {issue['message']} (прыжок {issue['hop_number']})\n")
-                else:
-                    f.write("  ✅ Критических проблем не обнаружено\n")
-
-                f.write("\n" + "=" * 60 + "\n")
-                f.write("📊 СТАТИСТИКА:\n")
-                total_time = time.time() - start_time
-                f.write(f"  Время анализа: {total_time:.2f} сек\n")
-                f.write(f"  Исправлений: {len(applied_fixes)}\n")
-                f.write(f"  Проблем в маршруте: {len(issues)}\n")
-                f.write(f"  Успешных прыжков: {len([h for h in parser.hops if h['packet_loss'] == 0])}\n")
-
+            writer.write(report_file_path, report, fmt='text')
             print(f"✅ Отчет сохранен в файл: {report_file_path}")
 
         except Exception as e:
             print(f"❌ Ошибка сохранения отчета: {e}")
 
+    export_choice = input("\n📦 Выгрузить прыжки в колоночный формат (Parquet/CSV)? [y/N]: ").strip().lower()
+    if export_choice == 'y':
+        try:
+            try:
+                from Code.Exporter import HopExporter
+            except ImportError:
+                from Exporter import HopExporter
+            with HopExporter(f"{os.path.splitext(file_path)[0]}_EXPORT") as exporter:
+                exporter.write_trace(parser, issues, applied_fixes)
+            print(f"✅ Выгрузка сохранена: {', '.join(exporter.path_for(name) for name in exporter.TABLES)}")
+
+        except Exception as e:
+            print(f"❌ Ошибка выгрузки: {e}")
+
     total_time = time.time() - start_time
 
     print(f"\n📊 ФИНАЛЬНАЯ СТАТИСТИКА:")
@@ -214,7 +207,24 @@ def main():
     print("=" * 60)
 
 
-if __name__ == "__main__":
+def run_service(mode):
+    import importlib
+
+    module_name = SERVICES[mode]
+    try:
+        module = importlib.import_module(f"Code.{module_name}")
+    except ImportError:
+        module = importlib.import_module(module_name)
+
+    sys.argv = [f"{os.path.basename(sys.argv[0])} {mode}"] + sys.argv[2:]
+    module.main()
+
+
+def cli():
+    if len(sys.argv) > 1 and sys.argv[1] in SERVICES:
+        run_service(sys.argv[1])
+        return
+
     try:
         main()
     except KeyboardInterrupt:
@@ -222,4 +232,9 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"\n💥 Ошибка: {e}")
 
-    input("\nНажмите Enter для выхода...")
\ No newline at end of file
+    if sys.stdin.isatty():
+        input("\nНажмите Enter для выхода...")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,143 @@
+import json
+import os
+import time
+import tracemalloc
+import unittest
+
+from Benchmarks.CorpusGenerator import TracerouteCorpusGenerator
+from Code.AutoCorrector import TracerouteAutoCorrector
+from Code.ParserClass import split_traces, TracerouteParser
+from Code.TracerouteAnalyzerClass import TracerouteAnalyzer
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'performance_baseline.json')
+UPDATE_BASELINE = os.environ.get('UPDATE_PERF_BASELINE') == '1'
+# Замеры долгие и зависят от загрузки машины: в обычный прогон не входят, включаются явно
+RUN_PERF_TESTS = UPDATE_BASELINE or os.environ.get('RUN_PERF_TESTS') == '1'
+
+# Допуски: время шумит сильнее, чем память
+TIME_TOLERANCE = 1.5
+MEMORY_TOLERANCE = 1.25
+MEMORY_SLACK_BYTES = 64
+
+
+def calibrate(repeat: int = 5) -> float:
+    # Эталонный чисто-питоновский цикл: нормализует замеры под скорость машины
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        values = {}
+        for i in range(200000):
+            key = str(i % 1000)
+            values[key] = values.get(key, 0) + len(key.split('0'))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure(func, hop_count: int, repeat: int = 5) -> dict:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # Пик занятой памяти за прогон, деленный на число прыжков, а не число выделений
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'seconds': best, 'peak_bytes_per_hop': peak / hop_count}
+
+
+@unittest.skipUnless(RUN_PERF_TESTS, "Замеры производительности включаются через RUN_PERF_TESTS=1")
+class TestPerformanceRegression(unittest.TestCase):
+    """Защита горячих путей от замедления и роста потребления памяти"""
+
+    results = {}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.calibration = calibrate()
+        generator = TracerouteCorpusGenerator(seed=1234)
+        cls.corpus = generator.generate_corpus(300, ['clean', 'timeouts'])
+        cls.malformed = generator.generate_corpus(300, ['malformed'])
+
+        cls.hop_lines = []
+        for line in cls.corpus.split('\n'):
+            line = line.strip()
+            parts = line.split()
+            if len(parts) > 4 and parts[0].isdigit():
+                cls.hop_lines.append((int(parts[0]), line))
+
+        cls.hop_words = [line.strip().split() for line in cls.malformed.split('\n')
+                         if line.strip()[:1].isdigit() and len(line.split()) > 1]
+
+        cls.parsers = []
+        for chunk in split_traces(cls.corpus):
+            parser = TracerouteParser()
+            parser.parse_output(chunk)
+            cls.parsers.append(parser)
+        cls.total_hops = sum(len(parser.hops) for parser in cls.parsers)
+
+        with open(BASELINE_PATH, encoding='utf-8') as f:
+            cls.baseline = json.load(f)
+
+    @classmethod
+    def tearDownClass(cls):
+        if UPDATE_BASELINE and cls.results:
+            cls.baseline.update(cls.results)
+            with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+                json.dump(cls.baseline, f, indent=2, sort_keys=True)
+                f.write('\n')
+
+    def check(self, name: str, result: dict):
+        normalized = result['seconds'] / self.calibration
+        current = {'normalized_time': round(normalized, 4),
+                   'peak_bytes_per_hop': round(result['peak_bytes_per_hop'], 1)}
+        self.results[name] = current
+
+        if UPDATE_BASELINE:
+            return
+
+        expected = self.baseline.get(name)
+        if expected is None:
+            self.skipTest(f"Нет базовой линии для {name}, запустите с UPDATE_PERF_BASELINE=1")
+
+        self.assertLessEqual(normalized, expected['normalized_time'] * TIME_TOLERANCE,
+                             f"{name} медленнее базовой линии")
+        self.assertLessEqual(result['peak_bytes_per_hop'],
+                             expected['peak_bytes_per_hop'] * MEMORY_TOLERANCE + MEMORY_SLACK_BYTES,
+                             f"{name}: пик памяти на прыжок выше базовой линии")
+
+    def test_parse_complex_format(self):
+        """_parse_complex_format на строках с IP и временами"""
+        def run():
+            parser = TracerouteParser()
+            for hop_number, line in self.hop_lines:
+                parser._parse_complex_format(hop_number, 1, line)
+
+        self.check('parse_complex_format', measure(run, len(self.hop_lines)))
+
+    def test_process_hop_line(self):
+        """_process_hop_line на строках с типичными ошибками"""
+        def run():
+            corrector = TracerouteAutoCorrector()
+            for words in self.hop_words:
+                corrector._process_hop_line(words, 1)
+
+        self.check('process_hop_line', measure(run, len(self.hop_words)))
+
+    def test_analyze(self):
+        """analyze по разобранным трассировкам"""
+        def run():
+            analyzer = TracerouteAnalyzer()
+            for parser in self.parsers:
+                analyzer.analyze(parser)
+
+        self.check('analyze', measure(run, self.total_hops))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,29 @@
 import sys
+import asyncio
+import importlib.util
+import json
 import unittest
 import os
 import tempfile
+import threading
+import time
 from Code.ParserClass import *
+from Code.Quarantine import *
 from Code.TracerouteAnalyzerClass import *
+from Code.Aggregator import *
+from Code.Baseline import *
+from Code.RouteDiff import *
+from Code.PathIndex import *
+from Code.Report import *
+from Code.Exporter import *
+from Benchmarks.CorpusGenerator import *
+from Code.Daemon import *
+from Code.Workers import *
+from Code.Server import *
+from Code.SharedBatch import *
+from Code.Alerts import *
+from Code.AutoCorrector import *
+from Code.Hostnames import *
 
 
 class TestTracerouteParser(unittest.TestCase):
@@ -95,6 +115,70 @@ another line"""
         self.assertEqual(len(warnings), 1)
         self.assertIn("последовательность", warnings[0])
 
+    def test_interned_symbols(self):
+        """Тест общих id и строк для повторяющихся адресов в пачке"""
+        trace_output = """traceroute to a.com (1.2.3.4), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  1.2 ms  1.5 ms  1.8 ms
+ 2  core.isp.net (10.10.10.1)  5.1 ms  5.3 ms  5.6 ms
+traceroute to b.com (5.6.7.8), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  1.2 ms  1.5 ms  1.8 ms
+ 2  * * *"""
+
+        first, second = iter_traces(trace_output)
+        self.assertIs(first.symbols, second.symbols)
+        self.assertEqual(first.hops[0]['ip_id'], second.hops[0]['ip_id'])
+        self.assertIs(first.hops[0]['ip_address'], second.hops[0]['ip_address'])
+        self.assertEqual(first.hops[0]['host_id'], first.hops[0]['ip_id'])
+        self.assertEqual(first.symbols.value(first.hops[1]['host_id']), 'core.isp.net')
+        self.assertEqual((second.hops[1]['ip_id'], second.hops[1]['hostname']), (0, '*'))
+        self.assertEqual(len(first.symbols), 3)
+
+    def test_error_budget_and_quarantine(self):
+        """Тест терпимого разбора: плохие строки в карантин, хорошие прыжки сохраняются"""
+        import io
+        lines = ["traceroute to test.com (1.2.3.4), 30 hops max, 60 byte packets",
+                 " 1  192.168.1.1 (192.168.1.1)  1.2 ms  1.5 ms  1.8 ms"]
+        lines += [f" {n}x мусор" for n in range(2, 200)]
+        lines.append(" 200  1.2.3.4 (1.2.3.4)  25.1 ms  25.3 ms  25.5 ms")
+        trace_output = "\n".join(lines)
+
+        stream = io.StringIO()
+        parser = TracerouteParser(budget=ErrorBudget(max_percent=99), quarantine=QuarantineWriter(stream))
+        self.assertTrue(parser.parse_output(trace_output))
+        self.assertEqual(len(parser.hops), 2)
+        self.assertEqual(parser.error_count, 198)
+        self.assertEqual(len(parser.errors), MAX_STORED_ERRORS)
+
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(len(records), 198)
+        self.assertEqual(records[0]['line'], 3)
+        self.assertEqual(trace_output.encode()[records[0]['offset']:].split(b"\n")[0].decode(), records[0]['text'])
+
+        strict = TracerouteParser(budget=ErrorBudget(max_errors=10))
+        self.assertFalse(strict.parse_output(trace_output))
+        self.assertEqual(len(strict.hops), 2)
+
+    def test_byte_offsets(self):
+        """Тест байтовых смещений карантина для текста не в ASCII и для куска из середины файла"""
+        data = ("traceroute to сайт.рф (1.2.3.4), 30 hops max, 60 byte packets\n"
+                " 1  шлюз (192.168.1.1)  1.0 ms  1.0 ms  1.0 ms\n"
+                " 2x мусор ошибка\n"
+                "traceroute to b.com (5.6.7.8), 30 hops max, 60 byte packets\n"
+                " 1x ещё мусор\n").encode('utf-8')
+        stream = io.StringIO()
+        quarantine = QuarantineWriter(stream)
+        budget = ErrorBudget(max_percent=99)
+        list(iter_traces(data.decode('utf-8'), budget=budget, quarantine=quarantine))
+        # Как parse_range: кусок начинается со второго заголовка, смещение — байтовое начало куска
+        start = data.index(b'traceroute to b.com')
+        list(iter_traces(data[start:].decode('utf-8'), budget=budget, quarantine=quarantine, first_line=4,
+                         first_offset=start))
+
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([record['line'] for record in records], [3, 5, 5])
+        for record in records:
+            self.assertEqual(data[record['offset']:].split(b"\n")[0].decode('utf-8'), record['text'])
+
 
 class TestTracerouteAnalyzer(unittest.TestCase):
     """Тесты для анализатора traceroute"""
@@ -124,7 +208,7 @@ class TestTracerouteAnalyzer(unittest.TestCase):
  1  192.168.1.1 (192.168.1.1)  1.2 ms  1.5 ms  1.8 ms
  2  10.10.10.1 (10.10.10.1)  5.1 ms  5.3 ms  5.6 ms
  3  192.168.1.1 (192.168.1.1)  15.1 ms  15.3 ms  15.5 ms  # Петля!
- 4  1.2.3.4 (1.2.3.4)  25.1 ms  25.3 ms  25.5 ms"""
+ 4  10.10.10.1 (10.10.10.1)  25.1 ms  25.3 ms  25.5 ms"""
 
         self.parser.parse_output(trace_output)
         issues = self.analyzer.analyze(self.parser)
@@ -134,6 +218,21 @@ class TestTracerouteAnalyzer(unittest.TestCase):
         self.assertIn("Петля", loop_issues[0]['message'])
         self.assertEqual(loop_issues[0]['hop_number'], 3)
 
+    def test_single_repeat_is_not_loop(self):
+        """Тест однократного повтора узла: замечание, а не петля"""
+        trace_output = """traceroute to test.com (1.2.3.4), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  1.2 ms  1.5 ms  1.8 ms
+ 2  10.10.10.1 (10.10.10.1)  5.1 ms  5.3 ms  5.6 ms
+ 3  192.168.1.1 (192.168.1.1)  15.1 ms  15.3 ms  15.5 ms
+ 4  1.2.3.4 (1.2.3.4)  25.1 ms  25.3 ms  25.5 ms
+ 5  1.2.3.4 (1.2.3.4)  25.1 ms  25.3 ms  25.5 ms"""
+
+        self.parser.parse_output(trace_output)
+        issues = self.analyzer.analyze(self.parser)
+
+        self.assertNotIn('routing_loop', [i['type'] for i in issues])
+        self.assertEqual([i['hop_number'] for i in issues if i['type'] == 'repeated_hop'], [3, 5])
+
     def test_no_issues(self):
         """Тест когда проблем нет"""
         trace_output = """traceroute to test.com (1.2.3.4), 30 hops max, 60 byte packets
@@ -166,13 +265,10 @@ class TestIntegration(unittest.TestCase):
         analyzer = TracerouteAnalyzer()
         issues = analyzer.analyze(parser)
 
-        # Должны найти 3 проблемы: петля, таймаут, высокая задержка
-        self.assertEqual(len(issues), 3)
-
-        issue_types = [issue['type'] for issue in issues]
-        self.assertIn('routing_loop', issue_types)
-        self.assertIn('packet_loss', issue_types)
-        self.assertIn('high_latency', issue_types)
+        # Повтор узла, таймаут, высокая задержка и предупреждение о сложности:
+        # 3 уникальных узла на 5 прыжков меньше порога 70%
+        issue_types = sorted(issue['type'] for issue in issues)
+        self.assertEqual(issue_types, ['complex_route', 'high_latency', 'packet_loss', 'repeated_hop'])
 
 
 class TestFileHandling(unittest.TestCase):
@@ -201,3 +297,1124 @@ class TestFileHandling(unittest.TestCase):
         finally:
             # Удаляем временный файл
             os.unlink(temp_file)
+
+
+class TestAggregator(unittest.TestCase):
+    """Тесты агрегации статистики по множеству трассировок"""
+
+    MULTI_TRACE = """traceroute to a.com (1.2.3.4), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  1.0 ms  2.0 ms  3.0 ms
+ 2  10.10.10.1 (10.10.10.1)  10.0 ms  *  12.0 ms
+traceroute to b.com (5.6.7.8), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  4.0 ms  5.0 ms  6.0 ms
+ 2  10.10.10.1 (10.10.10.1)  300.0 ms  310.0 ms  320.0 ms"""
+
+    def test_split_traces(self):
+        """Тест разбиения файла на отдельные трассировки"""
+        parsers = list(iter_traces(self.MULTI_TRACE))
+        self.assertEqual(len(parsers), 2)
+        self.assertEqual(parsers[1].target_host, "b.com")
+        self.assertEqual(len(parsers[1].hops), 2)
+
+    def test_router_statistics(self):
+        """Тест накопления статистики по маршрутизатору"""
+        aggregator = TracerouteAggregator()
+        aggregator.add_traces(iter_traces(self.MULTI_TRACE), timestamp=100.0)
+
+        stats = aggregator.get_router("192.168.1.1")
+        self.assertEqual(stats['count'], 6)
+        self.assertAlmostEqual(stats['mean'], 3.5)
+        self.assertAlmostEqual(stats['variance'], 3.5)
+
+        degraded = aggregator.get_router("10.10.10.1")
+        self.assertAlmostEqual(degraded['loss_rate'], 100 / 6)
+        self.assertEqual(aggregator.top_routers(limit=1)[0][0], "10.10.10.1")
+        self.assertIsNotNone(aggregator.get_link("192.168.1.1", "10.10.10.1"))
+
+    def test_repeated_router_and_negative_link(self):
+        """Тест одной трассировки на повторный узел и отрицательного прироста линка"""
+        aggregator = TracerouteAggregator()
+        aggregator.add_traces(iter_traces("""traceroute to a.com (1.2.3.4), 30 hops max, 60 byte packets
+ 1  10.0.0.1 (10.0.0.1)  20.0 ms  20.0 ms  20.0 ms
+ 2  10.0.0.2 (10.0.0.2)  5.0 ms  5.0 ms  5.0 ms
+ 3  10.0.0.1 (10.0.0.1)  30.0 ms  30.0 ms  30.0 ms
+ 4  10.0.0.2 (10.0.0.2)  40.0 ms  40.0 ms  40.0 ms"""), timestamp=100.0)
+
+        self.assertEqual(aggregator.get_router("10.0.0.1")['traces'], 1)
+        self.assertEqual(aggregator.get_router("10.0.0.1")['count'], 6)
+        link = aggregator.get_link("10.0.0.1", "10.0.0.2")
+        self.assertEqual(link['traces'], 1)
+        # Приросты -15 и 10: отрицательный считается нулем и в среднем, и в перцентилях
+        self.assertAlmostEqual(link['mean'], 5.0)
+        self.assertEqual(link['min'], 0.0)
+
+    def test_bounded_memory(self):
+        """Тест ограничения числа отслеживаемых узлов"""
+        aggregator = TracerouteAggregator(max_routers=1)
+        aggregator.add_traces(iter_traces(self.MULTI_TRACE))
+        self.assertEqual(len(aggregator.routers), 1)
+        self.assertGreater(aggregator.evicted, 0)
+
+    def test_sketch_quantiles(self):
+        """Тест точности перцентилей скетча"""
+        stats = RunningStats()
+        for value in range(1, 1001):
+            stats.add(float(value))
+
+        self.assertAlmostEqual(stats.quantile(0.5), 500, delta=10)
+        self.assertAlmostEqual(stats.quantile(0.99), 990, delta=20)
+
+    def test_summary_percentiles(self):
+        """Тест перцентилей и джиттера в сводке парсера"""
+        parser = TracerouteParser()
+        parser.parse_output("""traceroute to test.com (1.2.3.4), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  10.0 ms  12.0 ms  11.0 ms
+ 2  1.2.3.4 (1.2.3.4)  40.0 ms  *  44.0 ms""")
+
+        summary = parser.get_summary()
+        self.assertAlmostEqual(summary['average_latency'], 23.4)
+        self.assertEqual(summary['max_latency'], 44.0)
+        self.assertAlmostEqual(summary['p50_latency'], 12.0, delta=1)
+        # Разности внутри прыжков: 2 и 1, затем 4; скачок 11 → 40 между прыжками не учитывается
+        self.assertAlmostEqual(summary['jitter'], 7 / 3)
+        self.assertAlmostEqual(parser.hops[1]['avg_time'], 42.0)
+
+        growing = TracerouteParser()
+        growing.parse_output("""traceroute to test.com (1.2.3.4), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  10.0 ms  10.0 ms  10.0 ms
+ 2  1.2.3.4 (1.2.3.4)  50.0 ms  50.0 ms  50.0 ms""")
+        self.assertEqual(growing.get_summary()['jitter'], 0.0)
+
+    def test_stats_merge(self):
+        """Тест объединения статистики из разных воркеров"""
+        left, right, full = RunningStats(), RunningStats(), RunningStats()
+        for value in range(1, 51):
+            left.add(float(value))
+            full.add(float(value))
+        for value in range(51, 101):
+            right.add(float(value))
+            full.add(float(value))
+
+        left.merge(right)
+        self.assertEqual(left.count, full.count)
+        self.assertAlmostEqual(left.mean, full.mean)
+        self.assertAlmostEqual(left.variance, full.variance)
+        self.assertEqual(left.quantile(0.95), full.quantile(0.95))
+
+
+class TestBaseline(unittest.TestCase):
+    """Тесты базовых линий и обнаружения аномалий"""
+
+    @staticmethod
+    def make_trace(latency):
+        parser = TracerouteParser()
+        parser.parse_output(f"""traceroute to test.com (1.2.3.4), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  1.0 ms  1.0 ms  1.0 ms
+ 2  10.10.10.1 (10.10.10.1)  {latency} ms  {latency} ms  {latency} ms""")
+        return parser
+
+    def test_latency_anomaly(self):
+        """Тест обнаружения отклонения от базовой линии"""
+        with BaselineStore(batch_size=3) as store:
+            analyzer = TracerouteAnalyzer(baseline=store)
+            for latency in (10.0, 11.0, 10.0, 12.0, 10.0, 11.0):
+                issues = analyzer.analyze(self.make_trace(latency))
+                self.assertFalse([i for i in issues if i['type'] == 'latency_anomaly'])
+
+            issues = analyzer.analyze(self.make_trace(80.0))
+            anomalies = [i for i in issues if i['type'] == 'latency_anomaly']
+            self.assertEqual(len(anomalies), 1)
+            self.assertEqual(anomalies[0]['hop_number'], 2)
+
+    def test_batched_persistence(self):
+        """Тест пакетной записи базовых линий в SQLite"""
+        with tempfile.TemporaryDirectory() as directory:
+            db_path = os.path.join(directory, 'baseline.db')
+            store = BaselineStore(db_path, batch_size=100)
+            store.update_trace(self.make_trace(10.0))
+            count = store.connection.execute('SELECT COUNT(*) FROM baselines').fetchone()[0]
+            self.assertEqual(count, 0)
+            store.close()
+
+            with BaselineStore(db_path) as reopened:
+                self.assertAlmostEqual(reopened.get('1.2.3.4', '10.10.10.1')['latency_mean'], 10.0)
+
+    def test_missing_latency_samples(self):
+        """Тест: замеры без задержки не тянут среднее к нулю и не считаются замерами задержки"""
+        with BaselineStore() as store:
+            store.update_samples('1.2.3.4', [('10.10.10.1', None, 100.0)])
+            store.update_samples('1.2.3.4', [('10.10.10.1', 40.0, 0.0)])
+            base = store.get('1.2.3.4', '10.10.10.1')
+            self.assertEqual((base['samples'], base['latency_samples']), (2, 1))
+            self.assertEqual(base['latency_mean'], 40.0)
+            self.assertAlmostEqual(base['loss_mean'], 90.0)
+
+
+class TestRouteDiff(unittest.TestCase):
+    """Тесты сравнения маршрутов"""
+
+    @staticmethod
+    def parse(trace_output):
+        parser = TracerouteParser()
+        parser.parse_output(trace_output)
+        return parser
+
+    def test_route_change(self):
+        """Тест обнаружения вставленных, удаленных и замененных узлов"""
+        old = self.parse("""traceroute to test.com (1.2.3.4), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  1.0 ms  1.0 ms  1.0 ms
+ 2  10.10.10.1 (10.10.10.1)  5.0 ms  5.0 ms  5.0 ms
+ 3  72.14.215.25 (72.14.215.25)  15.0 ms  15.0 ms  15.0 ms
+ 4  1.2.3.4 (1.2.3.4)  25.0 ms  25.0 ms  25.0 ms""")
+        new = self.parse("""traceroute to test.com (1.2.3.4), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  1.0 ms  1.0 ms  1.0 ms
+ 2  10.10.10.2 (10.10.10.2)  5.0 ms  5.0 ms  5.0 ms
+ 3  72.14.215.25 (72.14.215.25)  15.0 ms  15.0 ms  15.0 ms
+ 4  80.1.1.1 (80.1.1.1)  20.0 ms  20.0 ms  20.0 ms
+ 5  1.2.3.4 (1.2.3.4)  60.0 ms  60.0 ms  60.0 ms""")
+
+        diff = diff_routes(old.hops, new.hops)
+        self.assertFalse(diff['identical'])
+        self.assertEqual(diff['changed'], [{'hop_number': 2, 'old_ip': '10.10.10.1', 'new_ip': '10.10.10.2'}])
+        self.assertEqual(diff['inserted'], [{'hop_number': 4, 'ip_address': '80.1.1.1'}])
+        self.assertEqual(diff['removed'], [])
+        self.assertEqual(len(diff['latency_shifts']), 1)
+        self.assertAlmostEqual(diff['latency_shifts'][0]['shift'], 35.0)
+
+    def test_fingerprint_dedup(self):
+        """Тест одинакового отпечатка для одинаковых путей"""
+        trace = """traceroute to test.com (1.2.3.4), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  {0} ms  1.0 ms  1.0 ms
+ 2  * * *
+ 3  1.2.3.4 (1.2.3.4)  25.0 ms  25.0 ms  25.0 ms"""
+        differ = RouteDiffer()
+        self.assertIsNone(differ.observe(self.parse(trace.format(1.0))))
+        diff = differ.observe(self.parse(trace.format(2.0)))
+        self.assertTrue(diff['identical'])
+        self.assertEqual(differ.fingerprints[diff['new_fingerprint']], 2)
+        self.assertEqual(ip_to_int('10.0.0.1'), 167772161)
+
+    def test_find_loops(self):
+        """Тест поиска повторяющихся сегментов маршрута"""
+        # A B C B C 0 C B: цикл B→C с таймаутом внутри — один сегмент
+        self.assertEqual(find_loops((1, 2, 3, 2, 3, 0, 3, 2)), [(1, 2, 7)])
+        self.assertEqual(find_loops((1, 2, 3, 4)), [])
+        # Однократные повторы тоже сегменты, но короче двух периодов
+        self.assertEqual(find_loops((1, 2, 1, 5, 6, 5)), [(0, 2, 3), (3, 2, 3)])
+        self.assertEqual(find_loops((1, 1, 2)), [(0, 1, 2)])
+        # Таймаут в первом проходе цикла заполняется первым ответившим узлом
+        self.assertEqual(find_loops((1, 0, 1, 2, 1, 3)), [(0, 2, 5)])
+        # Повтор узла далеко назад не копирует цикл: длинный маршрут без петель проходит за линейное время
+        route = list(range(1, 20001)) * 2
+        self.assertEqual(find_loops(route), [(0, 20000, 40000)])
+
+        parser = self.parse("""traceroute to test.com (1.2.3.4), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  1.0 ms  1.0 ms  1.0 ms
+ 2  10.0.0.1 (10.0.0.1)  5.0 ms  5.0 ms  5.0 ms
+ 3  10.0.0.2 (10.0.0.2)  6.0 ms  6.0 ms  6.0 ms
+ 4  10.0.0.1 (10.0.0.1)  7.0 ms  7.0 ms  7.0 ms
+ 5  10.0.0.2 (10.0.0.2)  8.0 ms  8.0 ms  8.0 ms
+ 6  10.0.0.1 (10.0.0.1)  9.0 ms  9.0 ms  9.0 ms""")
+        loops = [i for i in TracerouteAnalyzer().analyze(parser) if i['type'] == 'routing_loop']
+        self.assertEqual(len(loops), 1)
+        self.assertEqual((loops[0]['loop_start'], loops[0]['period'], loops[0]['length']), (2, 2, 5))
+        self.assertEqual(loops[0]['hop_number'], 4)
+
+
+class TestPathIndex(unittest.TestCase):
+    """Тесты индекса уникальных путей"""
+
+    TRACE = """traceroute to test.com (1.2.3.4), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  {0} ms  1.5 ms  *
+ 2  {1} ({1})  5.0 ms  5.5 ms  6.0 ms
+ 3  1.2.3.4 (1.2.3.4)  25.0 ms  25.5 ms  26.0 ms"""
+
+    def test_deduplicated_paths(self):
+        """Тест хранения одинаковых путей один раз"""
+        index = PathIndex()
+        traces = [
+            self.TRACE.format(1.0, '10.10.10.1'),
+            self.TRACE.format(2.0, '10.10.10.1'),
+            self.TRACE.format(3.0, '10.10.10.2'),
+        ]
+        for ts, trace in enumerate(traces):
+            parser = TracerouteParser()
+            parser.parse_output(trace)
+            index.add_trace(parser, timestamp=float(ts))
+
+        self.assertEqual(index.get_stats()['unique_paths'], 2)
+        self.assertEqual(index.paths_for_target('1.2.3.4'), {0: 2, 1: 1})
+        self.assertEqual(index.paths_through('10.10.10.2'), {1})
+        self.assertEqual(index.traces_between(1.0, 2.0), [1, 2])
+
+        trace = index.get_trace(1)
+        self.assertEqual(trace['hops'][1], '10.10.10.1')
+        self.assertEqual(trace['rtts'][0], [2.0, 1.5, None])
+
+    def test_equal_fingerprints_stay_apart(self):
+        """Тест: маршруты с одинаковым отпечатком не склеиваются"""
+        from types import SimpleNamespace
+        index = PathIndex()
+        for name in ('gw-a', 'gw-b'):
+            # Адреса не IP кодируются нулем: отпечатки совпадают, хотя пути разные
+            hops = [{'ip_address': name, 'times': [1.0]}]
+            index.add_trace(SimpleNamespace(hops=hops, target_ip='1.2.3.4', target_host=None), timestamp=0.0)
+
+        self.assertEqual(index.path_fingerprints[0], index.path_fingerprints[1])
+        self.assertEqual([index.get_path(0), index.get_path(1)], [['gw-a'], ['gw-b']])
+
+
+class TestReportWriter(unittest.TestCase):
+    """Тесты формирования отчетов"""
+
+    def setUp(self):
+        self.parser = TracerouteParser()
+        self.parser.parse_output("""traceroute to test.com (1.2.3.4), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  1.0 ms  2.0 ms  3.0 ms
+ 2  * * *
+ 3  1.2.3.4 (1.2.3.4)  250.0 ms  *  260.0 ms""")
+        issues = TracerouteAnalyzer().analyze(self.parser)
+        self.report = build_report(self.parser, issues, file_path='trace.txt', elapsed=0.5)
+
+    def test_text_report(self):
+        """Тест текстового отчета"""
+        text = ReportWriter().render(self.report, 'text')
+        self.assertIn("Цель: test.com (1.2.3.4)", text)
+        self.assertIn(" 1. OK   192.168.1.1     -   2.0 мс (потерь: 0%)", text)
+        self.assertIn(" 3. WARN 1.2.3.4         - 255.0 мс (потерь: 33%)", text)
+        self.assertIn("Высокая задержка: 260 мс (прыжок 3)", text)
+
+    def test_console_report_matches_file(self):
+        """Тест консольного вывода из того же отчета, что и файл"""
+        import contextlib
+        import io
+        analyzer = TracerouteAnalyzer()
+        issues = analyzer.analyze(self.parser)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            analyzer.print_report(self.parser)
+
+        report = build_report(self.parser, issues, warnings=analyzer.warnings)
+        self.assertIn("Обнаружены таймауты на 1 прыжках", output.getvalue())
+        self.assertEqual(output.getvalue().split('\n', 3)[3], ReportWriter().render(report, 'text').split('\n', 3)[3])
+
+    def test_batch_formats(self):
+        """Тест сводного отчета по нескольким трассировкам в разных форматах"""
+        writer = ReportWriter()
+        reports = [self.report, self.report]
+
+        rows = writer.render(reports, 'csv').strip().splitlines()
+        self.assertEqual(len(rows), 1 + 2 * 3)
+        self.assertEqual(len(json.loads(writer.render(reports, 'json'))), 2)
+        self.assertEqual(len(json.loads(writer.render(self.report, 'json'))), 1)
+        self.assertEqual(json.loads(writer.render([], 'json')), [])
+        self.assertEqual(writer.render(reports, 'html').count('<table'), 2)
+
+        with tempfile.TemporaryDirectory() as directory:
+            report_path = os.path.join(directory, 'report.csv')
+            writer.write(report_path, reports)
+            with open(report_path, encoding='utf-8') as f:
+                self.assertEqual(f.read().strip().splitlines(), rows)
+
+
+class TestExporter(unittest.TestCase):
+    """Тесты колоночной выгрузки"""
+
+    def test_csv_export(self):
+        """Тест выгрузки прыжков, проблем и исправлений в CSV пачками"""
+        trace_output = """traceroute to a.com (1.2.3.4), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  1.0 ms  *  3.0 ms
+ 2  * * *
+traceroute to b.com (5.6.7.8), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  4.0 ms  5.0 ms  6.0 ms"""
+
+        with tempfile.TemporaryDirectory() as directory:
+            base_path = os.path.join(directory, 'export')
+            with HopExporter(base_path, fmt='csv', row_group_size=2) as exporter:
+                for parser in iter_traces(trace_output):
+                    exporter.write_trace(parser, TracerouteAnalyzer().analyze(parser), ['fix'])
+
+            with open(exporter.path_for('hops'), encoding='utf-8') as f:
+                hops = f.read().strip().splitlines()
+            self.assertEqual(len(hops), 4)
+            self.assertEqual(hops[1], '0,1.2.3.4,1,192.168.1.1,192.168.1.1,3,33.33333333333333,partial')
+            with open(exporter.path_for('probes'), encoding='utf-8') as f:
+                probes = f.read().strip().splitlines()
+            self.assertEqual(probes[0], 'trace_id,hop_number,probe,rtt')
+            self.assertEqual(probes[1:4], ['0,1,1,1.0', '0,1,2,', '0,1,3,3.0'])
+            self.assertEqual(exporter.rows_written['probes'], 9)
+            self.assertEqual(exporter.rows_written['traces'], 2)
+            self.assertGreater(exporter.rows_written['issues'], 0)
+
+
+    def test_extra_probes(self):
+        """Тест выгрузки всех проб при traceroute -q 5"""
+        trace_output = """traceroute to a.com (1.2.3.4), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  1.0 ms  2.0 ms  3.0 ms  4.0 ms  5.0 ms"""
+
+        with tempfile.TemporaryDirectory() as directory:
+            with HopExporter(os.path.join(directory, 'export'), fmt='csv') as exporter:
+                exporter.write_trace(next(iter_traces(trace_output)))
+
+            with open(exporter.path_for('probes'), encoding='utf-8') as f:
+                probes = f.read().strip().splitlines()
+            self.assertEqual(probes[1:], ['0,1,1,1.0', '0,1,2,2.0', '0,1,3,3.0', '0,1,4,4.0', '0,1,5,5.0'])
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), "pyarrow не установлен")
+    def test_columnar_formats(self):
+        """Тест выгрузки в Parquet и Arrow с явной схемой"""
+        import pyarrow.ipc
+        import pyarrow.parquet
+        trace_output = """traceroute to a.com (1.2.3.4), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  1.0 ms  *  3.0 ms
+ 2  * * *"""
+
+        with tempfile.TemporaryDirectory() as directory:
+            for fmt in ('parquet', 'arrow'):
+                with HopExporter(os.path.join(directory, fmt), fmt=fmt) as exporter:
+                    exporter.write_trace(next(iter_traces(trace_output)))
+
+                if fmt == 'parquet':
+                    probes = pyarrow.parquet.read_table(exporter.path_for('probes'))
+                else:
+                    with pyarrow.OSFile(exporter.path_for('probes'), 'rb') as f:
+                        probes = pyarrow.ipc.open_file(f).read_all()
+                self.assertEqual(str(probes.schema.field('rtt').type), 'double')
+                self.assertEqual(probes.column('rtt').to_pylist(), [1.0, None, 3.0, None, None, None])
+
+
+class TestCorpusGenerator(unittest.TestCase):
+    """Тесты генератора синтетических трассировок"""
+
+    def test_seeded_corpus(self):
+        """Тест воспроизводимости корпуса и количества трассировок"""
+        kinds = list(TracerouteCorpusGenerator.KINDS)
+        corpus = TracerouteCorpusGenerator(seed=7).generate_corpus(8, kinds)
+        self.assertEqual(corpus, TracerouteCorpusGenerator(seed=7).generate_corpus(8, kinds))
+
+        parsers = list(iter_traces(corpus))
+        self.assertEqual(len(parsers), 8)
+        self.assertTrue(all(parser.hops for parser in parsers))
+
+
+class TestDaemon(unittest.TestCase):
+    """Тесты фонового режима с входящей папкой"""
+
+    def run_daemon(self, use_inotify, alerts=None, expected=1, exporter=None):
+        with tempfile.TemporaryDirectory() as inbox:
+            results = []
+            daemon = TracerouteDaemon(inbox, results.append, workers=1, poll_interval=0.05,
+                                      use_inotify=use_inotify, alerts=alerts, exporter=exporter)
+            thread = threading.Thread(target=daemon.run)
+            thread.start()
+            try:
+                with open(os.path.join(inbox, 'trace.txt'), 'w', encoding='utf-8') as f:
+                    f.write("""traceroute to test.com (1.2.3.4), 30 hops max, 60 byte packets
+1  192.168.1.1  1.234ms  1.456ms  1.678ms
+2  * * *""")
+
+                deadline = time.time() + 10
+                while len(results) < expected and time.time() < deadline:
+                    time.sleep(0.05)
+            finally:
+                daemon.stop()
+                thread.join()
+
+            self.assertEqual(len(results), expected)
+            self.assertEqual(results[0]['file'], 'trace.txt')
+            self.assertEqual(results[0]['traces'][0]['summary']['total_hops'], 2)
+            self.assertTrue(os.path.exists(os.path.join(inbox, 'processed', 'trace.txt')))
+            return results
+
+    def test_polling_inbox(self):
+        """Тест обработки нового файла при опросе папки"""
+        self.run_daemon(use_inotify=False)
+
+    def test_inotify_inbox(self):
+        """Тест обработки нового файла через inotify"""
+        self.run_daemon(use_inotify=True)
+
+    def test_alerts_in_sink(self):
+        """Тест тревоги по цели, закрытой по таймеру демона"""
+        rule = AlertRule('loss', issue_type='packet_loss', min_windows=1, of_windows=1)
+        results = self.run_daemon(use_inotify=False, alerts=AlertEngine([rule], window_seconds=1), expected=2)
+        alert = results[1]['alert']
+        self.assertEqual((alert['rule'], alert['key'], alert['state']), ('loss', '1.2.3.4', 'firing'))
+
+    def test_move_keeps_earlier_file(self):
+        """Тест переноса файла с уже занятым именем"""
+        with tempfile.TemporaryDirectory() as directory:
+            done = os.path.join(directory, 'processed')
+            os.mkdir(done)
+            for content in ('first', 'second'):
+                with open(os.path.join(directory, 'trace.txt'), 'w', encoding='utf-8') as f:
+                    f.write(content)
+                target = move_unique(os.path.join(directory, 'trace.txt'), done)
+            self.assertEqual(os.path.basename(target), 'trace.1.txt')
+            self.assertEqual(sorted(os.listdir(done)), ['trace.1.txt', 'trace.txt'])
+
+    def test_inotify_overflow(self):
+        """Тест сигнала о полном обходе папки после переполнения очереди inotify"""
+        import struct
+        watcher = InotifyWatcher.__new__(InotifyWatcher)
+        watcher.fd, write_fd = os.pipe()
+        try:
+            os.write(write_fd, struct.pack('iIII', 1, InotifyWatcher.IN_MOVED_TO, 0, 8) + b'a.txt\0\0\0')
+            self.assertEqual(watcher.wait(1), ['a.txt'])
+            os.write(write_fd, struct.pack('iIII', -1, InotifyWatcher.IN_Q_OVERFLOW, 0, 0))
+            self.assertIsNone(watcher.wait(1))
+        finally:
+            watcher.close()
+            os.close(write_fd)
+
+    def test_export(self):
+        """Тест выгрузки прыжков, присланных воркером, в родителе"""
+        with tempfile.TemporaryDirectory() as directory:
+            with HopExporter(os.path.join(directory, 'export'), fmt='csv') as exporter:
+                results = self.run_daemon(use_inotify=False, exporter=exporter)
+            self.assertNotIn('export', results[0])
+            self.assertEqual(exporter.rows_written['hops'], 2)
+            self.assertEqual(exporter.rows_written['probes'], 6)
+
+
+class TestServer(unittest.TestCase):
+    """Тесты HTTP API анализа"""
+
+    TRACE = b"""traceroute to test.com (1.2.3.4), 30 hops max, 60 byte packets
+1  192.168.1.1  1.234ms  1.456ms  1.678ms
+2  10.10.10.1 (10.10.10.1)  250.1 ms  251.3 ms  252.5 ms"""
+
+    @staticmethod
+    async def request(port, path, body, chunked=False):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        if chunked:
+            payload = b"".join(b"%x\r\n%s\r\n" % (len(part), part) for part in body.split(b"\n")) + b"0\r\n\r\n"
+            writer.write(f"POST {path} HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n".encode() + payload)
+        else:
+            writer.write(f"POST {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                         + body)
+        await writer.drain()
+
+        status = int((await reader.readline()).split()[1])
+        while (await reader.readline()) != b"\r\n":
+            pass
+        data = await reader.read() if not chunked else None
+        writer.close()
+        return status, json.loads(data) if data else None
+
+    def test_endpoints(self):
+        """Тест анализа, парсинга и ошибок маршрутизации запросов"""
+        async def scenario():
+            server = await AnalysisServer(port=0, workers=1).start()
+            try:
+                status, result = await self.request(server.port, '/analyze', self.TRACE)
+                self.assertEqual(status, 200)
+                self.assertGreater(result['fixes'], 0)
+                issue_types = [i['type'] for i in result['traces'][0]['issues']]
+                self.assertIn('high_latency', issue_types)
+
+                status, result = await self.request(server.port, '/parse?x=1', self.TRACE)
+                self.assertEqual(len(result['traces'][0]['hops']), 2)
+
+                status, _ = await self.request(server.port, '/parse', self.TRACE, chunked=True)
+                self.assertEqual(status, 200)
+
+                status, result = await self.request(server.port, '/unknown', b'')
+                self.assertEqual(status, 404)
+            finally:
+                await server.stop()
+
+        asyncio.run(scenario())
+
+    def test_malformed_requests(self):
+        """Тест ответа 400 на испорченные заголовки и длины"""
+        async def raw_status(port, data):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(data)
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            writer.close()
+            return status
+
+        async def scenario():
+            server = await AnalysisServer(port=0, workers=1, max_headers=10).start()
+            try:
+                for data in (b"POST /parse HTTP/1.1\r\nContent-Length: abc\r\n\r\n",
+                             b"POST /parse HTTP/1.1\r\nContent-Length: -5\r\n\r\n",
+                             b"POST /parse HTTP/1.1\r\nX-Long: " + b"a" * 70000 + b"\r\n\r\n",
+                             b"POST /parse HTTP/1.1\r\n" + b"X-A: 1\r\n" * 11 + b"\r\n",
+                             b"POST /parse HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n-5\r\n",
+                             b"POST /parse HTTP/1.1\r\nContent-Length 5\r\n\r\n",
+                             b"POST /parse HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n3\r\nabcXYZ\r\n0\r\n\r\n"):
+                    self.assertEqual(await raw_status(server.port, data), 400)
+
+                status, _ = await self.request(server.port, '/parse', self.TRACE)
+                self.assertEqual(status, 200)
+            finally:
+                await server.stop()
+
+        asyncio.run(scenario())
+
+    def test_stop_with_idle_connection(self):
+        """Тест остановки сервера при простаивающем keep-alive соединении"""
+        async def scenario():
+            server = await AnalysisServer(port=0, workers=1).start()
+            reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+            writer.write(b"GET /health HTTP/1.1\r\n\r\n")
+            await writer.drain()
+            self.assertIn(b"200", await reader.readline())
+
+            await asyncio.wait_for(server.stop(), 10)
+            # Сервер сам закрыл простаивающее соединение: после остатка ответа — конец потока
+            await asyncio.wait_for(reader.read(), 5)
+            self.assertTrue(reader.at_eof())
+            writer.close()
+
+        asyncio.run(scenario())
+
+
+class TestSharedBatch(unittest.TestCase):
+    """Тесты передачи колонок прыжков через shared_memory"""
+
+    TRACES = TracerouteCorpusGenerator(seed=3).generate_corpus(6, ['clean', 'timeouts'])
+
+    def test_round_trip(self):
+        """Тест восстановления прыжков в формате парсера"""
+        parsers = list(iter_traces(self.TRACES))
+        with SharedHopBatch.create([(parser, []) for parser in parsers]) as batch:
+            self.assertEqual(batch.hop_count, sum(len(parser.hops) for parser in parsers))
+            for index, parser in enumerate(parsers):
+                self.assertEqual(batch.hops(index), parser.hops)
+                self.assertEqual(batch.traces[index]['summary'], parser.get_summary())
+
+    def test_parallel_aggregation(self):
+        """Тест агрегации файла по пачкам из воркеров без копирования прыжков"""
+        from unittest import mock
+        import Code.ParallelParse as parallel
+
+        text = TracerouteCorpusGenerator(seed=5).generate_corpus(40, ['clean', 'timeouts'])
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf-8') as f:
+            f.write(text)
+        try:
+            with mock.patch.object(parallel, 'MIN_PARALLEL_SIZE', 0):
+                shared = parallel.aggregate_file_parallel(f.name, workers=2, chunks_per_worker=2, timestamp=1.0)
+        finally:
+            os.unlink(f.name)
+
+        direct = TracerouteAggregator()
+        direct.add_traces(iter_traces(text), timestamp=1.0)
+        self.assertEqual(shared.to_rows('routers'), direct.to_rows('routers'))
+        self.assertEqual(shared.to_rows('links'), direct.to_rows('links'))
+        self.assertEqual(shared.traces_seen, direct.traces_seen)
+
+
+class TestParallelParse(unittest.TestCase):
+    """Тесты параллельного разбора одного большого файла"""
+
+    def test_matches_sequential(self):
+        """Тест порядка трассировок и сквозных номеров строк"""
+        from unittest import mock
+        import Code.ParallelParse as parallel
+
+        text = "\nмусор\n" + TracerouteCorpusGenerator(seed=11).generate_corpus(40, ['clean', 'malformed'])
+        lines = text.split('\n')
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf-8') as f:
+            f.write(text)
+        try:
+            self.assertGreater(len(parallel.find_chunk_boundaries(f.name, 4)), 1)
+            with mock.patch.object(parallel, 'MIN_PARALLEL_SIZE', 0):
+                parsers = list(parallel.parse_file_parallel(f.name, workers=2, chunks_per_worker=2))
+        finally:
+            os.unlink(f.name)
+
+        sequential = list(iter_traces(text))
+        self.assertEqual([p.target_host for p in parsers], [p.target_host for p in sequential])
+        self.assertTrue(all(parser.symbols is parsers[0].symbols for parser in parsers))
+        self.assertTrue(all(parser.symbols.value(hop['ip_id']) == hop['ip_address']
+                            for parser in parsers for hop in parser.hops))
+        for parser in parsers:
+            for hop in parser.hops:
+                self.assertTrue(lines[hop['line_number'] - 1].strip().startswith(str(hop['hop_number'])))
+            for error in parser.errors:
+                line_number = int(error.split(':')[0].split()[1])
+                self.assertIn(lines[line_number - 1].strip(), error)
+
+
+class TestRunner(unittest.TestCase):
+    """Тесты параллельного запуска зондов с потоковым разбором"""
+
+    FAKE = [sys.executable, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                         'Benchmarks', 'fake_traceroute.py'), '--delay', '0.02']
+
+    def test_streaming_targets(self):
+        """Тест анализа прыжков до завершения зонда и порядка результатов"""
+        from Code.Runner import TracerouteRunner
+        live = []
+        runner = TracerouteRunner(self.FAKE, concurrency=2, timeout=10,
+                                  on_hop=lambda target, hop, issues: live.append((target, time.perf_counter())))
+        results = asyncio.run(runner.run(['a.com', 'b.com', 'c.com']))
+
+        self.assertEqual([r['target_host'] for r in results], ['a.com', 'b.com', 'c.com'])
+        for result in results:
+            self.assertEqual(result['returncode'], 0)
+            self.assertEqual(len(result['hops']), 6)
+            self.assertIn('repeated_hop', [i['type'] for i in result['issues']])
+            self.assertNotIn('routing_loop', [i['type'] for i in result['issues']])
+        self.assertEqual(len(live), 18)
+        self.assertIs(results[0]['hops'][0]['ip_address'], results[1]['hops'][0]['ip_address'])
+
+    def test_timeout_keeps_partial_hops(self):
+        """Тест таймаута зонда, который не завершается"""
+        from Code.Runner import TracerouteRunner
+        runner = TracerouteRunner(self.FAKE + ['--hang'], timeout=1)
+        result = asyncio.run(runner.run_target('slow.com'))
+        self.assertTrue(result['timed_out'])
+        self.assertEqual(len(result['hops']), 6)
+
+    def test_export(self):
+        """Тест выгрузки каждой завершенной трассировки"""
+        from Code.Runner import TracerouteRunner
+        with tempfile.TemporaryDirectory() as directory:
+            with HopExporter(os.path.join(directory, 'export'), fmt='csv') as exporter:
+                runner = TracerouteRunner(self.FAKE, timeout=10, exporter=exporter)
+                results = asyncio.run(runner.run(['a.com', 'b.com']))
+
+            self.assertEqual(sorted(result['trace_id'] for result in results), [0, 1])
+            self.assertEqual(exporter.rows_written['traces'], 2)
+            self.assertEqual(exporter.rows_written['hops'], 12)
+
+
+class TestApi(unittest.TestCase):
+    """Тесты библиотечного API пакета"""
+
+    TRACES = """traceroute to a.com (1.1.1.1), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  1.2 ms  1.5 ms  1.8 ms
+ 2  1.1.1.1 (1.1.1.1)  250.1 ms  251.3 ms  252.5 ms
+traceroute to b.com (2.2.2.2), 30 hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  1.2 ms  1.5 ms  1.8 ms
+ 2  2.2.2.2 (2.2.2.2)  5.1 ms  5.3 ms  5.6 ms"""
+
+    def test_analyze_text_and_stream(self):
+        """Тест одинакового результата для текста и потока строк"""
+        import Code
+        results = Code.analyze_text(self.TRACES)
+        self.assertEqual([r['target_host'] for r in results], ['a.com', 'b.com'])
+        self.assertIn('high_latency', [i['type'] for i in results[0]['issues']])
+
+        streamed = list(Code.analyze_stream(self.TRACES.splitlines(True)))
+        self.assertEqual([r['summary'] for r in streamed], [r['summary'] for r in results])
+
+    def test_analyze_file(self):
+        """Тест анализа файла через пакет"""
+        import Code
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf-8') as f:
+            f.write(self.TRACES)
+        try:
+            results = Code.analyze_file(f.name, autocorrect=False)
+            self.assertEqual(len(results), 2)
+            self.assertTrue(all(r['parse_success'] for r in results))
+        finally:
+            os.unlink(f.name)
+
+    def test_worker_response_from_api(self):
+        """Тест ответа воркера демона и сервера, собранного из Api.analyze_text"""
+        import Code
+        results = Code.analyze_text(self.TRACES)
+        response = analyze_content(self.TRACES)
+        self.assertEqual(response['fixes'], sum(len(r['fixes']) for r in results))
+        self.assertEqual(response['traces'], [{'summary': r['summary'], 'issues': r['issues'], 'errors': r['errors']}
+                                              for r in results])
+
+    def test_session_export(self):
+        """Тест выгрузки трассировок сессии API"""
+        import Code
+        with tempfile.TemporaryDirectory() as directory:
+            with HopExporter(os.path.join(directory, 'export'), fmt='csv') as exporter:
+                results = Code.analyze_text(self.TRACES, exporter=exporter)
+            self.assertEqual([r['trace_id'] for r in results], [0, 1])
+            self.assertEqual(exporter.rows_written['hops'], 4)
+            self.assertEqual(exporter.rows_written['issues'], sum(len(r['issues']) for r in results))
+
+
+class TestAlerts(unittest.TestCase):
+    """Тесты оконных тревог по потоку трассировок"""
+
+    LOSS = [{'type': 'packet_loss'}]
+
+    def test_n_of_m_firing_and_resolve(self):
+        """Тест тревоги на N-м окне из M, без повторов и со снятием по tick"""
+        received = []
+        engine = AlertEngine(window_seconds=10, on_alert=received.append)
+        alerts = []
+        # Одиночный всплеск не поднимает тревогу
+        alerts += engine.observe_result('t', self.LOSS, timestamp=0)
+        for window in range(1, 8):
+            alerts += engine.observe_result('t', self.LOSS if 3 <= window <= 6 else [], timestamp=window * 10)
+
+        self.assertEqual([(a['rule'], a['state'], a['window_start']) for a in alerts],
+                         [('sustained_packet_loss', 'firing', 40)])
+        self.assertEqual(alerts[0]['breached_windows'], 3)
+        self.assertEqual(engine.active_alerts(), [{'scope': 'target', 'key': 't', 'rule': 'sustained_packet_loss'}])
+
+        resolved = engine.tick(200)
+        self.assertEqual([a['state'] for a in resolved], ['resolved'])
+        self.assertEqual(engine.active_alerts(), [])
+        self.assertEqual(received, alerts + resolved)
+
+    def test_router_rules_from_hops(self):
+        """Тест правил по маршрутизаторам и ограничения числа ключей"""
+        rule = AlertRule('loss', scope='router', metric='loss_rate', threshold=50, min_windows=2, of_windows=2)
+        engine = AlertEngine([rule], window_seconds=1, max_keys=2)
+        hops = [{'ip_address': '10.0.0.1', 'times': [None, None, 5.0]},
+                {'ip_address': None, 'times': [None, None, None]},
+                {'ip_address': '10.0.0.2', 'times': [1.0, 1.0, 1.0]}]
+        alerts = []
+        for second in range(3):
+            alerts += engine.observe_result('t', [], hops, timestamp=second)
+
+        self.assertEqual([(a['key'], a['state']) for a in alerts], [('10.0.0.1', 'firing')])
+        self.assertAlmostEqual(alerts[0]['value'], 200 / 3)
+        self.assertEqual(engine.keys['target'], {})
+
+        engine.observe_result('t', [], [{'ip_address': '10.0.0.3', 'times': [1.0]}], timestamp=3)
+        self.assertEqual(list(engine.keys['router']), ['10.0.0.2', '10.0.0.3'])
+        self.assertEqual(engine.evicted, 1)
+
+    def test_eviction_resolves_and_tick_index(self):
+        """Тест снятия тревоги вытесненного ключа и обхода tick только по ожидающим ключам"""
+        rule = AlertRule('loss', issue_type='packet_loss', min_windows=1, of_windows=1)
+        engine = AlertEngine([rule], window_seconds=1, max_keys=2)
+        engine.observe_result('a', self.LOSS, timestamp=0)
+        engine.observe_result('b', [], timestamp=0)
+        fired = engine.tick(1)
+        self.assertEqual([(a['key'], a['state']) for a in fired], [('a', 'firing')])
+        # У 'b' закрытое окно без тревоги: tick его больше не обходит
+        self.assertEqual(list(engine.pending['target']), ['a'])
+
+        alerts = engine.observe_result('c', [], timestamp=1)
+        alerts += engine.observe_result('d', [], timestamp=1)
+        self.assertEqual([(a['key'], a['state'], a['evicted']) for a in alerts], [('a', 'resolved', True)])
+        self.assertEqual(engine.active_alerts(), [])
+        self.assertEqual(list(engine.pending['target']), ['c', 'd'])
+
+    def test_rule_validation(self):
+        """Тест проверки параметров правила"""
+        with self.assertRaises(ValueError):
+            AlertRule('bad', issue_type='packet_loss', metric='loss_rate')
+        with self.assertRaises(ValueError):
+            AlertRule('bad', issue_type='packet_loss', min_windows=4, of_windows=3)
+
+
+class TestTriage(unittest.TestCase):
+    """Тесты выборочного и досрочно останавливаемого просмотра архива"""
+
+    TRACES = TracerouteCorpusGenerator(seed=5).generate_corpus(60, ['clean', 'timeouts'])
+
+    def run_triage(self, **kwargs):
+        from Code.Triage import TraceTriage
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf-8') as f:
+            f.write("мусор\n" + self.TRACES)
+        try:
+            triage = TraceTriage(**kwargs)
+            return triage, list(triage.run(f.name))
+        finally:
+            os.unlink(f.name)
+
+    def test_full_scan_matches_parser(self):
+        """Тест совпадения с обычным разбором, включая номера строк"""
+        triage, results = self.run_triage()
+        sequential = list(iter_traces("мусор\n" + self.TRACES))[1:]
+        self.assertEqual(triage.parsed, 60)
+        self.assertEqual([parser.hops for parser, _ in results], [parser.hops for parser in sequential])
+
+    def test_early_exit_and_sampling(self):
+        """Тест остановки после K проблем и выборок"""
+        triage, results = self.run_triage(issue_types=['packet_loss'], limit=2)
+        self.assertTrue(triage.stopped_early)
+        self.assertGreaterEqual(triage.found, 2)
+        self.assertLess(triage.parsed, 60)
+        self.assertTrue(all(issue['type'] == 'packet_loss' for _, issues in results for issue in issues))
+
+        triage, _ = self.run_triage(stride=7)
+        self.assertEqual((triage.parsed, triage.skipped), (9, 51))
+
+        first, sampled = self.run_triage(sample=10, seed=1)
+        second, again = self.run_triage(sample=10, seed=1)
+        self.assertEqual(len(sampled), 10)
+        self.assertEqual([p.target_host for p, _ in sampled], [p.target_host for p, _ in again])
+        lines = [parser.hops[0]['line_number'] for parser, _ in sampled]
+        self.assertEqual(lines, sorted(lines))
+
+    def test_target_filter_skips_hops(self):
+        """Тест пропуска трассировок других целей без разбора"""
+        target = list(iter_traces(self.TRACES))[4].target_host
+        triage, results = self.run_triage(targets=[target])
+        self.assertEqual({parser.target_host for parser, _ in results}, {target})
+        self.assertEqual(triage.parsed + triage.skipped, triage.headers_seen)
+        self.assertEqual(triage.headers_seen, 60)
+
+    def test_target_patterns(self):
+        """Тест совпадения цели по имени или IP из заголовка"""
+        from Code.Triage import TraceTriage
+        triage = TraceTriage(targets=['*.example.com', '10.0.*'])
+        self.assertTrue(triage.matches_target("traceroute to a.example.com (1.2.3.4), 30 hops max"))
+        self.assertTrue(triage.matches_target("traceroute to host (10.0.0.5), 30 hops max, 60 byte packets"))
+        self.assertFalse(triage.matches_target("traceroute to other.net (8.8.8.8), 30 hops max"))
+        self.assertFalse(triage.matches_target("garbage"))
+
+
+class TestAutoCorrector(unittest.TestCase):
+    """Тесты табличного автокорректора"""
+
+    TRACE = """traceroute to a.com (1.2ms.3.4), 30ms hops max, 60 byte packets
+ 1  192.168.1.1 (192.168.1.1)  1.234 ms  1.456 ms  1.678 ms
+ 2  * * *
+ 3ms  10.0.0.1  5.1 ms
+# комментарий 5 timeout"""
+
+    def test_clean_lines_untouched(self):
+        """Тест пропуска чистых строк без исправлений"""
+        corrector = TracerouteAutoCorrector()
+        corrected, fixes = corrector.correct(self.TRACE)
+        lines = corrected.split('\n')
+        self.assertEqual(lines[0], "traceroute to a.com (1.2.3.4), 30 hops max, 60 byte packets")
+        self.assertEqual(lines[1:3], self.TRACE.split('\n')[1:3])
+        self.assertEqual(lines[3], " 3  10.0.0.1 (10.0.0.1)  5.1 ms * *")
+        self.assertEqual(lines[4], "# комментарий 5 *")
+        self.assertEqual([fix for fix in fixes if fix.startswith('Строка 1:')],
+                         ["Строка 1: Исправлен заголовок", "Строка 1: Очищен IP в заголовке: 1.2.3.4"])
+        self.assertFalse([fix for fix in fixes if fix.startswith(('Строка 2:', 'Строка 3:'))])
+
+    def test_other_lines(self):
+        """Тест общих правил для строк, которые не начинаются с цифры или 't'"""
+        corrector = TracerouteAutoCorrector()
+        corrected, fixes = corrector.correct("""$ traceroute to a.com (1.2ms.3.4), 30ms hops max
+RTT 5.0 ms
+* * *""")
+        self.assertEqual(corrected.split('\n'), ["$ traceroute to a.com (1.2.3.4), 30 hops max", "RTT 5.0ms", "* * *"])
+        self.assertEqual(fixes, ["Строка 1: Исправлен заголовок", "Строка 1: Очищен IP в заголовке: 1.2.3.4"])
+
+    def test_dry_run_diff(self):
+        """Тест diff только измененных строк"""
+        corrector = TracerouteAutoCorrector()
+        diff, fixes = corrector.diff(self.TRACE, 'trace.txt')
+        corrected, _ = corrector.correct(self.TRACE)
+        self.assertEqual(diff.split('\n')[:5], ['--- a/trace.txt', '+++ b/trace.txt', '@@ -1,1 +1,1 @@',
+                                                '-' + self.TRACE.split('\n')[0], '+' + corrected.split('\n')[0]])
+        self.assertIn('@@ -4,2 +4,2 @@', diff)
+        self.assertEqual(len(fixes), len(corrector.corrections_applied))
+        self.assertEqual(corrector.diff(corrected), ('', []))
+
+    def test_custom_rules(self):
+        """Тест собственной таблицы правил"""
+        rule = CorrectionRule('usec', 'hop', r'(\d+)usec', r'\1ms', 'usec', "Заменены usec")
+        corrector = TracerouteAutoCorrector(CORRECTION_RULES + (rule,))
+        corrected, fixes = corrector.correct(" 1  10.0.0.1 (10.0.0.1)  5usec  6usec  7usec")
+        self.assertEqual(corrected, " 1  10.0.0.1 (10.0.0.1)  5 ms  6 ms  7 ms")
+        self.assertEqual(fixes, ["Строка 1: Заменены usec"])
+
+    def test_timeout_words(self):
+        """Тест строки из слов timeout: три пробы, без лишнего таймаута"""
+        corrector = TracerouteAutoCorrector()
+        corrected, fixes = corrector.correct("  5 timeout timeout timeout")
+        self.assertEqual(corrected, "  5  * * *")
+        self.assertEqual(fixes, ["Строка 1: Заменен 'timeout' на '*'"])
+
+        corrected, fixes = corrector.correct(" 6  *")
+        self.assertEqual(corrected, " 6  * * *")
+        self.assertEqual(len(fixes), 2)
+
+    def test_single_line_format(self):
+        """Тест: исправленные строки в той же раскладке, что и чистые, и повторная коррекция их не меняет"""
+        corrector = TracerouteAutoCorrector()
+        corrected, _ = corrector.correct(""" 1  192.168.1.1 (192.168.1.1)  1.234 ms  1.456 ms  1.678 ms
+ 2  10.0.0.1  5.1ms  *  6.2
+ 3  * * *""")
+        lines = corrected.split('\n')
+        self.assertEqual(lines[1], " 2  10.0.0.1 (10.0.0.1)  5.1 ms *  6.2 ms")
+        self.assertTrue(all(corrector.clean_hop.fullmatch(line.strip()) for line in lines))
+        self.assertEqual(corrector.correct(corrected), (corrected, []))
+        rule = CorrectionRule('usec', 'hop', r'(\d+)usec', r'\1ms', 'usec', "Заменены usec")
+        self.assertEqual(TracerouteAutoCorrector(CORRECTION_RULES + (rule,)).correct(corrected), (corrected, []))
+
+
+class TestHostnames(unittest.TestCase):
+    """Тесты извлечения местоположения из имен хостов и пакетного обратного DNS"""
+
+    def start_stub_dns(self, names):
+        # Минимальный DNS-сервер: PTR из словаря, NXDOMAIN для остальных адресов
+        import socket
+        import struct
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(('127.0.0.1', 0))
+        server.settimeout(0.2)
+        received = []
+        stop = threading.Event()
+
+        def serve():
+            while not stop.is_set():
+                try:
+                    query, address = server.recvfrom(512)
+                except socket.timeout:
+                    continue
+                question_end = query.index(b'\0', 12) + 5
+                labels, offset = [], 12
+                while query[offset]:
+                    labels.append(query[offset + 1:offset + 1 + query[offset]].decode())
+                    offset += 1 + query[offset]
+                received.append('.'.join(labels))
+                hostname = names.get('.'.join(reversed(labels[:4])))
+                header = struct.pack('!HHHHHH', struct.unpack_from('!H', query)[0],
+                                     0x8180 if hostname else 0x8183, 1, 1 if hostname else 0, 0, 0)
+                answer = b''
+                if hostname:
+                    rdata = b''.join(bytes([len(l)]) + l.encode() for l in hostname.split('.')) + b'\0'
+                    answer = struct.pack('!HHHIH', 0xC00C, 12, 1, 60, len(rdata)) + rdata
+                server.sendto(header + query[12:question_end] + answer, address)
+
+        thread = threading.Thread(target=serve)
+        thread.start()
+
+        def shutdown():
+            stop.set()
+            thread.join()
+            server.close()
+
+        self.addCleanup(shutdown)
+        return server.getsockname(), received
+
+    def test_enrich_hostname(self):
+        """Тест IATA-кода и роли маршрутизатора по имени"""
+        enricher = HostnameEnricher()
+        info = enricher.enrich('xe-0-0-1.cr2.fra1.backbone.net')
+        self.assertEqual((info['iata'], info['city'], info['country'], info['role']),
+                         ('fra', 'Frankfurt', 'Germany', 'core'))
+        self.assertEqual(enricher.enrich('10.0.0.1'), {})
+        self.assertEqual(enricher.enrich('www.example.com'), {})
+
+        enricher.enrich('xe-0-0-1.cr2.fra1.backbone.net')
+        self.assertEqual(enricher.misses, 3)
+
+        custom = HostnameEnricher([HostnameRule('site', r'dc(\d+)')])
+        self.assertEqual(custom.enrich('sw1.dc7.corp.local'), {'site': '7'})
+
+    def test_bare_iata_needs_context(self):
+        """Тест: голый трехбуквенный код — только рядом с ролью или интерфейсом"""
+        enricher = HostnameEnricher()
+        self.assertEqual(enricher.enrich('mad.example.com'), {})
+        self.assertEqual(enricher.enrich('www.sea.example.com'), {})
+        self.assertEqual(enricher.enrich('mad2.example.com')['city'], 'Madrid')
+        info = enricher.enrich('mad.cr1.example.net')
+        self.assertEqual((info['city'], info['role']), ('Madrid', 'core'))
+        self.assertEqual(format_location(info), 'Madrid (mad), core')
+
+    def test_country_sources_separate(self):
+        """Тест: страны по именам и по адресам не смешиваются в одном множестве"""
+        from Code.Geo import GeoIP
+        hops = [{'hop_number': number, 'ip_address': ip, 'hostname': name}
+                for number, (ip, name) in enumerate([('11.0.0.1', 'cr1.fra1.example.net'),
+                                                     ('12.0.0.1', 'cr1.ams1.example.net'),
+                                                     ('13.0.0.1', 'cr1.lhr1.example.net'),
+                                                     ('14.0.0.1', 'cr1.cdg1.example.net'),
+                                                     ('1.0.0.1', 'x')], 1)]
+        result = GeoIP().analyze_countries(hops)
+        self.assertEqual(result['unique_countries'], {'USA/Europe', 'USA'})
+        self.assertEqual(result['hostname_countries'], {'Germany', 'Netherlands', 'United Kingdom', 'France'})
+        self.assertEqual(result['issues'], [])
+        self.assertEqual(result['hop_countries'][1], 'Germany')
+
+    def test_locations_in_report(self):
+        """Тест вывода места и роли узлов в отчете"""
+        parser = TracerouteParser()
+        parser.parse_output("""traceroute to a.com (1.2.3.4), 30 hops max, 60 byte packets
+ 1  xe-1.cr2.fra1.backbone.net (150.1.1.1)  5.1 ms  5.3 ms  5.6 ms""")
+        analyzer = TracerouteAnalyzer(enable_geo=True)
+        issues = analyzer.analyze(parser)
+        self.assertEqual(analyzer.hop_locations[1]['iata'], 'fra')
+
+        report = build_report(parser, issues, locations=analyzer.hop_locations)
+        self.assertIn("5.3 мс (потерь: 0%) [Frankfurt (fra), core, xe]", ReportWriter().render(report, 'text'))
+        self.assertEqual(json.loads(ReportWriter().render(report, 'json'))[0]['hops'][0]['location']['city'],
+                         'Frankfurt')
+
+    def test_batched_reverse_dns(self):
+        """Тест пакетных PTR-запросов к локальному stub-резолверу и кэша"""
+        server, received = self.start_stub_dns({'10.1.1.1': 'ae-2.br1.ams3.example.net'})
+        resolver = ReverseResolver(server, timeout=2)
+        names = resolver.resolve(['10.1.1.1', '10.2.2.2', '10.1.1.1'])
+        self.assertEqual(names, {'10.1.1.1': 'ae-2.br1.ams3.example.net', '10.2.2.2': None})
+        self.assertEqual(sorted(received), ['1.1.1.10.in-addr.arpa', '2.2.2.10.in-addr.arpa'])
+
+        self.assertEqual(resolver.resolve(['10.2.2.2', '10.1.1.1']), names)
+        self.assertEqual(len(received), 2)
+
+    def test_geoip_uses_hostnames(self):
+        """Тест страны по имени хоста и по имени из обратного DNS"""
+        from Code.Geo import GeoIP
+        server, received = self.start_stub_dns({'10.1.1.1': 'ae-2.br1.ams3.example.net'})
+        parser = TracerouteParser()
+        parser.parse_output("""traceroute to a.com (1.2.3.4), 30 hops max, 60 byte packets
+ 1  10.1.1.1 (10.1.1.1)  1.2 ms  1.5 ms  1.8 ms
+ 2  cr1.nrt2.example.jp (150.1.1.1)  5.1 ms  5.3 ms  5.6 ms
+ 3  10.1.1.1 (10.1.1.1)  6.1 ms  6.3 ms  6.6 ms""")
+
+        result = GeoIP(resolver=ReverseResolver(server)).analyze_countries(parser.hops)
+        self.assertEqual(result['hop_countries'], {1: 'Netherlands', 2: 'Japan', 3: 'Netherlands'})
+        self.assertEqual(result['hop_locations'][1]['role'], 'edge')
+        self.assertEqual(len(received), 1)
+
+        offline = GeoIP().analyze_countries(parser.hops)
+        self.assertEqual(offline['hop_countries'][1], 'Private IP')
+        self.assertEqual(offline['hop_countries'][2], 'Japan')
+
+    def test_plain_hop_dicts(self):
+        """Тест прыжков, собранных не парсером: без ip_id и host_id"""
+        from Code.Geo import GeoIP
+        result = GeoIP().analyze_countries([{'hop_number': 1, 'ip_address': '8.8.8.8', 'hostname': 'x'},
+                                            {'hop_number': 2, 'ip_address': None, 'hostname': '*'}])
+        self.assertEqual(result['hop_countries'], {1: 'USA'})
+
+        hops = [{'hop_number': number, 'ip_address': ip, 'hostname': ip, 'times': [1.0], 'type': 'normal',
+                 'packet_loss': 0}
+                for number, ip in enumerate(['10.0.0.1', '10.0.0.2', '10.0.0.1', '10.0.0.2'], 1)]
+        analyzer = TracerouteAnalyzer(enable_geo=False)
+        analyzer.issues = []
+        analyzer.route_complexity_warnings = []
+        analyzer._check_routing_loops(hops)
+        self.assertEqual([issue['type'] for issue in analyzer.issues], ['routing_loop'])
+
+        parser = TracerouteParser()
+        parser.hops = hops
+        parser._calculate_complexity_metrics()
+        self.assertEqual(parser.complexity_metrics['unique_nodes'], 2)
+
+
+class TestDaemonBaseline(unittest.TestCase):
+    """Тесты единственного писателя базовых линий при нескольких воркерах"""
+
+    def test_single_writer(self):
+        """Тест: замеры всех воркеров попадают в базовые линии без потерь"""
+        with tempfile.TemporaryDirectory() as inbox:
+            db_path = os.path.join(inbox, '.baseline.db')
+            results = []
+            daemon = TracerouteDaemon(inbox, results.append, workers=3, poll_interval=0.05,
+                                      use_inotify=False, baseline_path=db_path)
+            for index in range(6):
+                with open(os.path.join(inbox, f'trace{index}.txt'), 'w', encoding='utf-8') as f:
+                    f.write("""traceroute to test.com (1.2.3.4), 30 hops max, 60 byte packets
+ 1  10.10.10.1 (10.10.10.1)  10.0 ms  10.0 ms  10.0 ms""")
+
+            thread = threading.Thread(target=daemon.run)
+            thread.start()
+            try:
+                deadline = time.time() + 10
+                while len(results) < 6 and time.time() < deadline:
+                    time.sleep(0.05)
+            finally:
+                daemon.stop()
+                thread.join()
+
+            self.assertEqual(len(results), 6)
+            self.assertFalse(any('baseline_updates' in result for result in results))
+            with BaselineStore(db_path) as store:
+                self.assertEqual(store.get('1.2.3.4', '10.10.10.1')['samples'], 6)